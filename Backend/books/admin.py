@@ -3,7 +3,12 @@ Admin configuration for Books app
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from .models import Category, Author, Publisher, Book, Cart, CartItem, Wishlist
+from .cache import bump_catalog_version
+from .changes import log_book_changes
+from .counters import recount_book_relations
+from .shelves import SHELVES, invalidate_shelf
 
 
 @admin.register(Category)
@@ -53,7 +58,10 @@ class BookAdmin(admin.ModelAdmin):
     search_fields = ['title', 'subtitle', 'isbn', 'description', 'author__name']
     prepopulated_fields = {'slug': ('title',)}
     ordering = ['-created_at']
-    readonly_fields = ['rating', 'review_count', 'view_count', 'created_at', 'updated_at']
+    readonly_fields = [
+        'rating', 'review_count', 'view_count', 'units_sold', 'bestseller_rank',
+        'is_bestseller', 'created_at', 'updated_at'
+    ]
     
     fieldsets = (
         ('Basic Information', {
@@ -72,7 +80,7 @@ class BookAdmin(admin.ModelAdmin):
             'fields': ('cover_image', 'image_2', 'image_3')
         }),
         ('Metrics', {
-            'fields': ('rating', 'review_count', 'view_count')
+            'fields': ('rating', 'review_count', 'view_count', 'units_sold', 'bestseller_rank')
         }),
         ('Flags', {
             'fields': ('is_featured', 'is_bestseller', 'is_active')
@@ -82,22 +90,31 @@ class BookAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_as_featured', 'mark_as_bestseller', 'mark_as_active', 'mark_as_inactive']
+    actions = ['mark_as_featured', 'mark_as_active', 'mark_as_inactive']
     
     def mark_as_featured(self, request, queryset):
-        queryset.update(is_featured=True)
+        queryset.update(is_featured=True, updated_at=timezone.now())
+        log_book_changes(queryset.values_list('id', flat=True))
+        bump_catalog_version()
+        invalidate_shelf('featured')
     mark_as_featured.short_description = "Mark selected books as featured"
     
-    def mark_as_bestseller(self, request, queryset):
-        queryset.update(is_bestseller=True)
-    mark_as_bestseller.short_description = "Mark selected books as bestseller"
-    
     def mark_as_active(self, request, queryset):
-        queryset.update(is_active=True)
+        queryset.update(is_active=True, updated_at=timezone.now())
+        log_book_changes(queryset.values_list('id', flat=True))
+        recount_book_relations(queryset.values_list('id', flat=True))
+        bump_catalog_version()
+        for name in SHELVES:
+            invalidate_shelf(name)
     mark_as_active.short_description = "Mark selected books as active"
     
     def mark_as_inactive(self, request, queryset):
-        queryset.update(is_active=False)
+        queryset.update(is_active=False, updated_at=timezone.now())
+        log_book_changes(queryset.values_list('id', flat=True))
+        recount_book_relations(queryset.values_list('id', flat=True))
+        bump_catalog_version()
+        for name in SHELVES:
+            invalidate_shelf(name)
     mark_as_inactive.short_description = "Mark selected books as inactive"
 
 
@@ -0,0 +1,88 @@
+"""
+Bestsellers for Books app
+Rank books by units sold over rolling windows and set is_bestseller from the ranking
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, Q, Sum, Value, When
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .changes import log_book_changes
+from .copurchase import purchases
+from .models import Book
+from .shelves import invalidate_shelf
+
+
+def units_sold(now=None):
+    """{book_id: (units per window in BOOKS_BESTSELLER_WINDOWS order)} from one grouped query"""
+    now = now or timezone.now()
+    windows = settings.BOOKS_BESTSELLER_WINDOWS
+    sums = {
+        f'units_{days}': Sum('quantity', filter=Q(order__created_at__gte=now - timedelta(days=days)))
+        for days in windows
+    }
+    rows = (
+        purchases().filter(order__created_at__gte=now - timedelta(days=max(windows)), book__is_active=True)
+        .values('book_id')
+        .annotate(**sums)
+    )
+    return {row['book_id']: tuple(row[f'units_{days}'] or 0 for days in windows) for row in rows}
+
+
+def sales_score(units):
+    """
+    Sum of the daily sales rate in each window. Recent units fall inside
+    every window, so a book selling now outranks one that sold the same
+    amount months ago.
+    """
+    return sum(count / days for count, days in zip(units, settings.BOOKS_BESTSELLER_WINDOWS))
+
+
+def rank_bestsellers(now=None):
+    """[(book_id, units over the longest window)] for the BOOKS_BESTSELLER_SIZE best sellers"""
+    longest = settings.BOOKS_BESTSELLER_WINDOWS.index(max(settings.BOOKS_BESTSELLER_WINDOWS))
+    ranked = sorted(
+        (
+            (book_id, units)
+            for book_id, units in units_sold(now).items()
+            if units[longest] >= settings.BOOKS_BESTSELLER_MIN_UNITS
+        ),
+        key=lambda item: (-sales_score(item[1]), -item[1][longest], item[0])
+    )
+    return [(book_id, units[longest]) for book_id, units in ranked[:settings.BOOKS_BESTSELLER_SIZE]]
+
+
+def rebuild_bestsellers(now=None):
+    """
+    Store rank and units of the current bestsellers and set is_bestseller
+    on exactly those books, in one UPDATE over the new and previous
+    bestsellers. Returns the number of bestsellers.
+    """
+    ranked = rank_bestsellers(now)
+    book_ids = [book_id for book_id, _ in ranked]
+    previous = Book.objects.filter(Q(is_bestseller=True) | Q(bestseller_rank__isnull=False))
+    changed = set(previous.values_list('id', flat=True)).union(book_ids)
+    if not book_ids:
+        # Q(id__in=[]) compiles to an empty result and Django would skip the whole UPDATE
+        previous.update(is_bestseller=False, bestseller_rank=None, units_sold=0, updated_at=timezone.now())
+    else:
+        (previous | Book.objects.filter(id__in=book_ids)).update(
+            is_bestseller=Q(id__in=book_ids),
+            bestseller_rank=Case(
+                *[When(id=book_id, then=Value(rank)) for rank, book_id in enumerate(book_ids, start=1)],
+                default=None
+            ),
+            units_sold=Case(
+                *[When(id=book_id, then=Value(units)) for book_id, units in ranked],
+                default=Value(0)
+            ),
+            updated_at=timezone.now()
+        )
+    # update() sends no post_save, so invalidate what the Book signals would have
+    bump_catalog_version()
+    log_book_changes(changed)
+    invalidate_shelf('bestsellers')
+    return len(ranked)
@@ -0,0 +1,86 @@
+"""
+Cache helpers for Books app
+Filter signatures, catalog versioning and cached result counts
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+
+CATALOG_VERSION_KEY = 'books:catalog_version'
+
+
+def _normalise(value):
+    """Normalise a filter value so equivalent requests share one signature"""
+    if isinstance(value, (list, tuple, set)):
+        items = sorted({str(_normalise(v)) for v in value if v not in (None, '')})
+        return items or None
+    if isinstance(value, str):
+        value = ' '.join(value.split()).lower()
+        return value or None
+    return value
+
+
+def filter_signature(scope, params):
+    """
+    Build a stable signature for a set of listing filters.
+    `scope` separates endpoints whose filters look alike but match differently.
+    Empty values are dropped and lists are sorted, so `?a=1&a=2` and `?a=2&a=1`
+    hit the same cache entry.
+    """
+    normalised = {}
+    for name, value in params.items():
+        value = _normalise(value)
+        if value is not None:
+            normalised[name] = value
+    payload = json.dumps([scope, normalised], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def catalog_version():
+    """Current catalog version; part of every key that depends on Book rows"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses old keys
+        version = time.time_ns()
+        cache.add(CATALOG_VERSION_KEY, version, None)
+        version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every catalog-derived cache entry at once"""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def cached_count(queryset, signature):
+    """Return queryset.count(), cached under the filter signature"""
+    key = f'books:count:{catalog_version()}:{signature}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.BOOKS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose total count is served from the count cache"""
+
+    def __init__(self, object_list, per_page, signature=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.signature = signature
+
+    @cached_property
+    def count(self):
+        if self.signature is None:
+            return super().count
+        return cached_count(self.object_list, self.signature)
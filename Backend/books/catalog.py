@@ -0,0 +1,222 @@
+"""
+Catalog snapshot for Books app
+Columnar NumPy copy of the hot Book columns for vectorised filter and sort
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .changes import ChangeFeed
+from .models import Book
+from .refresh import BackgroundTask
+
+try:
+    import numpy as np
+except ImportError:  # only BOOKS_CATALOG_ENGINE=snapshot needs it
+    np = None
+
+
+COLUMNS = (
+    'id', 'effective_price', 'rating', 'stock', 'language',
+    'category_id', 'author_id', 'created_at', 'title',
+    'is_active', 'is_featured', 'is_bestseller',
+)
+
+# Sortable fields; ties break on id in the same direction, like keyset paging
+SORT_FIELDS = ('created_at', 'effective_price', 'rating', 'title')
+
+
+def _timestamp(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+class CatalogSnapshot:
+    """
+    Column arrays for every Book row, answered with boolean masks.
+    Each sortable field keeps a precomputed (field, id) permutation, so a
+    request is one mask plus a gather over that permutation: no sort and
+    no model instances until the page of ids is hydrated. Every
+    BOOKS_CATALOG_REFRESH_INTERVAL seconds only the rows of books in the
+    change log are re-read and merged, which also covers deletions, late
+    commits and bulk updates. Fresh arrays are swapped in whole, so
+    readers never see a half-applied update. A full load only runs at
+    start or, if the log cannot be followed, on a background thread;
+    until the first load is done `page` returns None and callers use the
+    database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None       # (columns, orders), replaced wholesale on every change
+        self._positions = {}     # book id -> row index
+        self._changes = ChangeFeed()
+        self._refreshed_at = 0.0
+        self._reload = BackgroundTask('catalog-snapshot', self.warm)
+
+    def __len__(self):
+        return len(self._positions)
+
+    # Loading
+
+    def _fetch(self, book_ids=None):
+        rows = Book.objects.order_by()
+        if book_ids is not None:
+            rows = rows.filter(id__in=book_ids)
+        values = {name: [] for name in COLUMNS}
+        for row in rows.values(*COLUMNS).iterator(chunk_size=5000):
+            for name in COLUMNS:
+                values[name].append(row[name])
+        return values
+
+    def _arrays(self, values):
+        return {
+            'id': np.array(values['id'], dtype=np.int64),
+            'effective_price': np.array(values['effective_price'], dtype=np.float64),
+            'rating': np.array(values['rating'], dtype=np.float64),
+            'stock': np.array(values['stock'], dtype=np.int64),
+            'language': np.array(values['language'], dtype='<U2'),
+            'category_id': np.array(values['category_id'], dtype=np.int64),
+            'author_id': np.array(values['author_id'], dtype=np.int64),
+            'created_at': np.array([_timestamp(value) for value in values['created_at']], dtype=np.int64),
+            'title': np.array(values['title'], dtype=object),
+            'is_active': np.array(values['is_active'], dtype=bool),
+            'is_featured': np.array(values['is_featured'], dtype=bool),
+            'is_bestseller': np.array(values['is_bestseller'], dtype=bool),
+        }
+
+    def _sort_orders(self, columns):
+        ids = columns['id']
+        # Titles sort as ranks so all four permutations are integer lexsorts
+        title_rank = np.unique(columns['title'], return_inverse=True)[1] if len(ids) else ids
+        keys = {'created_at': columns['created_at'], 'effective_price': columns['effective_price'],
+                'rating': columns['rating'], 'title': title_rank}
+        return {field: np.lexsort((ids, key)) for field, key in keys.items()}
+
+    def _swap(self, columns, positions):
+        self._state = (columns, self._sort_orders(columns))
+        self._positions = positions
+
+    def warm(self):
+        """Load every Book row, then swap the arrays in"""
+        if np is None:
+            raise ImproperlyConfigured('BOOKS_CATALOG_ENGINE=snapshot requires numpy')
+        with self._lock:
+            # Start before loading, so writes during the load are merged afterwards
+            self._changes.start()
+            values = self._fetch()
+            columns = self._arrays(values)
+            self._swap(columns, {book_id: row for row, book_id in enumerate(values['id'])})
+            self._refreshed_at = time.monotonic()
+
+    def _merge(self, book_ids):
+        """Re-read the rows of `book_ids`: update known rows, append new ones, hide deleted ones"""
+        values = self._fetch(book_ids)
+        changed = self._arrays(values)
+        positions = dict(self._positions)
+        existing = np.array([book_id in positions for book_id in values['id']], dtype=bool)
+        rows = np.array(
+            [positions[book_id] for book_id in values['id'] if book_id in positions], dtype=np.int64
+        )
+        columns = {}
+        for name, column in self._state[0].items():
+            column = column.copy()
+            column[rows] = changed[name][existing]
+            columns[name] = np.concatenate([column, changed[name][~existing]])
+        for book_id in changed['id'][~existing].tolist():
+            positions[book_id] = len(positions)
+        deleted = [positions[book_id] for book_id in set(book_ids) - set(values['id']) if book_id in positions]
+        columns['is_active'][deleted] = False
+        self._swap(columns, positions)
+
+    def refresh(self):
+        """Merge the books written since the last refresh, checked at most once per interval"""
+        now = time.monotonic()
+        if now - self._refreshed_at < settings.BOOKS_CATALOG_REFRESH_INTERVAL:
+            return
+        # Another request is already refreshing or a load is running
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed_at = now
+            book_ids = self._changes.read()
+            if book_ids is None:
+                self._reload.start()
+            elif book_ids:
+                self._merge(book_ids)
+        finally:
+            self._lock.release()
+
+    def discard(self, book_id):
+        """Hide a row deleted in this process right away, before the next refresh"""
+        # While a refresh or load holds the lock, the change log carries the delete instead
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            row = self._positions.get(book_id)
+            if row is None:
+                return
+            columns, orders = self._state
+            columns = dict(columns)
+            columns['is_active'] = columns['is_active'].copy()
+            columns['is_active'][row] = False
+            self._state = (columns, orders)
+        finally:
+            self._lock.release()
+
+    # Lookup
+
+    def page(self, sort_by='-created_at', offset=0, limit=20, category=None, author=None,
+             min_price=None, max_price=None, language=None, rating=None, in_stock=None,
+             book_ids=None):
+        """
+        Return (ids, total) for one page of active books matching the
+        `get_books` filters, or None when `sort_by` is not supported or
+        the first load is still running.
+        """
+        field = sort_by.lstrip('-')
+        if field not in SORT_FIELDS:
+            return None
+        if self._state is None:
+            self._reload.start()
+            return None
+        self.refresh()
+        columns, orders = self._state
+
+        mask = columns['is_active'].copy()
+        if category:
+            mask &= np.isin(columns['category_id'], category)
+        if author:
+            mask &= np.isin(columns['author_id'], author)
+        if min_price is not None:
+            mask &= columns['effective_price'] >= min_price
+        if max_price is not None:
+            mask &= columns['effective_price'] <= max_price
+        if language:
+            mask &= np.isin(columns['language'], language)
+        if rating:
+            mask &= columns['rating'] >= rating
+        if in_stock:
+            mask &= columns['stock'] > 0
+        if book_ids is not None:
+            mask &= np.isin(columns['id'], book_ids)
+
+        order = orders[field]
+        if sort_by.startswith('-'):
+            order = order[::-1]
+        matching = order[mask[order]]
+        return columns['id'][matching[offset:offset + limit]].tolist(), len(matching)
+
+
+def hydrate(queryset, book_ids):
+    """Rows of `queryset` (instances or values() dicts) for `book_ids`, in that order"""
+    books = {
+        row['id'] if isinstance(row, dict) else row.pk: row
+        for row in queryset.filter(id__in=book_ids)
+    }
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+
+catalog_snapshot = CatalogSnapshot()
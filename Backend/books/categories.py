@@ -0,0 +1,82 @@
+"""
+Category tree for Books app
+The active category tree built from materialised paths in one query and served from the cache
+"""
+
+import time
+
+from django.core.cache import cache
+
+from .models import Category
+
+
+TREE_KEY = 'books:category_tree'
+# time.time_ns() of the last tree change, for validators of responses that embed the tree
+TREE_VERSION_KEY = 'books:category_tree:version'
+
+TREE_FIELDS = ('id', 'name', 'slug', 'icon', 'parent_id', 'depth')
+
+
+def build_category_tree():
+    """
+    Nested active categories, siblings by name. Ordering by depth brings
+    every parent before its children, so one pass links the whole tree.
+    Categories below an inactive one are left out with it.
+    """
+    nodes = {}
+    roots = []
+    for row in Category.objects.filter(is_active=True).order_by('depth', 'name').values(*TREE_FIELDS):
+        node = {
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'icon': row['icon'],
+            'parent': row['parent_id'],
+            'depth': row['depth'],
+            'children': [],
+        }
+        if row['parent_id'] is None:
+            roots.append(node)
+        elif row['parent_id'] in nodes:
+            nodes[row['parent_id']]['children'].append(node)
+        else:
+            continue
+        nodes[row['id']] = node
+    return roots
+
+
+def category_tree():
+    """The cached tree; rebuilt on the first read after a category changes"""
+    tree = cache.get(TREE_KEY)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(TREE_KEY, tree, None)
+    return tree
+
+
+def category_tree_version():
+    return cache.get_or_set(TREE_VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_category_tree():
+    cache.delete(TREE_KEY)
+    cache.set(TREE_VERSION_KEY, time.time_ns(), None)
+
+
+def category_node(category_id):
+    """One category's node from the cached tree, children included, or None"""
+    stack = list(category_tree())
+    while stack:
+        node = stack.pop()
+        if node['id'] == category_id:
+            return node
+        stack.extend(node['children'])
+    return None
+
+
+def subtree_ids(category_id):
+    """Ids of a category and all its descendants, via an indexed prefix match on path"""
+    path = Category.objects.filter(id=category_id).values_list('path', flat=True).first()
+    if path is None:
+        return []
+    return list(Category.objects.filter(path__startswith=path).values_list('id', flat=True))
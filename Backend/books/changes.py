@@ -0,0 +1,89 @@
+"""
+Book change log for Books app
+Ids of written books, read by the in-process indexes to apply other workers' writes one book at a time
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import BookChange
+
+
+# Seconds between prunes of expired rows in one process
+PRUNE_INTERVAL = 600
+
+_pruned_at = 0.0
+
+
+def log_book_changes(book_ids):
+    """Record a write to each of `book_ids`; call inside the transaction that made it"""
+    BookChange.objects.bulk_create([BookChange(book_id=book_id) for book_id in book_ids])
+    _prune()
+
+
+def _prune():
+    global _pruned_at
+    now = time.monotonic()
+    if now - _pruned_at < PRUNE_INTERVAL:
+        return
+    _pruned_at = now
+    expired = timezone.now() - timedelta(hours=settings.BOOKS_CHANGE_LOG_RETENTION_HOURS)
+    BookChange.objects.filter(created_at__lt=expired).delete()
+
+
+class ChangeFeed:
+    """
+    One reader's position in the change log. `start` is called before a
+    full load; `read` then returns the ids of books written since, or None
+    when the reader has been idle past the retention and only a full load
+    is safe.
+
+    Ids are handed out when a transaction inserts, not when it commits, so
+    a row can appear below ids already read. The position therefore only
+    moves over a missing id once the row after it is
+    BOOKS_CHANGE_LOG_GAP_SECONDS old, by when that write is visible or was
+    rolled back; rows read above the position are remembered so they are
+    not returned twice.
+    """
+
+    def __init__(self):
+        self._position = None
+        self._seen = set()
+        self._read_at = None
+
+    def _settled(self, now):
+        return now - timedelta(seconds=settings.BOOKS_CHANGE_LOG_GAP_SECONDS)
+
+    def start(self):
+        now = timezone.now()
+        # Recent rows are read again after the load; applying a book twice is harmless
+        settled = BookChange.objects.filter(created_at__lt=self._settled(now))
+        self._position = settled.aggregate(last=Max('id'))['last'] or 0
+        self._seen = set()
+        self._read_at = now
+
+    def read(self):
+        """Ids of the books written since the last read, or None if a full load is needed"""
+        now = timezone.now()
+        retention = timedelta(hours=settings.BOOKS_CHANGE_LOG_RETENTION_HOURS)
+        if self._position is None or now - self._read_at >= retention:
+            return None
+        settled = self._settled(now)
+        rows = BookChange.objects.filter(id__gt=self._position).order_by('id')
+        book_ids = set()
+        advancing = True
+        for change_id, book_id, created_at in rows.values_list('id', 'book_id', 'created_at'):
+            if change_id not in self._seen:
+                book_ids.add(book_id)
+            if advancing and (change_id == self._position + 1 or created_at < settled):
+                self._position = change_id
+                self._seen.discard(change_id)
+            else:
+                advancing = False
+                self._seen.add(change_id)
+        self._read_at = now
+        return book_ids
@@ -0,0 +1,97 @@
+"""
+Response compression for Books app
+Accept-Encoding negotiation (brotli, gzip) shared by Django and FastAPI
+"""
+
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate(accept_encoding):
+    """Best encoding the client accepts: 'br', 'gzip' or None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def is_compressible(content_type, content_encoding=None):
+    """
+    Whether responses of this type may be compressed. Every such response
+    varies on Accept-Encoding, including ones sent as is because they are
+    small or the client accepts no encoding, so a shared cache never
+    hands a stored identity body to a gzip client or the other way round.
+    """
+    return content_encoding is None and (content_type or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def should_compress(content_type, size, content_encoding=None):
+    return is_compressible(content_type, content_encoding) and size >= settings.BOOKS_COMPRESSION_MIN_SIZE
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def weaken_etag(etag):
+    """A compressed body is a different byte sequence, so a strong ETag must become weak"""
+    if etag and not etag.startswith('W/'):
+        return f'W/{etag}'
+    return etag
+
+
+class CompressionMiddleware:
+    """
+    Django middleware compressing responses of at least
+    BOOKS_COMPRESSION_MIN_SIZE bytes with brotli or gzip, whichever the
+    client prefers. Streaming responses are left alone.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or not is_compressible(
+            response.get('Content-Type'), response.get('Content-Encoding')
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.BOOKS_COMPRESSION_MIN_SIZE:
+            return response
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        response.content = compress(response.content, encoding)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = weaken_etag(response['ETag'])
+        return response
@@ -0,0 +1,115 @@
+"""
+Conditional GET for Books app
+ETag and Last-Modified validators for catalog lists and single books
+"""
+
+import functools
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import catalog_version, filter_signature
+from .categories import category_tree_version
+from .models import Author, Book, Category, Publisher
+
+
+def _etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+
+def catalog_state():
+    """
+    Newest updated_at across books and the authors, categories and
+    publishers they show, plus the number of books (so a deletion changes
+    the state too). Computed once per catalog version.
+    """
+    key = f'books:catalog_state:{catalog_version()}'
+    state = cache.get(key)
+    if state is None:
+        books = Book.objects.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+        stamps = [books['updated_at']] + [
+            model.objects.aggregate(updated_at=Max('updated_at'))['updated_at']
+            for model in (Author, Category, Publisher)
+        ]
+        state = (max((stamp for stamp in stamps if stamp), default=None), books['count'])
+        cache.set(key, state, settings.BOOKS_COUNT_CACHE_TIMEOUT)
+    return state
+
+
+def list_validators(scope, query_params):
+    """(etag, last_modified) for a listing; every query parameter is part of the ETag"""
+    last_modified, count = catalog_state()
+    signature = filter_signature(scope, {name: query_params.getlist(name) for name in query_params})
+    return _etag(signature, last_modified.isoformat() if last_modified else '', count), last_modified
+
+
+def book_validators(**lookup):
+    """
+    (etag, last_modified) for one active book, or (None, None) if there is
+    no such book. The detail nests its author, category and publisher, with
+    their book counts and the category's children from the cached tree, so
+    those rows and the tree version count as well as the book's own.
+    """
+    row = (
+        Book.objects.filter(is_active=True, **lookup)
+        .values_list(
+            'id', 'updated_at', 'author__updated_at', 'category__updated_at', 'publisher__updated_at',
+            'author__active_book_count', 'category__active_book_count', 'publisher__active_book_count',
+        )
+        .first()
+    )
+    if row is None:
+        return None, None
+    tree_version = category_tree_version()
+    tree_changed_at = datetime.fromtimestamp(tree_version / 1e9, tz=dt_timezone.utc)
+    last_modified = max(*row[1:5], tree_changed_at)
+    return _etag(row[0], last_modified.isoformat(), *row[5:], tree_version), last_modified
+
+
+def validator_headers(etag, last_modified):
+    headers = {'ETag': quote_etag(etag), 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return headers
+
+
+def not_modified(headers, etag, last_modified):
+    """Whether the client's cached copy is current; If-None-Match wins over If-Modified-Since"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        return '*' in etags or quote_etag(etag) in etags
+    if_modified_since = parse_http_date_safe(headers.get('if-modified-since') or '')
+    if if_modified_since is None or last_modified is None:
+        return False
+    return int(last_modified.timestamp()) <= if_modified_since
+
+
+def conditional(validators):
+    """
+    Decorate a DRF view method with conditional GET.
+    `validators(view, request, *args, **kwargs)` returns (etag, last_modified);
+    a matching request gets 304 before the method, and so serialisation, runs.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag, last_modified = validators(view, request, *args, **kwargs)
+            if etag is None:
+                return method(view, request, *args, **kwargs)
+            headers = validator_headers(etag, last_modified)
+            if not_modified(request.headers, etag, last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                for name, value in headers.items():
+                    response[name] = value
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Co-purchase engine for Books app
+"Customers also bought" neighbours from a sparse item-item co-occurrence matrix
+"""
+
+import math
+from collections import Counter
+from itertools import groupby
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count
+
+from orders.models import OrderItem
+
+from .models import BookCoPurchase
+from .refresh import RefreshQueue
+
+try:
+    import numpy as np
+except ImportError:  # only the batch build needs it
+    np = None
+
+
+# Orders that never became a purchase do not count as buying two books together
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+
+def purchases():
+    """OrderItem rows of orders that went through"""
+    return OrderItem.objects.exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+
+
+def baskets():
+    """Sorted distinct book ids of each completed order, streamed in order id order"""
+    rows = purchases().order_by('order_id').values_list('order_id', 'book_id').iterator(chunk_size=5000)
+    for _, items in groupby(rows, key=lambda row: row[0]):
+        yield sorted({book_id for _, book_id in items})
+
+
+def basket_co_purchases(book_ids):
+    """
+    {book_id: Counter(other_id: orders with both)} for each of `book_ids`,
+    skipping baskets over BOOKS_ALSO_BOUGHT_MAX_BASKET books like the full
+    build does. One query over the orders that contain any of them.
+    """
+    wanted = set(book_ids)
+    max_basket = settings.BOOKS_ALSO_BOUGHT_MAX_BASKET
+    counts = {book_id: Counter() for book_id in wanted}
+    orders = purchases().filter(book_id__in=wanted).values('order_id')
+    rows = (
+        purchases().filter(order_id__in=orders)
+        .order_by('order_id')
+        .values_list('order_id', 'book_id')
+        .iterator(chunk_size=5000)
+    )
+    for _, items in groupby(rows, key=lambda row: row[0]):
+        basket = {book_id for _, book_id in items}
+        if len(basket) > max_basket:
+            continue
+        for book_id in basket & wanted:
+            counts[book_id].update(basket - {book_id})
+    return counts
+
+
+def book_co_purchases(book_id):
+    """{other_id: orders with both} for one book"""
+    return basket_co_purchases([book_id])[book_id]
+
+
+def cosine(together, orders_i, orders_j):
+    """Score `together` co-purchases of two books bought in `orders_i` and `orders_j` orders"""
+    return together / math.sqrt(orders_i * orders_j)
+
+
+class CoOccurrence:
+    """
+    Book-by-book co-occurrence counts in coordinate (COO) form.
+    `book_ids[k]` is the book behind matrix index k; (`rows`, `cols`,
+    `counts`) hold every ordered pair bought together in at least one
+    order, and `orders` counts each book's orders (the diagonal).
+    """
+
+    def __init__(self, book_ids, rows, cols, counts, orders, total_orders):
+        self.book_ids = book_ids
+        self.rows = rows
+        self.cols = cols
+        self.counts = counts
+        self.orders = orders
+        self.total_orders = total_orders
+
+    @classmethod
+    def build(cls):
+        """Stream completed orders once and count every pair inside each basket"""
+        if np is None:
+            raise ImproperlyConfigured('Building co-purchases requires numpy')
+        max_basket = settings.BOOKS_ALSO_BOUGHT_MAX_BASKET
+        bought, items, sizes = [], [], []
+        total_orders = 0
+        for basket in baskets():
+            total_orders += 1
+            bought.extend(basket)
+            # Very large baskets (bulk or institutional buys) say little about taste
+            if 1 < len(basket) <= max_basket:
+                items.extend(basket)
+                sizes.append(len(basket))
+
+        bought = np.array(bought, dtype=np.int64)
+        book_ids = np.unique(bought)
+        orders = np.bincount(np.searchsorted(book_ids, bought), minlength=len(book_ids))
+        item_index = np.searchsorted(book_ids, np.array(items, dtype=np.int64))
+        sizes = np.array(sizes, dtype=np.int64)
+        # Self-join each basket without a Python loop: item p pairs with
+        # every position of its own basket, [start, start + size)
+        item_sizes = np.repeat(sizes, sizes)
+        item_starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+        left = np.repeat(np.arange(len(item_index)), item_sizes)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(item_sizes) - item_sizes, item_sizes)
+        right = np.repeat(item_starts, item_sizes) + offsets
+        distinct = left != right
+        pairs = item_index[left[distinct]] * len(book_ids) + item_index[right[distinct]]
+        keys, counts = np.unique(pairs, return_counts=True)
+        return cls(book_ids, keys // len(book_ids), keys % len(book_ids), counts, orders, total_orders)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def top(self, size, min_orders):
+        """(book_ids, related_ids, together, scores) of each book's `size` best-scoring neighbours"""
+        keep = self.counts >= min_orders
+        rows, cols, counts = self.rows[keep], self.cols[keep], self.counts[keep]
+        orders_i = self.orders[rows].astype(np.float64)
+        orders_j = self.orders[cols].astype(np.float64)
+        if settings.BOOKS_ALSO_BOUGHT_METRIC == 'lift':
+            scores = counts * self.total_orders / (orders_i * orders_j)
+        else:
+            scores = counts / np.sqrt(orders_i * orders_j)
+
+        # Group by row with the best score first, then cut every group at `size`
+        order = np.lexsort((self.book_ids[cols], -scores, rows))
+        rows, cols, counts, scores = rows[order], cols[order], counts[order], scores[order]
+        starts = np.searchsorted(rows, rows, side='left')
+        ranked = np.arange(len(rows)) - starts < size
+        return (self.book_ids[rows[ranked]], self.book_ids[cols[ranked]],
+                counts[ranked], scores[ranked])
+
+
+def rebuild_co_purchases():
+    """Replace every stored neighbour list from the full order history; returns (pairs, rows written)"""
+    matrix = CoOccurrence.build()
+    book_ids, related_ids, together, scores = matrix.top(
+        settings.BOOKS_ALSO_BOUGHT_SIZE, settings.BOOKS_ALSO_BOUGHT_MIN_ORDERS
+    )
+    with transaction.atomic():
+        BookCoPurchase.objects.all().delete()
+        BookCoPurchase.objects.bulk_create(
+            (
+                BookCoPurchase(book_id=book_id, related_id=related_id, orders=count, score=score)
+                for book_id, related_id, count, score in zip(
+                    book_ids.tolist(), related_ids.tolist(), together.tolist(), scores.tolist()
+                )
+            ),
+            batch_size=5000
+        )
+    return len(matrix), len(book_ids)
+
+
+def refresh_co_purchases(book_ids):
+    """
+    Recompute the lists a batch of purchases of `book_ids` can change.
+    Cosine divides by each book's order count, so besides the bought
+    books' own lists, every list that holds or could now hold one of them
+    is rebuilt too; the rest of the table does not depend on them. Lift
+    also scales every score by the total number of orders, so with that
+    metric only a full rebuild is correct.
+    """
+    if settings.BOOKS_ALSO_BOUGHT_METRIC == 'lift':
+        rebuild_co_purchases()
+        return
+    touched = set(book_ids)
+    affected = {
+        *touched,
+        *(other_id for bought in basket_co_purchases(touched).values() for other_id in bought),
+        *BookCoPurchase.objects.filter(related_id__in=touched).values_list('book_id', flat=True),
+    }
+    together = basket_co_purchases(affected)
+    neighbours = {other_id for bought in together.values() for other_id in bought}
+    orders = dict(
+        purchases().filter(book_id__in=affected | neighbours)
+        .values_list('book_id')
+        .annotate(orders=Count('order_id', distinct=True))
+    )
+    rows = []
+    for book_id in affected:
+        scored = sorted(
+            (
+                (cosine(count, orders[book_id], orders[other_id]), other_id, count)
+                for other_id, count in together[book_id].items()
+                if count >= settings.BOOKS_ALSO_BOUGHT_MIN_ORDERS
+            ),
+            key=lambda item: (-item[0], item[1])
+        )[:settings.BOOKS_ALSO_BOUGHT_SIZE]
+        rows.extend(
+            BookCoPurchase(book_id=book_id, related_id=other_id, orders=count, score=score)
+            for score, other_id, count in scored
+        )
+
+    with transaction.atomic():
+        BookCoPurchase.objects.filter(book_id__in=affected).delete()
+        BookCoPurchase.objects.bulk_create(rows, batch_size=5000)
+
+
+co_purchase_refresh = RefreshQueue('co-purchases', refresh_co_purchases)
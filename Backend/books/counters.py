@@ -0,0 +1,90 @@
+"""
+Book counters for Books app
+Denormalised active_book_count on categories, authors and publishers
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Author, Book, Category, Publisher
+
+
+# Book column -> model whose rows count the active books pointing at them
+COUNTED_RELATIONS = {'category_id': Category, 'author_id': Author, 'publisher_id': Publisher}
+
+
+def _counted(values):
+    """The relation ids a book counts towards, or None if it counts nowhere"""
+    if not values or not values.get('is_active'):
+        return None
+    return {attname: values.get(attname) for attname in COUNTED_RELATIONS}
+
+
+def book_counts_changed(book, created=False, deleted=False):
+    """
+    Move a saved or deleted book's +1 between the rows it counted towards
+    before and the ones it counts towards now, touching their updated_at so
+    validators of responses that show the count move too. Runs inside the Book save or
+    delete transaction, so counters never disagree with a committed book.
+    """
+    current = {attname: getattr(book, attname) for attname in ('is_active', *COUNTED_RELATIONS)}
+    loaded = getattr(book, '_loaded_values', None)
+    if created:
+        before, after = None, _counted(current)
+    elif deleted:
+        before, after = _counted({**current, **(loaded or {})}), None
+    elif loaded is None or not {'is_active', *COUNTED_RELATIONS} <= loaded.keys():
+        # Saved without a loaded copy: the old state is unknown, count again
+        recount_book_relations([book.pk])
+        return
+    else:
+        before, after = _counted(loaded), _counted(current)
+
+    for attname, model in COUNTED_RELATIONS.items():
+        old = before[attname] if before else None
+        new = after[attname] if after else None
+        if old == new:
+            continue
+        if old is not None:
+            model.objects.filter(id=old).update(active_book_count=F('active_book_count') - 1, updated_at=timezone.now())
+        if new is not None:
+            model.objects.filter(id=new).update(active_book_count=F('active_book_count') + 1, updated_at=timezone.now())
+
+
+def _active_books(attname):
+    return Coalesce(
+        Subquery(
+            Book.objects.filter(is_active=True, **{attname: OuterRef('pk')})
+            .order_by()
+            .values(attname)
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def recount(model, attname, ids=None):
+    """Rewrite stored counts that drifted; returns how many rows were corrected"""
+    rows = model.objects.all() if ids is None else model.objects.filter(id__in=ids)
+    drifted = rows.annotate(actual=_active_books(attname)).filter(~Q(active_book_count=F('actual')))
+    return model.objects.filter(id__in=drifted.values('id')).update(
+        active_book_count=_active_books(attname), updated_at=timezone.now()
+    )
+
+
+def recount_book_relations(book_ids):
+    """Recount the categories, authors and publishers of `book_ids` after bulk updates"""
+    rows = list(Book.objects.filter(id__in=book_ids).values_list(*COUNTED_RELATIONS))
+    for position, (attname, model) in enumerate(COUNTED_RELATIONS.items()):
+        recount(model, attname, {row[position] for row in rows})
+
+
+def reconcile_book_counts():
+    """{model name: rows corrected} after recounting every category, author and publisher"""
+    return {
+        model._meta.verbose_name_plural: recount(model, attname)
+        for attname, model in COUNTED_RELATIONS.items()
+    }
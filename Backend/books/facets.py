@@ -0,0 +1,124 @@
+"""
+Facets for Books app
+Per-family counts for the current listing filters, cached under the filter signature
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import catalog_version
+
+
+FACET_FAMILIES = ('category', 'author', 'language', 'price')
+
+# Query parameters that filter on each family
+FACET_PARAMS = {
+    'category': ('category', 'category_tree'),
+    'author': ('author',),
+    'language': ('language',),
+    'price': ('min_price', 'max_price'),
+}
+
+
+def parse_facets(value):
+    """
+    Read a `facets=` parameter: a comma-separated list of families, or
+    `all`/`true` for every family. Unknown names are ignored.
+    """
+    if not value:
+        return []
+    names = [name.strip().lower() for name in value.split(',')]
+    if 'all' in names or 'true' in names:
+        return list(FACET_FAMILIES)
+    return [family for family in FACET_FAMILIES if family in names]
+
+
+def price_buckets():
+    """[(low, high)] ranges from the BOOKS_PRICE_BUCKETS boundaries; None is open"""
+    bounds = [None] + list(settings.BOOKS_PRICE_BUCKETS) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _grouped(queryset, field, *labels):
+    """One GROUP BY query: the biggest BOOKS_FACET_SIZE values of `field`"""
+    rows = (
+        queryset.order_by()
+        .values(field, *labels)
+        .annotate(count=Count('id'))
+        .order_by('-count', field)[:settings.BOOKS_FACET_SIZE]
+    )
+    return list(rows)
+
+
+def _category_facet(queryset):
+    return [
+        {'id': row['category_id'], 'name': row['category__name'], 'slug': row['category__slug'], 'count': row['count']}
+        for row in _grouped(queryset, 'category_id', 'category__name', 'category__slug')
+    ]
+
+
+def _author_facet(queryset):
+    return [
+        {'id': row['author_id'], 'name': row['author__name'], 'slug': row['author__slug'], 'count': row['count']}
+        for row in _grouped(queryset, 'author_id', 'author__name', 'author__slug')
+    ]
+
+
+def _language_facet(queryset):
+    return [
+        {'value': row['language'], 'count': row['count']}
+        for row in _grouped(queryset, 'language')
+    ]
+
+
+def _price_facet(queryset):
+    """Every bucket in one pass with conditional aggregation"""
+    buckets = price_buckets()
+    aggregates = {}
+    for position, (low, high) in enumerate(buckets):
+        condition = Q()
+        if low is not None:
+            condition &= Q(effective_price__gte=low)
+        if high is not None:
+            condition &= Q(effective_price__lt=high)
+        aggregates[f'bucket_{position}'] = Count('id', filter=condition)
+    counts = queryset.order_by().aggregate(**aggregates)
+    return [
+        {'min': low, 'max': high, 'count': counts[f'bucket_{position}']}
+        for position, (low, high) in enumerate(buckets)
+    ]
+
+
+FACET_BUILDERS = {
+    'category': _category_facet,
+    'author': _author_facet,
+    'language': _language_facet,
+    'price': _price_facet,
+}
+
+
+def facet_counts(queryset, signature, families, without=None):
+    """
+    Counts for each requested family over `queryset`, one query per family.
+    `without(family)` returns the listing without that family's own filter:
+    a family is counted over it, so picking one language still shows how
+    many books the other languages have. Families are cached separately
+    under the listing's filter signature, so a request for `category`
+    reuses what an earlier `facets=all` computed.
+    """
+    version = catalog_version()
+    keys = {family: f'books:facets:{version}:{signature}:{family}' for family in families}
+    cached = cache.get_many(keys.values())
+    facets = {}
+    missing = {}
+    for family, key in keys.items():
+        if key in cached:
+            facets[family] = cached[key]
+        else:
+            source = queryset if without is None else without(family)
+            facets[family] = FACET_BUILDERS[family](source)
+            missing[key] = facets[family]
+    if missing:
+        cache.set_many(missing, settings.BOOKS_COUNT_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,17 @@
+"""
+Filter backends for Books app
+"""
+
+from rest_framework import filters
+
+from .pagination import resolve_ordering
+
+
+class BookOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that sorts the public `price` ordering by effective_price"""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [resolve_ordering(term) for term in ordering]
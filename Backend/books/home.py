@@ -0,0 +1,55 @@
+"""
+Homepage bootstrap for Books app
+Every shelf and the category menu in one cached payload with its own ETag
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from .categories import category_tree, category_tree_version
+from .renderers import dumps
+from .shelves import shelf_payload, shelf_version
+
+
+# Shelves on the homepage, in the order the page shows them
+HOME_SHELVES = ('featured', 'bestsellers', 'new_arrivals')
+HOME_SHELF_SIZE = 10
+
+
+def _key(variant):
+    return f'books:home:{variant}'
+
+
+def home_payload(variant, serialize):
+    """
+    (etag, payload) for the homepage. The cached bundle is tagged with the
+    shelf and category tree versions it was built from, so an invalidation
+    is picked up on the next read; a warm read is cache gets only, no queries.
+    """
+    versions = (*(shelf_version(name) for name in HOME_SHELVES), category_tree_version())
+    entry = cache.get(_key(variant))
+    if entry is not None and entry['versions'] == versions:
+        return entry['etag'], entry['payload']
+
+    payload = {
+        **{name: shelf_payload(name, serialize, variant, limit=HOME_SHELF_SIZE) for name in HOME_SHELVES},
+        'categories': category_tree(),
+    }
+    # The JSON both apps send, so the tag does not depend on dict or Decimal reprs
+    etag = hashlib.sha1(dumps(payload)).hexdigest()[:32]
+    cache.set(
+        _key(variant),
+        {'versions': versions, 'etag': etag, 'payload': payload},
+        settings.BOOKS_HOME_CACHE_TIMEOUT
+    )
+    return etag, payload
+
+
+def home_headers(etag):
+    return {
+        'ETag': quote_etag(etag),
+        'Cache-Control': f'public, max-age={settings.BOOKS_HOME_CACHE_TIMEOUT}',
+    }
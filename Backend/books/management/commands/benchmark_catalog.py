@@ -0,0 +1,136 @@
+"""
+Management command to benchmark the columnar catalog snapshot against
+the ORM listing path of get_books
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from books.catalog import CatalogSnapshot, hydrate
+from books.models import Author, Book, Category, Publisher
+
+
+SORTS = ['-created_at', 'created_at', '-effective_price', 'effective_price', '-rating', 'rating', 'title', '-title']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the NumPy catalog snapshot against the ORM on synthetic books (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000, help='Synthetic books to insert')
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.stdout.write(f"Inserting {options['size']} synthetic books...")
+            categories, authors = self.populate(rng, options['size'])
+            requests = [self.make_request(rng, categories, authors) for _ in range(options['requests'])]
+            queryset = Book.objects.filter(is_active=True).select_related('author', 'category', 'publisher')
+            page_size = options['page_size']
+
+            started = time.perf_counter()
+            snapshot = CatalogSnapshot()
+            snapshot.warm()
+            build = time.perf_counter() - started
+            columns, orders = snapshot._state
+            memory = sum(array.nbytes for array in columns.values()) + sum(array.nbytes for array in orders.values())
+            self.stdout.write(f'Snapshot of {len(snapshot)} rows built in {build:.2f}s, '
+                              f'{memory / 2**20:.1f} MB of arrays')
+
+            def orm(request):
+                books = queryset
+                if request['category']:
+                    books = books.filter(category_id__in=request['category'])
+                if request['author']:
+                    books = books.filter(author_id__in=request['author'])
+                if request['min_price'] is not None:
+                    books = books.filter(effective_price__gte=request['min_price'])
+                if request['max_price'] is not None:
+                    books = books.filter(effective_price__lte=request['max_price'])
+                if request['language']:
+                    books = books.filter(language__in=request['language'])
+                if request['in_stock']:
+                    books = books.filter(stock__gt=0)
+                paginator = Paginator(books.order_by(request['sort_by']), page_size)
+                page = paginator.get_page(request['page'])
+                return list(page), paginator.count
+
+            def columnar(request):
+                filters = {name: value for name, value in request.items() if name not in ('sort_by', 'page')}
+                ids, total = snapshot.page(request['sort_by'], (request['page'] - 1) * page_size, page_size, **filters)
+                return hydrate(queryset, ids), total
+
+            self.report('orm', self.timed(orm, requests))
+            self.report('snapshot', self.timed(columnar, requests))
+            transaction.set_rollback(True)
+
+    def populate(self, rng, size):
+        categories = [
+            Category.objects.create(name=f'Benchmark category {i}', slug=f'benchmark-category-{i}')
+            for i in range(20)
+        ]
+        authors = [
+            Author.objects.create(name=f'Benchmark author {i}', slug=f'benchmark-author-{i}')
+            for i in range(500)
+        ]
+        publisher = Publisher.objects.create(name='Benchmark publisher', slug='benchmark-publisher')
+        languages = [code for code, _ in Book.LANGUAGE_CHOICES]
+        batch = []
+        for i in range(size):
+            price = Decimal(rng.randrange(10000, 200000, 500))
+            batch.append(Book(
+                title=f'Benchmark book {rng.randrange(10**6):06d} {i}',
+                slug=f'benchmark-book-{i}',
+                description='Synthetic benchmark book',
+                author=rng.choice(authors),
+                category=rng.choice(categories),
+                publisher=publisher,
+                price=price,
+                discount_price=price * Decimal('0.9') if rng.random() < 0.3 else None,
+                stock=rng.choice([0, 0, 5, 20, 100]),
+                pages=rng.randint(50, 900),
+                language=rng.choice(languages),
+                publication_year=rng.randint(1950, 2024),
+                cover_image='books/covers/benchmark.jpg',
+                rating=Decimal(rng.randint(0, 500)) / 100,
+                is_active=rng.random() < 0.95,
+            ))
+            if len(batch) >= 5000:
+                Book.objects.bulk_create(batch)
+                batch = []
+        Book.objects.bulk_create(batch)
+        return [c.id for c in categories], [a.id for a in authors]
+
+    def make_request(self, rng, categories, authors):
+        low = rng.choice([None, 20000, 50000])
+        return {
+            'sort_by': rng.choice(SORTS),
+            'page': rng.randint(1, 5),
+            'category': rng.sample(categories, rng.randint(1, 3)) if rng.random() < 0.6 else None,
+            'author': rng.sample(authors, 1) if rng.random() < 0.1 else None,
+            'min_price': low,
+            'max_price': low + 100000 if low is not None and rng.random() < 0.5 else None,
+            'language': ['uz'] if rng.random() < 0.3 else None,
+            'in_stock': rng.random() < 0.3,
+        }
+
+    def timed(self, run, requests):
+        timings = []
+        for request in requests:
+            started = time.perf_counter()
+            run(request)
+            timings.append(time.perf_counter() - started)
+        return sorted(timings)
+
+    def report(self, engine, timings):
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        self.stdout.write(self.style.SUCCESS(f'✓ {engine:<9} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms'))
@@ -0,0 +1,103 @@
+"""
+Management command to benchmark the values() list projection against
+model instances for book list rows
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.models import Author, Book, Category, Publisher
+from books.projection import list_rows, project_books
+
+
+def model_rows(queryset):
+    """The dict comprehension the FastAPI routes used before the projection"""
+    return [
+        {
+            "id": book.id,
+            "title": book.title,
+            "slug": book.slug,
+            "author": book.author.name,
+            "author_id": book.author.id,
+            "category": book.category.name,
+            "category_id": book.category.id,
+            "price": float(book.price),
+            "discount_price": float(book.discount_price) if book.discount_price else None,
+            "final_price": float(book.final_price),
+            "discount_percentage": book.discount_percentage,
+            "cover_image": str(book.cover_image) if book.cover_image else "",
+            "rating": float(book.rating),
+            "review_count": book.review_count,
+            "is_in_stock": book.is_in_stock,
+            "is_featured": book.is_featured,
+            "is_bestseller": book.is_bestseller,
+        }
+        for book in queryset.select_related('author', 'category', 'publisher')
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list rows from model instances vs the values() projection (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--description-size', type=int, default=4000,
+                            help='Characters of description per synthetic book')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['rows'], options['description_size'])
+            queryset = Book.objects.filter(is_active=True, slug__startswith='benchmark-book-').order_by('-created_at')
+            self.stdout.write(f"  {'path':<10} {'p50 ms':>9} {'peak KB':>9} {'blocks':>8}   per {options['rows']} rows")
+            self.report('models', lambda: model_rows(queryset), options['rounds'])
+            self.report('projection', lambda: list_rows(project_books(queryset)), options['rounds'])
+            transaction.set_rollback(True)
+
+    def report(self, path, build, rounds):
+        build()  # warm the query compiler and connection
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            build()
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        rows = build()
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+        del rows
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {path:<10} {statistics.median(timings) * 1000:>9.2f} {peak / 1024:>9.1f} {blocks:>8}'
+        ))
+
+    def populate(self, size, description_size):
+        rng = random.Random(42)
+        category = Category.objects.create(name='Benchmark category', slug='benchmark-category')
+        author = Author.objects.create(name='Benchmark author', slug='benchmark-author')
+        publisher = Publisher.objects.create(name='Benchmark publisher', slug='benchmark-publisher')
+        Book.objects.bulk_create([
+            Book(
+                title=f'Benchmark book {i}',
+                slug=f'benchmark-book-{i}',
+                description='x' * description_size,
+                author=author, category=category, publisher=publisher,
+                price=Decimal(rng.randrange(10000, 200000, 500)),
+                discount_price=Decimal(rng.randrange(5000, 10000, 500)) if rng.random() < 0.3 else None,
+                stock=rng.randint(0, 50),
+                pages=rng.randint(50, 900),
+                language='uz',
+                publication_year=2020,
+                cover_image=f'books/covers/benchmark-{i}.jpg',
+                rating=Decimal(rng.randint(0, 500)) / 100,
+            )
+            for i in range(size)
+        ])
@@ -0,0 +1,126 @@
+"""
+Management command to benchmark JSON rendering and compression of
+book listing pages
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from books.compression import brotli, compress
+from books.models import Author, Book, Category, Publisher
+from books.renderers import FastJSONRenderer
+from books.serializers import BookListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark stock vs orjson rendering and gzip/brotli bytes per page size (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', nargs='+', type=int, default=[20, 50, 100])
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.populate(rng, max(options['page_sizes']))
+            books = list(
+                Book.objects.filter(title__startswith='Benchmark')
+                .select_related('author', 'category', 'publisher')
+                .order_by('-created_at')
+            )
+            header = (f"{'endpoint':<16} {'size':>5} {'renderer':<10} {'render ms':>10} "
+                      f"{'raw B':>8} {'gzip B':>8} {'br B':>8}")
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for page_size in options['page_sizes']:
+                page = books[:page_size]
+                drf_data = {'count': len(books), 'next': None, 'previous': None,
+                            'results': BookListSerializer(page, many=True).data}
+                self.report('BookViewSet.list', page_size, 'stock',
+                            lambda: JSONRenderer().render(drf_data), options['rounds'])
+                self.report('BookViewSet.list', page_size, 'orjson',
+                            lambda: FastJSONRenderer().render(drf_data), options['rounds'])
+                self.bench_fastapi(page, page_size, options['rounds'])
+            transaction.set_rollback(True)
+
+    def bench_fastapi(self, page, page_size, rounds):
+        try:
+            from fastapi.encoders import jsonable_encoder
+            from fastapi.responses import JSONResponse
+            from fastapi_app.responses import FastJSONResponse
+        except ImportError:
+            self.stdout.write(self.style.WARNING('FastAPI is not installed; skipping get_books'))
+            return
+        body = {
+            'books': [
+                {
+                    'id': book.id,
+                    'title': book.title,
+                    'slug': book.slug,
+                    'author': book.author.name,
+                    'author_id': book.author_id,
+                    'category': book.category.name,
+                    'category_id': book.category_id,
+                    'price': book.price,
+                    'discount_price': book.discount_price,
+                    'final_price': book.final_price,
+                    'discount_percentage': book.discount_percentage,
+                    'cover_image': str(book.cover_image),
+                    'rating': book.rating,
+                    'review_count': book.review_count,
+                    'is_in_stock': book.is_in_stock,
+                    'is_featured': book.is_featured,
+                    'is_bestseller': book.is_bestseller,
+                    'created_at': book.created_at,
+                }
+                for book in page
+            ],
+            'total': page_size, 'page': 1, 'page_size': page_size, 'total_pages': 1,
+        }
+        # response_model=dict: FastAPI runs jsonable_encoder, then JSONResponse
+        self.report('get_books', page_size, 'stock',
+                    lambda: JSONResponse(jsonable_encoder(body)).body, rounds)
+        self.report('get_books', page_size, 'orjson',
+                    lambda: FastJSONResponse(body).body, rounds)
+
+    def report(self, endpoint, page_size, renderer, render, rounds):
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            payload = render()
+            timings.append(time.perf_counter() - started)
+        gzip_size = len(compress(payload, 'gzip'))
+        br_size = len(compress(payload, 'br')) if brotli is not None else '-'
+        self.stdout.write(
+            f'{endpoint:<16} {page_size:>5} {renderer:<10} {statistics.median(timings) * 1000:>10.3f} '
+            f'{len(payload):>8} {gzip_size:>8} {br_size:>8}'
+        )
+
+    def populate(self, rng, size):
+        category = Category.objects.create(name='Benchmark category', slug='benchmark-category')
+        author = Author.objects.create(name='Benchmark author', slug='benchmark-author')
+        publisher = Publisher.objects.create(name='Benchmark publisher', slug='benchmark-publisher')
+        books = []
+        for i in range(size):
+            price = Decimal(rng.randrange(10000, 200000, 500))
+            books.append(Book(
+                title=f'Benchmark book {i}',
+                slug=f'benchmark-book-{i}',
+                description='Synthetic benchmark book',
+                author=author, category=category, publisher=publisher,
+                price=price,
+                discount_price=price * Decimal('0.9') if rng.random() < 0.3 else None,
+                stock=rng.randint(0, 50),
+                pages=rng.randint(50, 900),
+                language='uz',
+                publication_year=rng.randint(1950, 2024),
+                cover_image=f'books/covers/benchmark-{i}.jpg',
+                rating=Decimal(rng.randint(0, 500)) / 100,
+            ))
+        Book.objects.bulk_create(books)
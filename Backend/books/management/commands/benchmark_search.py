@@ -0,0 +1,142 @@
+"""
+Management command to benchmark the in-memory BM25 index against the
+chained icontains search it replaces
+"""
+import random
+import sqlite3
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from books.search.memory import InvertedIndex
+from books.search.normalize import normalize_terms
+
+
+SYLLABLES = ['ba', 'xt', 'li', 'ku', 'nl', 'ar', 'ot', 'ga', 'yo', 'sh', 'ch', 'qo',
+             'di', 'ri', 'na', 'vo', 'ma', 'ro', 'se', 'to', 'ki', 'ta', 'bo', 'lu']
+
+# The SQL Django emits for the old Q(title__icontains) | ... chain on SQLite;
+# get_books ran the COUNT for the paginator and then fetched the page
+ICONTAINS_WHERE = """
+    FROM book b
+    JOIN author a ON a.id = b.author_id
+    JOIN publisher p ON p.id = b.publisher_id
+    WHERE b.is_active = 1 AND (
+        b.title LIKE ? ESCAPE '\\' OR b.subtitle LIKE ? ESCAPE '\\' OR
+        b.description LIKE ? ESCAPE '\\' OR a.name LIKE ? ESCAPE '\\' OR
+        p.name LIKE ? ESCAPE '\\'
+    )
+"""
+ICONTAINS_COUNT_SQL = f'SELECT COUNT(DISTINCT b.id) {ICONTAINS_WHERE}'
+ICONTAINS_PAGE_SQL = f'SELECT DISTINCT b.id {ICONTAINS_WHERE} LIMIT ?'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark in-memory BM25 search against the icontains chain on synthetic catalogs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = self.make_vocabulary(rng, 20000)
+        header = f"{'books':>9} {'engine':<10} {'build s':>9} {'memory MB':>10} {'p50 ms':>9} {'p95 ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for size in options['sizes']:
+            books = list(self.make_books(rng, vocabulary, size))
+            queries = [
+                ' '.join(rng.sample(normalize_terms(rng.choice(books)['title']), 1))
+                for _ in range(options['queries'])
+            ]
+            self.report(size, 'bm25', *self.bench_memory(books, queries, options['limit']))
+            self.report(size, 'icontains', *self.bench_icontains(books, queries, options['limit']))
+            del books
+
+    def report(self, size, engine, build, memory, timings):
+        timings = sorted(timings)
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        self.stdout.write(
+            f'{size:>9} {engine:<10} {build:>9.2f} {memory / 2**20:>10.1f} {p50:>9.2f} {p95:>9.2f}'
+        )
+
+    def make_vocabulary(self, rng, count):
+        words = set()
+        while len(words) < count:
+            words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+        return sorted(words)
+
+    def make_books(self, rng, vocabulary, size):
+        # Zipf-like word choice so some terms are common and most are rare
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        for book_id in range(1, size + 1):
+            words = rng.choices(vocabulary, weights, k=40)
+            yield {
+                'id': book_id,
+                'title': ' '.join(words[:3]),
+                'subtitle': ' '.join(words[3:5]),
+                'description': ' '.join(words[5:37]),
+                'author': ' '.join(words[37:39]),
+                'publisher': words[39],
+            }
+
+    def timed_queries(self, run, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def bench_memory(self, books, queries, limit):
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = InvertedIndex()
+        for book in books:
+            index.add(book['id'], {
+                'title': f"{book['title']} {book['subtitle']}",
+                'names': f"{book['author']} {book['publisher']}",
+                'body': book['description'],
+            })
+        build = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        timings = self.timed_queries(lambda query: index.search(normalize_terms(query), limit), queries)
+        return build, memory, timings
+
+    def bench_icontains(self, books, queries, limit):
+        started = time.perf_counter()
+        db = sqlite3.connect(':memory:')
+        db.executescript("""
+            CREATE TABLE author (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE publisher (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE book (
+                id INTEGER PRIMARY KEY, title TEXT, subtitle TEXT, description TEXT,
+                author_id INTEGER, publisher_id INTEGER, is_active INTEGER
+            );
+        """)
+        db.executemany('INSERT INTO author VALUES (?, ?)', ((b['id'], b['author']) for b in books))
+        db.executemany('INSERT INTO publisher VALUES (?, ?)', ((b['id'], b['publisher']) for b in books))
+        db.executemany(
+            'INSERT INTO book VALUES (?, ?, ?, ?, ?, ?, 1)',
+            ((b['id'], b['title'], b['subtitle'], b['description'], b['id'], b['id']) for b in books)
+        )
+        db.commit()
+        build = time.perf_counter() - started
+        memory = db.execute('PRAGMA page_count').fetchone()[0] * db.execute('PRAGMA page_size').fetchone()[0]
+
+        def run(query):
+            patterns = [f'%{query}%'] * 5
+            db.execute(ICONTAINS_COUNT_SQL, patterns).fetchone()
+            db.execute(ICONTAINS_PAGE_SQL, patterns + [limit]).fetchall()
+
+        timings = self.timed_queries(run, queries)
+        db.close()
+        return build, memory, timings
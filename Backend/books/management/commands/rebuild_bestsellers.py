@@ -0,0 +1,15 @@
+"""
+Management command to rank bestsellers from recent sales
+"""
+from django.core.management.base import BaseCommand
+
+from books.bestsellers import rebuild_bestsellers
+
+
+class Command(BaseCommand):
+    help = 'Rank books by units sold over the rolling bestseller windows and set is_bestseller (run from cron)'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Ranking bestsellers...')
+        flagged = rebuild_bestsellers()
+        self.stdout.write(self.style.SUCCESS(f'✓ Flagged {flagged} bestsellers'))
@@ -0,0 +1,21 @@
+"""
+Management command to materialise personal recommendations for active users
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "recommended for you" lists for users active in the last BOOKS_RECOMMENDATIONS_ACTIVE_DAYS'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(f'Scoring users active in the last {settings.BOOKS_RECOMMENDATIONS_ACTIVE_DAYS} days...')
+        started = time.perf_counter()
+        users, written = rebuild_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Stored {written} recommendations for {users} users in {time.perf_counter() - started:.2f}s'
+        ))
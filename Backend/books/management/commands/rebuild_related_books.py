@@ -0,0 +1,15 @@
+"""
+Management command to rebuild the precomputed related-books table
+"""
+from django.core.management.base import BaseCommand
+
+from books.related import rebuild_related_books
+
+
+class Command(BaseCommand):
+    help = 'Recompute related books for all active books from authors, categories and order history'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding related books...')
+        written = rebuild_related_books()
+        self.stdout.write(self.style.SUCCESS(f'✓ Stored {written} related-book rows'))
@@ -0,0 +1,19 @@
+"""
+Management command to rebuild the book search index
+"""
+from django.core.management.base import BaseCommand
+
+from books.models import BookSearchDocument
+from books.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for all active books'
+
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index ({backend.name} backend)...')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Indexed {BookSearchDocument.objects.count()} books'
+        ))
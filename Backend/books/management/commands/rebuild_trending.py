@@ -0,0 +1,15 @@
+"""
+Management command to re-rank the trending book lists
+"""
+from django.core.management.base import BaseCommand
+
+from books.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute the storewide and per-category trending lists from recent activity (run from cron)'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding trending books...')
+        written = rebuild_trending()
+        self.stdout.write(self.style.SUCCESS(f'✓ Stored {written} trending rows'))
@@ -0,0 +1,15 @@
+"""
+Management command to reconcile the denormalised active book counters
+"""
+from django.core.management.base import BaseCommand
+
+from books.counters import reconcile_book_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount active books per category, author and publisher and fix counters that drifted'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Reconciling book counters...')
+        for name, corrected in reconcile_book_counts().items():
+            self.stdout.write(self.style.SUCCESS(f'✓ {name}: corrected {corrected}'))
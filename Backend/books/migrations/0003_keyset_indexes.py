@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='books_book_is_acti_df676a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'price', 'id'], name='books_book_is_acti_274e50_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'rating', 'id'], name='books_book_is_acti_0d1c4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'title', 'id'], name='books_book_is_acti_44ac17_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='books.book')),
+                ('title', models.TextField(help_text='Title and subtitle')),
+                ('names', models.TextField(blank=True, help_text='Author and publisher names')),
+                ('body', models.TextField(blank=True, help_text='Description and ISBN')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Book Search Document',
+                'verbose_name_plural': 'Book Search Documents',
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+"""
+Database full-text index over BookSearchDocument.
+SQLite gets an FTS5 table kept in sync by triggers, PostgreSQL a weighted
+generated tsvector column with a GIN index. Other backends fall back to
+LIKE over the document table.
+"""
+
+from django.db import migrations, OperationalError
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        title, names, body,
+        content='books_booksearchdocument',
+        content_rowid='book_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER books_booksearchdocument_ai AFTER INSERT ON books_booksearchdocument BEGIN
+        INSERT INTO books_book_fts(rowid, title, names, body)
+        VALUES (new.book_id, new.title, new.names, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER books_booksearchdocument_ad AFTER DELETE ON books_booksearchdocument BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, names, body)
+        VALUES ('delete', old.book_id, old.title, old.names, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER books_booksearchdocument_au AFTER UPDATE ON books_booksearchdocument BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, names, body)
+        VALUES ('delete', old.book_id, old.title, old.names, old.body);
+        INSERT INTO books_book_fts(rowid, title, names, body)
+        VALUES (new.book_id, new.title, new.names, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS books_booksearchdocument_au",
+    "DROP TRIGGER IF EXISTS books_booksearchdocument_ad",
+    "DROP TRIGGER IF EXISTS books_booksearchdocument_ai",
+    "DROP TABLE IF EXISTS books_book_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE books_booksearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(names, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX books_booksearchdocument_vector_idx
+    ON books_booksearchdocument USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS books_booksearchdocument_vector_idx",
+    "ALTER TABLE books_booksearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except OperationalError:
+            # SQLite built without FTS5; the LIKE fallback backend is used
+            pass
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+def populate_documents(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookSearchDocument = apps.get_model('books', 'BookSearchDocument')
+    books = Book.objects.filter(is_active=True).select_related('author', 'publisher')
+    BookSearchDocument.objects.bulk_create(
+        [
+            BookSearchDocument(
+                book_id=book.pk,
+                title=' '.join(filter(None, [book.title, book.subtitle])),
+                names=' '.join(filter(None, [book.author.name, book.publisher.name])),
+                body=' '.join(filter(None, [book.description, book.isbn])),
+            )
+            for book in books.iterator()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+from books.search.normalize import normalize_text
+
+
+def populate_search_keys(apps, schema_editor):
+    Author = apps.get_model('books', 'Author')
+    Book = apps.get_model('books', 'Book')
+    BookSearchDocument = apps.get_model('books', 'BookSearchDocument')
+
+    authors = list(Author.objects.all())
+    for author in authors:
+        author.search_key = normalize_text(author.name)[:400]
+    Author.objects.bulk_update(authors, ['search_key'], batch_size=500)
+
+    books = list(Book.objects.select_related('author', 'publisher'))
+    for book in books:
+        book.search_key = normalize_text(f'{book.title} {book.subtitle}')[:1000]
+    Book.objects.bulk_update(books, ['search_key'], batch_size=500)
+
+    # Search documents now hold normalised text as well
+    documents = []
+    for book in books:
+        if not book.is_active:
+            continue
+        documents.append(BookSearchDocument(
+            book_id=book.pk,
+            title=book.search_key,
+            names=normalize_text(f'{book.author.name} {book.publisher.name}'),
+            body=normalize_text(f'{book.description} {book.isbn or ""}'),
+        ))
+    BookSearchDocument.objects.all().delete()
+    BookSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='search_key',
+            field=models.CharField(blank=True, editable=False, help_text='Transliterated, apostrophe-folded name for search', max_length=400),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='search_key',
+            field=models.CharField(blank=True, editable=False, help_text='Transliterated, apostrophe-folded title and subtitle for search', max_length=1000),
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['search_key'], name='books_autho_search__ff64ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['search_key'], name='books_book_search__3b3ad2_idx'),
+        ),
+        migrations.RunPython(populate_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_effective_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_books', to='books.book')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_for', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Related Book',
+                'verbose_name_plural': 'Related Books',
+                'indexes': [models.Index(fields=['book', '-score'], name='books_relat_book_id_4b9e91_idx')],
+                'unique_together': {('book', 'related')},
+            },
+        ),
+    ]
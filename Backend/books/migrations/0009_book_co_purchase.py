@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_related_book'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(help_text='Orders containing both books')),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='books.book')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchased_with', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Co-Purchase',
+                'verbose_name_plural': 'Book Co-Purchases',
+                'indexes': [models.Index(fields=['book', '-score'], name='books_bookc_book_id_4d3adb_idx')],
+                'unique_together': {('book', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_user_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket')),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('cart_adds', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Activity',
+                'verbose_name_plural': 'Book Activity',
+                'indexes': [models.Index(fields=['bucket'], name='books_booka_bucket_615e8f_idx')],
+                'unique_together': {('book', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='books.book')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trending_books', to='books.category')),
+            ],
+            options={
+                'verbose_name': 'Trending Book',
+                'verbose_name_plural': 'Trending Books',
+                'indexes': [models.Index(fields=['category', 'rank'], name='books_trend_categor_8b6f0c_idx')],
+            },
+        ),
+    ]
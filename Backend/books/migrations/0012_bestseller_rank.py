@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='bestseller_rank',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Units sold over the longest bestseller window, as of the last ranking'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('books', 'Category')
+
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def resolve(category, seen=()):
+        if category.path:
+            return
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.pk in seen:
+            category.path, category.depth = f'{category.pk}/', 0
+            return
+        resolve(parent, (*seen, category.pk))
+        category.path, category.depth = f'{parent.path}{category.pk}/', parent.depth + 1
+
+    for category in categories.values():
+        resolve(category)
+    Category.objects.bulk_update(categories.values(), ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_bestseller_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
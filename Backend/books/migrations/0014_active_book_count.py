@@ -0,0 +1,43 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counts(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    for model_name, attname in (('Category', 'category_id'), ('Author', 'author_id'), ('Publisher', 'publisher_id')):
+        model = apps.get_model('books', model_name)
+        counts = dict(
+            Book.objects.filter(is_active=True).order_by().values_list(attname).annotate(total=Count('id'))
+        )
+        rows = list(model.objects.all())
+        for row in rows:
+            row.active_book_count = counts.get(row.pk, 0)
+        model.objects.bulk_update(rows, ['active_book_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='active_book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='active_book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='active_book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:22
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0014_active_book_count'),
+    ]
+
+    # Generated columns cannot be altered in place, so the column is dropped and re-added
+    operations = [
+        migrations.RemoveField(
+            model_name='book',
+            name='discount_percentage',
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='discount_percentage',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('discount_price__gt', 0), ('discount_price__lt', models.F('price'))), then=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('price'), '-', models.F('discount_price')), models.FloatField()), '*', models.Value(100)), '/', django.db.models.functions.comparison.Cast(models.F('price'), models.FloatField()))), models.IntegerField())), default=models.Value(0)), output_field=models.IntegerField()),
+        ),
+    ]
@@ -3,12 +3,17 @@ Books models for BookNest E-commerce Platform
 Models for books, categories, authors, publishers, cart, and wishlist
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Cast, Concat, Round, Substr
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.conf import settings
 import uuid
 
+from .search.normalize import normalize_text
+
 
 class Category(models.Model):
     """Book categories with hierarchical structure"""
@@ -24,6 +29,11 @@ class Category(models.Model):
         blank=True,
         related_name='children'
     )
+    # Materialised path: ancestor ids then its own, each followed by "/",
+    # so a subtree is one indexed prefix match on path
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    active_book_count = models.PositiveIntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -40,10 +50,33 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if parent_path.startswith(self.path):
+                raise ValidationError({'parent': 'A category cannot be moved under itself or its subcategories.'})
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        self.move_path()
+    
+    def move_path(self):
+        """Recompute path and depth from the parent's, carrying the subtree along"""
+        parent = Category.objects.filter(pk=self.parent_id).values('path', 'depth').first()
+        path = f"{parent['path'] if parent else ''}{self.pk}/"
+        depth = parent['depth'] + 1 if parent else 0
+        if path == self.path and depth == self.depth:
+            return
+        old_path, old_depth = self.path, self.depth
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (depth - old_depth)
+            )
+        self.path, self.depth = path, depth
 
 
 class Author(models.Model):
@@ -55,6 +88,13 @@ class Author(models.Model):
     photo = models.ImageField(upload_to='authors/', blank=True, null=True)
     birth_date = models.DateField(null=True, blank=True)
     nationality = models.CharField(max_length=100, blank=True)
+    search_key = models.CharField(
+        max_length=400,
+        blank=True,
+        editable=False,
+        help_text='Transliterated, apostrophe-folded name for search'
+    )
+    active_book_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -64,6 +104,7 @@ class Author(models.Model):
         ordering = ['name']
         indexes = [
             models.Index(fields=['slug']),
+            models.Index(fields=['search_key']),
         ]
     
     def __str__(self):
@@ -72,6 +113,10 @@ class Author(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.search_key = normalize_text(self.name)[:400]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_key'}
         super().save(*args, **kwargs)
 
 
@@ -82,6 +127,7 @@ class Publisher(models.Model):
     slug = models.SlugField(max_length=220, unique=True, blank=True)
     website = models.URLField(blank=True)
     logo = models.ImageField(upload_to='publishers/', blank=True, null=True)
+    active_book_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -139,6 +185,30 @@ class Book(models.Model):
         null=True,
         validators=[MinValueValidator(0)]
     )
+    # Maintained by the database so price filters and sorts can use an index
+    effective_price = models.GeneratedField(
+        expression=Case(When(discount_price__gt=0, then=F('discount_price')), default=F('price')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    discount_percentage = models.GeneratedField(
+        expression=Case(
+            When(
+                Q(discount_price__gt=0) & Q(discount_price__lt=F('price')),
+                # Divide as floats: SQLite stores whole prices as integers and would truncate before rounding
+                then=Cast(
+                    Round(
+                        Cast(F('price') - F('discount_price'), models.FloatField()) * 100
+                        / Cast(F('price'), models.FloatField())
+                    ),
+                    models.IntegerField()
+                )
+            ),
+            default=Value(0),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     
     # Inventory
     stock = models.PositiveIntegerField(default=0)
@@ -163,6 +233,20 @@ class Book(models.Model):
     )
     review_count = models.PositiveIntegerField(default=0)
     view_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Units sold over the longest bestseller window, as of the last ranking'
+    )
+    bestseller_rank = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    
+    # Search
+    search_key = models.CharField(
+        max_length=1000,
+        blank=True,
+        editable=False,
+        help_text='Transliterated, apostrophe-folded title and subtitle for search'
+    )
     
     # Flags
     is_featured = models.BooleanField(default=False)
@@ -186,6 +270,12 @@ class Book(models.Model):
             models.Index(fields=['author', 'is_active']),
             models.Index(fields=['-rating']),
             models.Index(fields=['-created_at']),
+            # Keyset pagination: sort key plus the id tiebreaker
+            models.Index(fields=['is_active', 'created_at', 'id']),
+            models.Index(fields=['is_active', 'effective_price', 'id']),
+            models.Index(fields=['is_active', 'rating', 'id']),
+            models.Index(fields=['is_active', 'title', 'id']),
+            models.Index(fields=['search_key']),
         ]
     
     def __str__(self):
@@ -200,7 +290,40 @@ class Book(models.Model):
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
-        super().save(*args, **kwargs)
+        self.search_key = normalize_text(f'{self.title} {self.subtitle}')[:1000]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'title', 'subtitle'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_key'}
+        adding = self._state.adding
+        # One transaction with the post_save counter updates on related rows
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        saved = kwargs.get('update_fields')
+        if not adding and (saved is None or {'price', 'discount_price'} & set(saved)):
+            # The database recomputed the generated prices; reload them on next access
+            for field in ('effective_price', 'discount_percentage'):
+                self.__dict__.pop(field, None)
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{
+                field.attname: self.__dict__[field.attname]
+                for field in self._meta.concrete_fields
+                if field.attname in self.__dict__ and (saved is None or field.name in saved)
+            },
+        }
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        book = super().from_db(db, field_names, values)
+        book._loaded_values = dict(zip(field_names, values))
+        return book
+    
+    def changed_fields(self, fields):
+        """Which of `fields` differ from the values last loaded or saved; all of them for a new instance"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(fields)
+        return {field for field in fields if field not in loaded or loaded[field] != getattr(self, field)}
     
     @property
     def final_price(self):
@@ -211,13 +334,173 @@ class Book(models.Model):
     def is_in_stock(self):
         """Check if book is in stock"""
         return self.stock > 0
-    
-    @property
-    def discount_percentage(self):
-        """Calculate discount percentage"""
-        if self.discount_price and self.discount_price < self.price:
-            return round(((self.price - self.discount_price) / self.price) * 100)
-        return 0
+
+
+class BookSearchDocument(models.Model):
+    """
+    Denormalised full-text search document for an active book.
+    The database keeps its own index over these rows (FTS5 on SQLite,
+    a weighted tsvector with a GIN index on PostgreSQL).
+    """
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    title = models.TextField(help_text='Title and subtitle')
+    names = models.TextField(blank=True, help_text='Author and publisher names')
+    body = models.TextField(blank=True, help_text='Description and ISBN')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Book Search Document'
+        verbose_name_plural = 'Book Search Documents'
+
+    def __str__(self):
+        return self.title
+
+
+class BookChange(models.Model):
+    """
+    Append-only log of book writes, one row per book per write, written in
+    the same transaction. The in-process indexes read it to apply other
+    workers' changes book by book; rows are pruned after
+    BOOKS_CHANGE_LOG_RETENTION_HOURS.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # Not a foreign key: the row must outlive a deleted book
+    book_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Book Change'
+        verbose_name_plural = 'Book Changes'
+
+    def __str__(self):
+        return f"{self.book_id} @ {self.created_at:%Y-%m-%d %H:%M:%S}"
+
+
+class RelatedBook(models.Model):
+    """
+    Precomputed neighbour of a book for the related-books list.
+    Rows are written by books.related; the list is one lookup on (book, -score).
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='related_books')
+    related = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='related_for')
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Related Book'
+        verbose_name_plural = 'Related Books'
+        unique_together = ['book', 'related']
+        indexes = [
+            models.Index(fields=['book', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.related_id} ({self.score:.2f})"
+
+
+class BookCoPurchase(models.Model):
+    """
+    "Customers also bought" neighbour of a book, from order co-occurrence.
+    Rows are written by books.copurchase; `score` is the normalised
+    co-occurrence (cosine or lift) and `orders` the raw count behind it.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='co_purchases')
+    related = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='co_purchased_with')
+    orders = models.PositiveIntegerField(help_text='Orders containing both books')
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Book Co-Purchase'
+        verbose_name_plural = 'Book Co-Purchases'
+        unique_together = ['book', 'related']
+        indexes = [
+            models.Index(fields=['book', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class UserRecommendation(models.Model):
+    """Materialised "recommended for you" entry, written by books.recommendations"""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recommendations')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommended_to')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'User Recommendation'
+        verbose_name_plural = 'User Recommendations'
+        unique_together = ['user', 'book']
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.book_id} ({self.score:.3f})"
+
+
+class BookActivity(models.Model):
+    """
+    Views, cart additions and purchases of a book within one time bucket.
+    Rows are written by books.trending and pruned once they fall out of
+    the trending window.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='activity')
+    bucket = models.DateTimeField(help_text='Start of the bucket')
+    views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Book Activity'
+        verbose_name_plural = 'Book Activity'
+        unique_together = ['book', 'bucket']
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} @ {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class TrendingBook(models.Model):
+    """
+    Precomputed entry of a trending list, written by books.trending.
+    `category` is null for the storewide list; a category's list also
+    ranks the books of its subcategories.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='trending')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='trending_books'
+    )
+    rank = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Trending Book'
+        verbose_name_plural = 'Trending Books'
+        indexes = [
+            models.Index(fields=['category', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.book_id} ({self.score:.2f})"
 
 
 class Cart(models.Model):
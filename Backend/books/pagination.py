@@ -0,0 +1,255 @@
+"""
+Pagination for Books app
+Keyset (cursor) pagination over the catalog orderings, cached totals
+"""
+
+import base64
+import binascii
+import functools
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from .cache import CachedCountPaginator, filter_signature
+from .models import Book
+
+
+# Orderings that can be paginated by keyset; every one gets `id` as tiebreaker
+KEYSET_ORDERINGS = [
+    'created_at', '-created_at',
+    'effective_price', '-effective_price',
+    'rating', '-rating',
+    'title', '-title',
+]
+
+# Public sort names that order by another column: `price` is what the buyer pays
+ORDERING_ALIASES = {'price': 'effective_price'}
+
+
+def resolve_ordering(ordering):
+    """Map a public ordering such as '-price' to the column it sorts on"""
+    field = ordering.lstrip('-')
+    prefix = ordering[:len(ordering) - len(field)]
+    return prefix + ORDERING_ALIASES.get(field, field)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token is malformed or belongs to another ordering"""
+
+
+def keyset_terms(ordering):
+    """
+    The sort terms of an ordering: one term such as '-rating' or a sequence
+    of them. Repeated columns are dropped, since only their first term sorts.
+    """
+    terms = [ordering] if isinstance(ordering, str) else list(ordering)
+    if not terms:
+        raise InvalidCursor('Cursor pagination needs an ordering')
+    seen = set()
+    unique = []
+    for term in terms:
+        if term not in KEYSET_ORDERINGS:
+            raise InvalidCursor(f"Ordering '{term}' does not support cursor pagination")
+        if term.lstrip('-') not in seen:
+            seen.add(term.lstrip('-'))
+            unique.append(term)
+    return unique
+
+
+def keyset_ordering(ordering):
+    """Return the full ORDER BY for an ordering, including the id tiebreaker"""
+    terms = keyset_terms(ordering)
+    return [*terms, '-id' if terms[-1].startswith('-') else 'id']
+
+
+def _sort_field(term):
+    field = Book._meta.get_field(term.lstrip('-'))
+    return field.output_field if field.generated else field
+
+
+def encode_cursor(ordering, book):
+    """Encode the sort key of the last row on a page (instance or values() dict) into an opaque token"""
+    if isinstance(book, dict):
+        book = SimpleNamespace(pk=book['id'], **book)
+    terms = keyset_terms(ordering)
+    # Every term goes in, so ties on the first column resume at the right row
+    values = [Book._meta.get_field(term.lstrip('-')).value_to_string(book) for term in terms]
+    payload = json.dumps({'o': terms, 'v': values, 'id': book.pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    """Decode a cursor token into the ([values], id) sort key it was built from"""
+    terms = keyset_terms(ordering)
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['o'] != terms:
+            raise InvalidCursor('Cursor was issued for a different ordering')
+        if len(payload['v']) != len(terms):
+            raise InvalidCursor('Invalid cursor')
+        values = [_sort_field(term).to_python(value) for term, value in zip(terms, payload['v'])]
+        return values, int(payload['id'])
+    except InvalidCursor:
+        raise
+    except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def keyset_filter(queryset, ordering, token):
+    """
+    Restrict an ordered queryset to the rows after the cursor.
+    The inclusive bound on the first sort column comes first so the database
+    can turn it into an index range scan; the OR only breaks ties inside it:
+    a row is after the cursor if it is past it on some term and equal on
+    every term before that one, with `id` as the last term.
+    """
+    values, last_id = decode_cursor(token, ordering)
+    terms = keyset_terms(ordering)
+    keys = [(term.lstrip('-'), term.startswith('-'), value) for term, value in zip(terms, values)]
+    keys.append(('id', terms[-1].startswith('-'), last_id))
+
+    after = Q()
+    equal = Q()
+    for field, descending, value in keys:
+        after |= equal & Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+        equal &= Q(**{field: value})
+    field, descending, value = keys[0]
+    return queryset.filter(Q(**{f'{field}__{"lte" if descending else "gte"}': value}), after)
+
+
+def keyset_page(queryset, ordering, page_size, token=None):
+    """
+    Fetch one keyset page; `ordering` is one sort term or a sequence of them.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(*keyset_ordering(ordering))
+    if token:
+        queryset = keyset_filter(queryset, ordering, token)
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(ordering, rows[-1])
+    return rows, next_cursor
+
+
+def offset_page(queryset, page, page_size):
+    """
+    Fetch one OFFSET page without counting the result set.
+    Returns (rows, has_more) by reading a single extra row.
+    """
+    offset = (page - 1) * page_size
+    rows = list(queryset[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
+
+
+class BookPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode.
+    Pass `?pagination=cursor` (and then the returned `cursor`) to page by the
+    sort key of the last row instead of OFFSET.
+    Totals come from the count cache; `?count=has_more` skips them entirely.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    # Query parameters that do not change which rows match
+    non_filter_params = {
+        'page', 'page_size', 'cursor', 'pagination', 'count', 'ordering', 'format', 'facets', 'fields', 'expand'
+    }
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def get_filter_signature(self, request, view=None):
+        params = {
+            name: request.query_params.getlist(name)
+            for name in request.query_params
+            if name not in self.non_filter_params
+        }
+        scope = view.basename if view is not None else 'books'
+        return filter_signature(scope, params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = self.use_cursor(request)
+        self.has_more_mode = request.query_params.get(self.count_query_param) == 'has_more'
+        if not self.cursor_mode:
+            if self.has_more_mode:
+                try:
+                    page = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+                except ValueError:
+                    raise NotFound(self.invalid_page_message)
+                self.page_number = page
+                rows, self.has_more = offset_page(queryset, page, self.get_page_size(request))
+                return rows
+            self.django_paginator_class = functools.partial(
+                CachedCountPaginator,
+                signature=self.get_filter_signature(request, view)
+            )
+            return super().paginate_queryset(queryset, request, view)
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['-created_at']
+        try:
+            rows, self.next_cursor = keyset_page(
+                queryset,
+                ordering,
+                self.get_page_size(request),
+                request.query_params.get(self.cursor_query_param)
+            )
+        except InvalidCursor as exc:
+            raise NotFound(str(exc))
+        return rows
+
+    def get_next_link(self):
+        if self.cursor_mode:
+            if self.next_cursor is None:
+                return None
+            url = self.request.build_absolute_uri()
+            url = remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+        if self.has_more_mode:
+            if not self.has_more:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.page_query_param, self.page_number + 1)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.has_more_mode:
+            if self.page_number <= 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response({
+                'next': self.get_next_link(),
+                'next_cursor': self.next_cursor,
+                'results': data,
+            })
+        if self.has_more_mode:
+            return Response({
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'has_more': self.has_more,
+                'results': data,
+            })
+        return super().get_paginated_response(data)
@@ -0,0 +1,105 @@
+"""
+List projection for Books app
+values()-based book list rows read from the stored price columns
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from .catalog import hydrate
+from .models import Book
+
+
+# Columns read for a list row; related names are joined, nothing else is loaded
+LIST_COLUMNS = (
+    'id', 'title', 'slug', 'author_id', 'category_id', 'price', 'discount_price',
+    'discount_percentage', 'cover_image', 'rating', 'review_count', 'is_featured', 'is_bestseller',
+)
+
+
+def project_books(queryset, extra=()):
+    """
+    Narrow a Book queryset to list-row dicts: only LIST_COLUMNS, the
+    author and category names, the stored effective price and stock
+    availability. `extra` adds columns a caller needs besides the row,
+    such as a keyset sort field.
+    """
+    return queryset.values(
+        *LIST_COLUMNS, *extra,
+        author_name=F('author__name'),
+        category_name=F('category__name'),
+        final_price=F('effective_price'),
+        is_in_stock=ExpressionWrapper(Q(stock__gt=0), output_field=BooleanField()),
+    )
+
+
+@dataclass(slots=True)
+class BookListRow:
+    """One book in a list response, shaped like the BookListItem schema"""
+
+    id: int
+    title: str
+    slug: str
+    author: str
+    author_id: int
+    category: str
+    category_id: int
+    price: float
+    discount_price: Optional[float]
+    final_price: float
+    discount_percentage: int
+    cover_image: str
+    rating: float
+    review_count: int
+    is_in_stock: bool
+    is_featured: bool
+    is_bestseller: bool
+
+    @classmethod
+    def from_values(cls, row):
+        return cls(
+            id=row['id'],
+            title=row['title'],
+            slug=row['slug'],
+            author=row['author_name'],
+            author_id=row['author_id'],
+            category=row['category_name'],
+            category_id=row['category_id'],
+            price=float(row['price']),
+            discount_price=float(row['discount_price']) if row['discount_price'] else None,
+            final_price=float(row['final_price']),
+            discount_percentage=row['discount_percentage'],
+            cover_image=row['cover_image'] or '',
+            rating=float(row['rating']),
+            review_count=row['review_count'],
+            is_in_stock=bool(row['is_in_stock']),
+            is_featured=row['is_featured'],
+            is_bestseller=row['is_bestseller'],
+        )
+
+
+def list_rows(rows):
+    """BookListRow objects for projected rows, in order"""
+    return [BookListRow.from_values(row) for row in rows]
+
+
+def parse_book_ids(values):
+    """Ids from `ids` query values, each one id or a comma-separated list; ValueError on anything else"""
+    try:
+        book_ids = [int(part) for value in values for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError('ids must be integers') from None
+    if len(book_ids) > settings.BOOKS_BATCH_MAX_IDS:
+        raise ValueError(f'At most {settings.BOOKS_BATCH_MAX_IDS} ids per request')
+    # Duplicates keep their first position
+    return list(dict.fromkeys(book_ids))
+
+
+def batch_rows(book_ids):
+    """(list rows in `book_ids` order, ids with no active book) from one id__in query"""
+    rows = hydrate(project_books(Book.objects.filter(is_active=True)), book_ids)
+    found = {row['id'] for row in rows}
+    return list_rows(rows), [book_id for book_id in book_ids if book_id not in found]
@@ -0,0 +1,262 @@
+"""
+Personal recommendations for Books app
+"Recommended for you" from wishlist, cart, purchase and review signals
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order
+from reviews.models import Review
+
+from .copurchase import purchases
+from .models import Book, BookCoPurchase, CartItem, UserRecommendation, Wishlist
+from .refresh import RefreshQueue
+from .related import category_roots
+from .shelves import SHELVES, shelf_members
+
+try:
+    import numpy as np
+except ImportError:  # recommendations fall back to the popularity shelves
+    np = None
+
+
+# How strongly each kind of activity pulls the profile towards a book
+SIGNAL_WEIGHTS = {'purchase': 3.0, 'cart': 2.0, 'wishlist': 1.5}
+# Review stars above this pull towards the book, below it push away
+REVIEW_NEUTRAL = 3
+
+# Weight of each block of a book vector in the dot product
+BLOCK_WEIGHTS = {'category': 1.0, 'subtree': 0.5, 'author': 1.0, 'co_purchase': 1.5}
+EMBEDDING_SIZE = 32
+
+# Shelves a user without usable history is shown, best first
+FALLBACK_SHELVES = ('bestsellers', 'featured', 'new_arrivals')
+
+
+class BookVectors:
+    """
+    Feature vectors for every active book, kept as what makes them cheap
+    to score: index arrays for the one-hot category, category subtree and
+    author blocks, and a dense co-purchase embedding. The embedding is a
+    random projection of each book and its stored "also bought"
+    neighbours, so books bought with the same books point the same way
+    without an n x n matrix. Scoring all books against a profile is then
+    three gathers and one matrix-vector product.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._built_at = 0.0
+
+    def build(self):
+        if np is None:
+            raise ImproperlyConfigured('Personal recommendations require numpy')
+        roots = category_roots()
+        rows = list(Book.objects.filter(is_active=True).order_by('id').values_list('id', 'category_id', 'author_id'))
+        book_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        positions = {book_id: position for position, book_id in enumerate(book_ids.tolist())}
+
+        def index(values):
+            codes = {}
+            return np.array([codes.setdefault(value, len(codes)) for value in values], dtype=np.int32), len(codes)
+
+        category, categories = index(row[1] for row in rows)
+        subtree, subtrees = index(roots.get(row[1]) for row in rows)
+        author, authors = index(row[2] for row in rows)
+
+        projection = np.random.default_rng(0).standard_normal((len(rows), EMBEDDING_SIZE)).astype(np.float32)
+        embedding = projection.copy()
+        links = list(BookCoPurchase.objects.filter(
+            book__is_active=True, related__is_active=True
+        ).values_list('book_id', 'related_id', 'score'))
+        if links:
+            links = np.array(links, dtype=np.float64)
+            # book_ids is sorted, so searchsorted maps ids to rows
+            source = np.searchsorted(book_ids, links[:, 0].astype(np.int64))
+            target = np.searchsorted(book_ids, links[:, 1].astype(np.int64))
+            np.add.at(embedding, source, links[:, 2:3].astype(np.float32) * projection[target])
+        embedding /= np.linalg.norm(embedding, axis=1, keepdims=True) + 1e-9
+
+        return {
+            'book_ids': book_ids,
+            'positions': positions,
+            'category': (category, categories),
+            'subtree': (subtree, subtrees),
+            'author': (author, authors),
+            'embedding': embedding,
+        }
+
+    def get(self):
+        """
+        The current vectors, rebuilt at most once per
+        BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL. Only the rebuild command and
+        the background refresh score users, so no request waits on a build.
+        """
+        now = time.monotonic()
+        if self._state is None or now - self._built_at >= settings.BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL:
+            with self._lock:
+                if self._state is None or now - self._built_at >= settings.BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL:
+                    self._state = self.build()
+                    self._built_at = time.monotonic()
+        return self._state
+
+    def score(self, weights, size):
+        """[(book_id, score)] for the `size` best books against a {book_id: weight} profile"""
+        state = self.get()
+        known = [(state['positions'][book_id], weight)
+                 for book_id, weight in weights.items() if book_id in state['positions']]
+        if not any(weight > 0 for _, weight in known):
+            return []
+        rows = np.array([position for position, _ in known], dtype=np.int64)
+        pull = np.array([weight for _, weight in known], dtype=np.float32)
+        pull /= np.abs(pull).sum()
+
+        scores = state['embedding'] @ (pull @ state['embedding'][rows]) * BLOCK_WEIGHTS['co_purchase']
+        for block in ('category', 'subtree', 'author'):
+            codes, width = state[block]
+            profile = np.bincount(codes[rows], weights=pull, minlength=width)
+            scores += BLOCK_WEIGHTS[block] * profile[codes]
+        # Nothing the user already bought, holds, wished for or reviewed
+        scores[rows] = -np.inf
+
+        size = min(size, len(scores))
+        best = np.argpartition(-scores, size - 1)[:size]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [
+            (book_id, score)
+            for book_id, score in zip(state['book_ids'][best].tolist(), scores[best].tolist())
+            if score > 0
+        ]
+
+
+book_vectors = BookVectors()
+
+
+def user_signals(user_id):
+    """{book_id: weight} from the user's purchases, cart, wishlist and reviews"""
+    weights = {}
+
+    def add(book_ids, weight):
+        for book_id in book_ids:
+            weights[book_id] = weights.get(book_id, 0.0) + weight
+
+    add(purchases().filter(order__user_id=user_id).values_list('book_id', flat=True).distinct(),
+        SIGNAL_WEIGHTS['purchase'])
+    add(CartItem.objects.filter(cart__user_id=user_id).values_list('book_id', flat=True), SIGNAL_WEIGHTS['cart'])
+    add(Wishlist.objects.filter(user_id=user_id).values_list('book_id', flat=True), SIGNAL_WEIGHTS['wishlist'])
+    for book_id, rating in Review.objects.filter(user_id=user_id).values_list('book_id', 'rating'):
+        add([book_id], rating - REVIEW_NEUTRAL)
+    return weights
+
+
+def recommend(user_id, weights=None):
+    """Fresh [(book_id, score)] for one user; empty without usable history"""
+    weights = user_signals(user_id) if weights is None else weights
+    if np is None or not any(weight > 0 for weight in weights.values()):
+        return []
+    return book_vectors.score(weights, settings.BOOKS_RECOMMENDATIONS_SIZE)
+
+
+def store_recommendations(user_id, scored):
+    with transaction.atomic():
+        UserRecommendation.objects.filter(user_id=user_id).delete()
+        UserRecommendation.objects.bulk_create([
+            UserRecommendation(user_id=user_id, book_id=book_id, score=score)
+            for book_id, score in scored
+        ])
+
+
+def active_user_ids():
+    """Users with any activity in the last BOOKS_RECOMMENDATIONS_ACTIVE_DAYS"""
+    since = timezone.now() - timedelta(days=settings.BOOKS_RECOMMENDATIONS_ACTIVE_DAYS)
+    user_ids = set(Order.objects.filter(created_at__gte=since).values_list('user_id', flat=True))
+    user_ids.update(CartItem.objects.filter(updated_at__gte=since).values_list('cart__user_id', flat=True))
+    user_ids.update(Wishlist.objects.filter(created_at__gte=since).values_list('user_id', flat=True))
+    user_ids.update(Review.objects.filter(updated_at__gte=since).values_list('user_id', flat=True))
+    return sorted(user_ids)
+
+
+def _ids_key(user_id):
+    return f'books:recommended:{user_id}'
+
+
+def refresh_recommendations(user_ids):
+    """Recompute and store the lists of `user_ids`; returns rows written"""
+    written = 0
+    for user_id in user_ids:
+        scored = recommend(user_id)
+        store_recommendations(user_id, scored)
+        cache.delete(_ids_key(user_id))
+        written += len(scored)
+    return written
+
+
+def rebuild_recommendations():
+    """Materialise recommendations for every active user; returns (users, rows written)"""
+    if np is None:
+        raise ImproperlyConfigured('Personal recommendations require numpy')
+    book_vectors.get()
+    user_ids = active_user_ids()
+    return len(user_ids), refresh_recommendations(user_ids)
+
+
+def _refresh_queued(user_ids):
+    # Without numpy there are no stored lists to keep up to date
+    if np is not None:
+        refresh_recommendations(user_ids)
+
+
+recommendation_refresh = RefreshQueue('recommendations', _refresh_queued)
+
+
+def recommendations_changed(user_id):
+    """Queue a user's list for recomputation once their activity is committed"""
+    transaction.on_commit(lambda: recommendation_refresh.add([user_id]))
+
+
+def popular_book_ids(limit, exclude=()):
+    """Up to `limit` ids from the popularity shelves, for users without history"""
+    ids, seen = [], set(exclude)
+    for name in FALLBACK_SHELVES:
+        members = shelf_members(name)
+        if members is None:
+            members = SHELVES[name].queryset().values_list('id', flat=True)[:limit]
+        for book_id in members:
+            if book_id not in seen:
+                seen.add(book_id)
+                ids.append(book_id)
+            if len(ids) >= limit:
+                return ids
+    return ids
+
+
+def recommended_book_ids(user_id):
+    """
+    The user's ids, best first, from the cache, else the materialised rows.
+    Read-only: lists are written by the rebuild command and the background
+    refresh queued by activity. Short or missing lists are topped up from
+    the popularity shelves.
+    """
+    ids = cache.get(_ids_key(user_id))
+    if ids is not None:
+        return ids
+    ids = list(
+        UserRecommendation.objects.filter(user_id=user_id)
+        .order_by('-score')
+        .values_list('book_id', flat=True)
+    )
+    if len(ids) < settings.BOOKS_RECOMMENDATIONS_SIZE:
+        ids = ids + popular_book_ids(
+            settings.BOOKS_RECOMMENDATIONS_SIZE - len(ids), exclude=[*ids, *user_signals(user_id)]
+        )
+    cache.set(_ids_key(user_id), ids, settings.BOOKS_RECOMMENDATIONS_CACHE_TIMEOUT)
+    return ids
@@ -0,0 +1,110 @@
+"""
+Deferred refreshes for Books app
+Ids touched by signals, refreshed in batches by a background thread instead of in the request,
+and full reloads run off the request path
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+# Every queue in this process, for flush_refresh_queues
+QUEUES = []
+
+
+class RefreshQueue:
+    """
+    Per-process set of ids waiting for `handler`. `add` only records the
+    ids; a background thread hands everything pending to `handler(ids)`
+    every BOOKS_REFRESH_INTERVAL seconds, so a burst of orders costs one
+    batch instead of a refresh per row, and none of it runs inside the
+    request. Ids from a failed batch are kept for the next one. Work
+    lost with the process is caught up by the full rebuild commands.
+    """
+
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._thread = None
+        QUEUES.append(self)
+
+    def add(self, ids):
+        with self._lock:
+            self._pending.update(ids)
+            if self._thread is None:
+                self._start()
+
+    def flush(self):
+        """Refresh every pending id now; returns how many there were"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        try:
+            self.handler(sorted(pending))
+        except Exception:
+            with self._lock:
+                self._pending |= pending
+            raise
+        return len(pending)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name=f'book-refresh-{self.name}', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.BOOKS_REFRESH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Refreshing %s failed; retrying on the next interval', self.name)
+            finally:
+                close_old_connections()
+
+
+def flush_refresh_queues():
+    """Run every pending refresh, e.g. before the process exits"""
+    for queue in QUEUES:
+        queue.flush()
+
+
+class BackgroundTask:
+    """
+    Run `target()` on a daemon thread, one run at a time: `start` while a
+    run is in progress does nothing. Used for full reloads of in-process
+    indexes, which must never hold up a request.
+    """
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start a run unless one is in progress; returns whether it started one"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, name=f'book-task-{self.name}', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            self.target()
+        except Exception:
+            logger.exception('Background %s failed', self.name)
+        finally:
+            close_old_connections()
@@ -0,0 +1,210 @@
+"""
+Related books for Books app
+Precomputed neighbours scored on shared author, category subtree and co-purchases
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .copurchase import baskets, book_co_purchases
+from .models import Book, Category, RelatedBook
+from .refresh import RefreshQueue
+
+
+# Book columns whose change moves a book between related lists
+RELATED_FIELDS = ('author_id', 'category_id', 'is_active')
+
+BOOK_COLUMNS = ('id', 'author_id', 'category_id', 'rating')
+
+
+def category_roots():
+    """Top-level ancestor of every category id, read off the materialised paths"""
+    return {
+        category_id: int(path.split('/', 1)[0])
+        for category_id, path in Category.objects.values_list('id', 'path')
+    }
+
+
+def related_score(book, other, roots, co_orders=0):
+    """
+    Weighted sum of what `other` shares with `book`. Rating adds at most
+    0.05 so books with the same signals still come back best-rated first.
+    """
+    score = 0.0
+    if book['author_id'] == other['author_id']:
+        score += settings.BOOKS_RELATED_AUTHOR_WEIGHT
+    if book['category_id'] == other['category_id']:
+        score += settings.BOOKS_RELATED_CATEGORY_WEIGHT
+    elif roots.get(book['category_id']) == roots.get(other['category_id']):
+        score += settings.BOOKS_RELATED_SUBTREE_WEIGHT
+    if co_orders:
+        score += settings.BOOKS_RELATED_PURCHASE_WEIGHT * math.log1p(co_orders)
+    return score + float(other['rating']) / 100
+
+
+def co_purchase_counts():
+    """{book_id: Counter(other_id: orders with both)} over the whole order history"""
+    counts = defaultdict(Counter)
+    for basket in baskets():
+        # Same cap as the also-bought lists and book_co_purchases
+        if len(basket) > settings.BOOKS_ALSO_BOUGHT_MAX_BASKET:
+            continue
+        for first, second in combinations(basket, 2):
+            counts[first][second] += 1
+            counts[second][first] += 1
+    return counts
+
+
+def _top(book, candidates, roots, co_purchases):
+    """[(score, related_id)] for the BOOKS_RELATED_SIZE best candidates"""
+    scored = (
+        (related_score(book, other, roots, co_purchases.get(other['id'], 0)), other['id'])
+        for other in candidates
+        if other['id'] != book['id']
+    )
+    return heapq.nlargest(settings.BOOKS_RELATED_SIZE, scored)
+
+
+def rebuild_related_books():
+    """
+    Recompute every active book's neighbours in one pass over the catalog
+    and the order history. Returns the number of rows written.
+    """
+    roots = category_roots()
+    books = Book.objects.filter(is_active=True).order_by('-rating', 'id').values(*BOOK_COLUMNS)
+    # Candidate pools, best-rated first and capped: only the top of a
+    # shared-author or shared-category pool can make a book's top list
+    pool = settings.BOOKS_RELATED_SIZE + 1
+    by_author, by_category, by_root = defaultdict(list), defaultdict(list), defaultdict(list)
+    active = {}
+    for row in books.iterator(chunk_size=5000):
+        active[row['id']] = row
+        for pools, key in ((by_author, row['author_id']), (by_category, row['category_id']),
+                           (by_root, roots.get(row['category_id']))):
+            if len(pools[key]) < pool:
+                pools[key].append(row)
+
+    co_purchases = co_purchase_counts()
+    written = 0
+    with transaction.atomic():
+        RelatedBook.objects.all().delete()
+        batch = []
+        for book in active.values():
+            bought = co_purchases.get(book['id'], {})
+            candidates = {
+                other['id']: other
+                for other in (
+                    *by_author[book['author_id']],
+                    *by_category[book['category_id']],
+                    *by_root[roots.get(book['category_id'])],
+                    *(active[other_id] for other_id in bought if other_id in active),
+                )
+            }
+            batch.extend(
+                RelatedBook(book_id=book['id'], related_id=related_id, score=score)
+                for score, related_id in _top(book, candidates.values(), roots, bought)
+            )
+            if len(batch) >= 5000:
+                RelatedBook.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        RelatedBook.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def _trim(book_ids):
+    """Drop rows ranked below BOOKS_RELATED_SIZE in each of `book_ids`' lists"""
+    overflow = (
+        RelatedBook.objects.filter(book_id__in=book_ids)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=F('book_id'),
+            order_by=[F('score').desc(), F('related_id').asc()]
+        ))
+        .filter(rank__gt=settings.BOOKS_RELATED_SIZE)
+        .values_list('id', flat=True)
+    )
+    RelatedBook.objects.filter(id__in=list(overflow)).delete()
+
+
+def _neighbours(book, roots):
+    """(top, candidates, co-purchases) for one book, from the same pools as the full rebuild"""
+    pool = settings.BOOKS_RELATED_SIZE + 1
+    active = Book.objects.filter(is_active=True).order_by('-rating', 'id').values(*BOOK_COLUMNS)
+    root = roots.get(book['category_id'])
+    subtree = [category_id for category_id, category_root in roots.items() if category_root == root]
+    bought = book_co_purchases(book['id'])
+    candidates = {}
+    for rows in (
+        active.filter(author_id=book['author_id'])[:pool],
+        active.filter(category_id=book['category_id'])[:pool],
+        active.filter(category_id__in=subtree)[:pool],
+        active.filter(id__in=list(bought)),
+    ):
+        candidates.update((row['id'], row) for row in rows)
+    return _top(book, candidates.values(), roots, bought), candidates, bought
+
+
+def refresh_related_lists(book_ids, roots=None):
+    """
+    Recompute the lists of `book_ids`. A purchase only changes the
+    co-purchase counts between books of the same order, and every one
+    of them is refreshed, so other books' lists need no change.
+    Returns {book_id: (book row, top, candidates, co-purchases)}.
+    """
+    roots = category_roots() if roots is None else roots
+    ranked = {}
+    for book in Book.objects.filter(id__in=book_ids, is_active=True).values(*BOOK_COLUMNS):
+        ranked[book['id']] = (book, *_neighbours(book, roots))
+    with transaction.atomic():
+        RelatedBook.objects.filter(book_id__in=book_ids).delete()
+        RelatedBook.objects.bulk_create(
+            [
+                RelatedBook(book_id=book_id, related_id=related_id, score=score)
+                for book_id, (_, top, _, _) in ranked.items()
+                for score, related_id in top
+            ],
+            batch_size=5000
+        )
+    return ranked
+
+
+def refresh_related_books(book_ids):
+    """
+    Re-rank after `book_ids` changed author, category or visibility. Lists
+    that held one of them are recomputed in full, so they refill from
+    their own candidates; then each book is offered to its new
+    neighbours' lists, where it stays only if it ranks in their top
+    BOOKS_RELATED_SIZE.
+    """
+    roots = category_roots()
+    edited = set(book_ids)
+    holding = set(RelatedBook.objects.filter(related_id__in=edited).values_list('book_id', flat=True))
+    with transaction.atomic():
+        ranked = refresh_related_lists(edited | holding, roots)
+        offers = []
+        for book_id in edited & ranked.keys():
+            book, top, candidates, bought = ranked[book_id]
+            offers.extend(
+                RelatedBook(
+                    book_id=related_id,
+                    related_id=book_id,
+                    score=related_score(candidates[related_id], book, roots, bought.get(related_id, 0))
+                )
+                for _, related_id in top
+                if related_id not in ranked
+            )
+        RelatedBook.objects.bulk_create(offers, ignore_conflicts=True)
+        _trim({offer.book_id for offer in offers})
+
+
+related_lists_refresh = RefreshQueue('related-lists', refresh_related_lists)
+related_books_refresh = RefreshQueue('related-books', refresh_related_books)
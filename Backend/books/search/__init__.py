@@ -0,0 +1,52 @@
+"""
+Catalog search for Books app
+Pick the search backend for the current database and expose ranked lookups
+"""
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+
+BACKENDS = {
+    'sqlite': 'books.search.backends.SQLiteSearchBackend',
+    'postgresql': 'books.search.backends.PostgresSearchBackend',
+    'simple': 'books.search.backends.SimpleSearchBackend',
+    'memory': 'books.search.memory.MemorySearchBackend',
+}
+
+_backend = None
+
+
+def _detect_backend():
+    """Use the database's own engine when the search index migration created one"""
+    if connection.vendor == 'sqlite':
+        if 'books_book_fts' in connection.introspection.table_names():
+            return 'sqlite'
+        return 'simple'
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    return 'simple'
+
+
+def get_search_backend():
+    """Return the configured search backend (BOOKS_SEARCH_BACKEND, default 'auto')"""
+    global _backend
+    if _backend is None:
+        name = settings.BOOKS_SEARCH_BACKEND
+        if name == 'auto':
+            name = _detect_backend()
+        _backend = import_string(BACKENDS.get(name, name))()
+    return _backend
+
+
+def search_book_ids(query, limit=None):
+    """Ranked ids of the active books matching a query"""
+    if limit is None:
+        limit = settings.BOOKS_SEARCH_MAX_RESULTS
+    return get_search_backend().search(query, limit)
+
+
+def matching_book_ids(query):
+    """Every active book id matching a query, for filtering; not ranked and not capped"""
+    return get_search_backend().matching(query)
@@ -0,0 +1,229 @@
+"""
+Typeahead for Books app
+In-process prefix index over book titles, author names and category names
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from ..cache import catalog_version
+from ..categories import category_tree_version
+from ..changes import ChangeFeed
+from ..models import Book, Author, Category
+from ..refresh import BackgroundTask
+from .normalize import normalize_text
+
+
+# Sorts after every character a key can hold, so (prefix + END,) bounds the prefix's range
+END = '\U0010ffff'
+
+
+class AutocompleteIndex:
+    """
+    Sorted array of normalised keys answered with bisect.
+    Every word of a label starts a key, so "kun" finds "O'tgan kunlar".
+    Suggestions are the most popular of every key in the prefix's range,
+    memoised per prefix until a key under it changes. Books follow the
+    book change log, which also covers deletions, late commits and bulk
+    updates. Authors and categories are few, so they are re-read whole
+    whenever the catalog version or the category tree has moved, which
+    also picks up their active book counts, and only rows that differ are
+    applied. A full load only runs at start or, if the log cannot be
+    followed, on a background thread.
+    """
+
+    KINDS = ('book', 'author', 'category')
+    MEMO_SIZE = 10000
+    # Batches up to this many rows are inserted key by key instead of merged
+    INSERT_LIMIT = 100
+
+    def __init__(self):
+        self._lock = threading.RLock()           # guards the keys, entries and memo
+        self._refresh_lock = threading.Lock()    # one load or refresh at a time
+        self._keys = []          # sorted [(key, kind, id)]
+        self._entries = {}       # (kind, id) -> {'label', 'slug', 'popularity', 'keys'}
+        self._memo = {}          # prefix -> {limit: results}
+        self._loaded = False
+        self._changes = ChangeFeed()
+        self._versions = None    # (catalog version, category tree version) authors and categories were read at
+        self._refreshed_at = 0.0
+        self._reload = BackgroundTask('autocomplete', self.warm)
+
+    # Loading
+
+    def _rows(self, kind, ids=None):
+        if kind == 'book':
+            rows = Book.objects.all()
+            fields = ('id', 'title', 'slug', 'view_count', 'is_active')
+        elif kind == 'author':
+            rows = Author.objects.all()
+            fields = ('id', 'name', 'slug', 'active_book_count')
+        else:
+            rows = Category.objects.all()
+            fields = ('id', 'name', 'slug', 'active_book_count', 'is_active')
+        if ids is not None:
+            rows = rows.filter(id__in=ids)
+        return rows.order_by().values(*fields)
+
+    def _entry(self, row):
+        label = row.get('title') or row.get('name')
+        words = normalize_text(label).split()
+        return {
+            'label': label,
+            'slug': row['slug'],
+            'popularity': row.get('view_count', row.get('active_book_count')) or 0,
+            'keys': {' '.join(words[i:]) for i in range(len(words))},
+        }
+
+    def warm(self):
+        """Load every row, then swap the index in"""
+        with self._refresh_lock:
+            # Start before loading, so writes during the load are applied afterwards
+            self._changes.start()
+            versions = (catalog_version(), category_tree_version())
+            entries = {}
+            for kind in self.KINDS:
+                for row in self._rows(kind).iterator(chunk_size=5000):
+                    if row.get('is_active', True):
+                        entries[(kind, row['id'])] = self._entry(row)
+            keys = sorted((key, kind, pk) for (kind, pk), entry in entries.items() for key in entry['keys'])
+            with self._lock:
+                self._keys, self._entries, self._memo = keys, entries, {}
+                self._loaded = True
+            self._versions = versions
+            self._refreshed_at = time.monotonic()
+
+    def _changed_books(self, book_ids):
+        rows = {row['id']: row for row in self._rows('book', book_ids)}
+        return {
+            ('book', book_id): self._entry(rows[book_id])
+            if book_id in rows and rows[book_id]['is_active'] else None
+            for book_id in book_ids
+        }
+
+    def _changed_names(self, kind):
+        """Entries of `kind` that differ from the index, with None for rows now gone"""
+        with self._lock:
+            current = {pk: entry for (entry_kind, pk), entry in self._entries.items() if entry_kind == kind}
+        changed = {}
+        for row in self._rows(kind):
+            entry = self._entry(row) if row.get('is_active', True) else None
+            if entry != current.pop(row['id'], None):
+                changed[(kind, row['id'])] = entry
+        changed.update(((kind, pk), None) for pk in current)
+        return changed
+
+    def refresh(self):
+        """Apply rows changed since the last refresh, checked at most once per interval"""
+        now = time.monotonic()
+        if now - self._refreshed_at < settings.BOOKS_AUTOCOMPLETE_REFRESH_INTERVAL:
+            return
+        # Another request is already refreshing or a load is running
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed_at = now
+            book_ids = self._changes.read()
+            if book_ids is None:
+                self._reload.start()
+                return
+            changed = self._changed_books(book_ids) if book_ids else {}
+            # Read before the rows, so a write during the read is seen next time
+            versions = (catalog_version(), category_tree_version())
+            if versions != self._versions:
+                changed.update(self._changed_names('author'))
+                changed.update(self._changed_names('category'))
+                self._versions = versions
+            if changed:
+                with self._lock:
+                    self._merge(changed)
+        finally:
+            self._refresh_lock.release()
+
+    def _merge(self, changed):
+        """
+        Apply {(kind, id): entry, or None to drop it}. Large batches sort
+        the new keys once and merge them, instead of an O(n) list insert
+        per key.
+        """
+        # A handful of rows is cheaper to move with bisect than to re-merge
+        incremental = len(changed) <= self.INSERT_LIMIT
+        added = []
+        for (kind, pk), entry in changed.items():
+            if incremental:
+                self._drop(kind, pk)
+            else:
+                previous = self._entries.pop((kind, pk), None)
+                if previous is not None:
+                    self._forget(previous['keys'])
+            if entry is None:
+                continue
+            self._entries[(kind, pk)] = entry
+            self._forget(entry['keys'])
+            added.extend((key, kind, pk) for key in entry['keys'])
+        if incremental:
+            for item in added:
+                insort(self._keys, item)
+        else:
+            added.sort()
+            kept = [item for item in self._keys if (item[1], item[2]) not in changed]
+            self._keys = list(heapq.merge(kept, added))
+
+    def _drop(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            item = (key, kind, pk)
+            position = bisect_left(self._keys, item)
+            if position < len(self._keys) and self._keys[position] == item:
+                del self._keys[position]
+        self._forget(entry['keys'])
+
+    def _forget(self, keys):
+        """Drop memoised results of every prefix the keys fall under"""
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self._memo.pop(key[:end], None)
+
+    def discard(self, kind, pk):
+        """Remove a row deleted in this process right away, before the next refresh"""
+        with self._lock:
+            self._drop(kind, pk)
+
+    # Lookup
+
+    def suggest(self, query, limit=10):
+        """Top `limit` suggestions by popularity whose label has a word starting with `query`"""
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        if not self._loaded:
+            self._reload.start()
+            return []
+        self.refresh()
+        with self._lock:
+            results = self._memo.get(prefix, {}).get(limit)
+            if results is not None:
+                return results
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + END,), start)
+            # Every match is ranked; ties keep the closest completion first
+            matches = dict.fromkeys((kind, pk) for _, kind, pk in self._keys[start:end])
+            best = heapq.nlargest(limit, matches, key=lambda item: self._entries[item]['popularity'])
+            results = [
+                {'type': kind, 'id': pk, 'label': self._entries[(kind, pk)]['label'],
+                 'slug': self._entries[(kind, pk)]['slug']}
+                for kind, pk in best
+            ]
+            if len(self._memo) >= self.MEMO_SIZE:
+                self._memo.clear()
+            self._memo.setdefault(prefix, {})[limit] = results
+        return results
+
+
+autocomplete_index = AutocompleteIndex()
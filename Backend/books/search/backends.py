@@ -0,0 +1,198 @@
+"""
+Search backends for Books app
+Every backend answers `search(query, limit)` with book ids, best match first,
+and `matching(query)` with every matching id for use as an id__in filter
+"""
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from ..models import Book, BookSearchDocument
+from .documents import build_document
+from .normalize import normalize_terms
+
+
+def query_terms(query):
+    """Split a user query into index terms, normalised like the documents"""
+    return normalize_terms(query)
+
+
+class BaseSearchBackend:
+    """
+    Common interface for catalog search.
+    Database backends share the document upkeep below; the database keeps
+    its own index over BookSearchDocument rows in step.
+    """
+
+    name = 'base'
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+    def matching(self, query):
+        """
+        Every book id matching `query`, for narrowing a queryset with
+        id__in. Unlike `search` it is neither ranked nor capped, so filters,
+        counts and facets applied on top see the whole result.
+        """
+        return self.search(query, None)
+
+    def warm(self):
+        """Prepare the backend at worker start; database backends need nothing"""
+
+    def index(self, book):
+        """Create, refresh or drop the search document for one book"""
+        if not book.is_active:
+            self.remove(book.pk)
+            return
+        BookSearchDocument.objects.update_or_create(book_id=book.pk, defaults=build_document(book))
+
+    def index_books(self, books):
+        """Refresh the documents for many books in one statement"""
+        books = list(books)
+        self.remove_many([book.pk for book in books if not book.is_active])
+        BookSearchDocument.objects.bulk_create(
+            [
+                BookSearchDocument(book_id=book.pk, **build_document(book))
+                for book in books if book.is_active
+            ],
+            update_conflicts=True,
+            unique_fields=['book'],
+            update_fields=['title', 'names', 'body', 'updated_at'],
+            batch_size=500
+        )
+
+    def remove(self, book_id):
+        self.remove_many([book_id])
+
+    def remove_many(self, book_ids):
+        if book_ids:
+            BookSearchDocument.objects.filter(book_id__in=book_ids).delete()
+
+    def rebuild(self):
+        """Rebuild every document from the Book table"""
+        BookSearchDocument.objects.all().delete()
+        books = Book.objects.filter(is_active=True).select_related('author', 'publisher')
+        batch = []
+        for book in books.iterator(chunk_size=500):
+            batch.append(book)
+            if len(batch) >= 500:
+                self.index_books(batch)
+                batch = []
+        self.index_books(batch)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 index ranked by bm25, title weighted above names above body"""
+
+    name = 'sqlite'
+    weights = (10.0, 5.0, 1.0)
+
+    def match_expression(self, terms):
+        # Quote every term so user input is never read as FTS syntax;
+        # the last term is a prefix so results appear while typing
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM books_book_fts WHERE books_book_fts MATCH %s '
+                'ORDER BY bm25(books_book_fts, %s, %s, %s) LIMIT %s',
+                [self.match_expression(terms), *self.weights, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matching(self, query):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # A subquery, so a broad match never becomes a huge parameter list
+        return Book.objects.filter(id__in=RawSQL(
+            'SELECT rowid FROM books_book_fts WHERE books_book_fts MATCH %s', [self.match_expression(terms)]
+        )).values_list('id', flat=True)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector with a GIN index, ranked by ts_rank"""
+
+    name = 'postgresql'
+
+    def tsquery(self, terms):
+        return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT book_id FROM books_booksearchdocument, to_tsquery('simple', %s) query "
+                "WHERE search_vector @@ query "
+                "ORDER BY ts_rank(search_vector, query) DESC LIMIT %s",
+                [self.tsquery(terms), limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matching(self, query):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        return Book.objects.filter(id__in=RawSQL(
+            "SELECT book_id FROM books_booksearchdocument WHERE search_vector @@ to_tsquery('simple', %s)",
+            [self.tsquery(terms)]
+        )).values_list('id', flat=True)
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Fallback for databases without a full-text engine.
+    Titles starting with the query come first from the indexed search_key;
+    the rest is a scan, but of one narrow table with no joins or DISTINCT.
+    """
+
+    name = 'simple'
+
+    def documents(self, terms):
+        """Documents containing every term"""
+        documents = BookSearchDocument.objects.all()
+        for term in terms:
+            documents = documents.filter(
+                Q(title__contains=term) | Q(names__contains=term) | Q(body__contains=term)
+            )
+        return documents
+
+    def matching(self, query):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        return Book.objects.filter(
+            Q(is_active=True, search_key__startswith=' '.join(terms))
+            | Q(id__in=self.documents(terms).values('book_id'))
+        ).values_list('id', flat=True)
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        prefix_ids = list(
+            Book.objects.filter(is_active=True, search_key__startswith=' '.join(terms))
+            .order_by('search_key')
+            .values_list('id', flat=True)[:limit]
+        )
+        if len(prefix_ids) >= limit:
+            return prefix_ids
+
+        documents = self.documents(terms).exclude(book_id__in=prefix_ids)
+        title_match = Q()
+        for term in terms:
+            title_match &= Q(title__contains=term)
+        documents = documents.annotate(
+            title_rank=Case(When(title_match, then=Value(1)), default=Value(0), output_field=IntegerField())
+        ).order_by('-title_rank', 'book_id')
+        return prefix_ids + list(documents.values_list('book_id', flat=True)[:limit - len(prefix_ids)])
@@ -0,0 +1,23 @@
+"""
+Search documents for Books app
+Flatten a Book and its relations into the fields the search index stores
+"""
+
+from .normalize import normalize_text
+
+
+def _join(*parts):
+    return ' '.join(part for part in parts if part)
+
+
+def build_document(book):
+    """
+    Return the (title, names, body) search fields for a book.
+    Everything is stored normalised so queries normalised the same way match
+    regardless of script or apostrophe variant.
+    """
+    return {
+        'title': book.search_key,
+        'names': _join(book.author.search_key, normalize_text(book.publisher.name)),
+        'body': normalize_text(_join(book.description, book.isbn)),
+    }
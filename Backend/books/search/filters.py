@@ -0,0 +1,17 @@
+"""
+DRF filter backends for catalog search
+"""
+
+from rest_framework import filters
+
+from . import matching_book_ids
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """SearchFilter answered by the catalog search index instead of icontains joins"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return queryset.filter(id__in=matching_book_ids(query))
@@ -0,0 +1,277 @@
+"""
+In-memory search for Books app
+Pure-Python inverted index with array-backed postings and BM25 ranking
+"""
+
+import heapq
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+
+from ..changes import ChangeFeed
+from ..models import BookSearchDocument
+from ..refresh import BackgroundTask
+from .backends import BaseSearchBackend, SimpleSearchBackend, query_terms
+from .documents import build_document
+from .normalize import normalize_terms
+
+
+class InvertedIndex:
+    """
+    Inverted index over weighted document fields.
+    Postings are parallel `array('q')` document numbers and `array('f')`
+    weighted term frequencies, so a million-book catalog costs a few bytes
+    per posting instead of a Python object. Every (re)indexed book gets a
+    fresh document number; stale numbers are skipped at query time and
+    compacted away once enough of them pile up.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    # Field boosts applied to term frequencies before BM25 saturation
+    field_weights = {'title': 3.0, 'names': 2.0, 'body': 1.0}
+    compact_ratio = 0.2
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}       # term -> (array('q') doc numbers, array('f') frequencies)
+        self._lengths = {}        # live doc number -> weighted length
+        self._numbers = {}        # book id -> live doc number
+        self._book_ids = {}       # live doc number -> book id
+        self._doc_terms = {}      # doc number -> terms, kept until compaction
+        self._dead = set()        # doc numbers awaiting compaction
+        self._next_number = 0
+        self._total_length = 0.0
+        self._vocabulary = None   # sorted terms for prefix lookups, rebuilt lazily
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, book_id, fields):
+        """Index a document, replacing any previous version"""
+        with self._lock:
+            self.remove(book_id)
+            frequencies = Counter()
+            for field, text in fields.items():
+                weight = self.field_weights.get(field, 1.0)
+                for term in normalize_terms(text):
+                    frequencies[term] += weight
+
+            number = self._next_number
+            self._next_number += 1
+            for term, frequency in frequencies.items():
+                if term not in self._postings:
+                    self._postings[term] = (array('q'), array('f'))
+                    self._vocabulary = None
+                numbers, freqs = self._postings[term]
+                numbers.append(number)
+                freqs.append(frequency)
+
+            length = sum(frequencies.values())
+            self._lengths[number] = length
+            self._numbers[book_id] = number
+            self._book_ids[number] = book_id
+            self._doc_terms[number] = tuple(frequencies)
+            self._total_length += length
+
+    def remove(self, book_id):
+        with self._lock:
+            number = self._numbers.pop(book_id, None)
+            if number is None:
+                return
+            del self._book_ids[number]
+            self._total_length -= self._lengths.pop(number)
+            self._dead.add(number)
+            if len(self._dead) > self.compact_ratio * max(len(self._lengths), 1):
+                self.compact()
+
+    def compact(self):
+        """Physically drop postings of removed or replaced documents"""
+        with self._lock:
+            dead = self._dead
+            terms = set()
+            for number in dead:
+                terms.update(self._doc_terms.pop(number, ()))
+            for term in terms:
+                numbers, freqs = self._postings[term]
+                keep = [i for i, number in enumerate(numbers) if number not in dead]
+                if keep:
+                    self._postings[term] = (
+                        array('q', (numbers[i] for i in keep)),
+                        array('f', (freqs[i] for i in keep)),
+                    )
+                else:
+                    del self._postings[term]
+                    self._vocabulary = None
+            self._dead = set()
+
+    def terms(self):
+        """Every indexed term with its posting count"""
+        return {term: len(numbers) for term, (numbers, _) in self._postings.items()}
+
+    def _expand(self, term):
+        """The last query term matches as a prefix, like the database backends"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        position = bisect_left(self._vocabulary, term)
+        expanded = []
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            expanded.append(self._vocabulary[position])
+            position += 1
+        return expanded
+
+    def _term_scores(self, term, count, average_length):
+        numbers, freqs = self._postings.get(term, ((), ()))
+        live = [(number, frequency) for number, frequency in zip(numbers, freqs) if number in self._lengths]
+        if not live:
+            return {}
+        df = len(live)
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        k1, b = self.k1, self.b
+        lengths = self._lengths
+        return {
+            number: idf * frequency * (k1 + 1) / (
+                frequency + k1 * (1 - b + b * lengths[number] / average_length)
+            )
+            for number, frequency in live
+        }
+
+    def search(self, terms, limit):
+        """Return up to `limit` (or, with None, all) book ids ranked by BM25; every term must match"""
+        if not terms or not self._lengths:
+            return []
+        with self._lock:
+            count = len(self._lengths)
+            average_length = self._total_length / count
+            scores = None
+            for position, term in enumerate(terms):
+                expanded = self._expand(term) if position == len(terms) - 1 else [term]
+                term_scores = {}
+                for candidate in expanded:
+                    for number, score in self._term_scores(candidate, count, average_length).items():
+                        if score > term_scores.get(number, 0.0):
+                            term_scores[number] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        number: score + term_scores[number]
+                        for number, score in scores.items() if number in term_scores
+                    }
+                if not scores:
+                    return []
+            if limit is None:
+                best = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            else:
+                best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [self._book_ids[number] for number, _ in best]
+
+
+class MemorySearchBackend(BaseSearchBackend):
+    """
+    Search backend for deployments without database full-text search.
+    Documents are still written to BookSearchDocument: workers load the
+    index from that one narrow table at start and apply their own writes
+    through the Book signals. Every BOOKS_SEARCH_REFRESH_INTERVAL seconds
+    they re-read the documents of the books other workers wrote, from the
+    book change log, which also covers deletions and bulk updates. A full
+    reload only runs at start or, if the log cannot be followed, on a
+    background thread; until the first load is done searches are answered
+    from the database.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self.inverted_index = InvertedIndex()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._changes = ChangeFeed()
+        self._refreshed_at = 0.0
+        self._reload = BackgroundTask('search-index', self.warm)
+        self._fallback = SimpleSearchBackend()
+
+    def warm(self):
+        """Build the whole index from the stored search documents, then swap it in"""
+        with self._lock:
+            # Start before loading, so writes during the load are applied afterwards
+            self._changes.start()
+            index = InvertedIndex()
+            documents = BookSearchDocument.objects.filter(book__is_active=True)
+            for book_id, title, names, body in documents.values_list(
+                'book_id', 'title', 'names', 'body'
+            ).iterator(chunk_size=2000):
+                index.add(book_id, {'title': title, 'names': names, 'body': body})
+            self.inverted_index = index
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+
+    def _apply(self, book_ids):
+        """Re-read the documents of `book_ids`; books without an active document leave the index"""
+        documents = BookSearchDocument.objects.filter(book_id__in=book_ids, book__is_active=True)
+        found = set()
+        for book_id, title, names, body in documents.values_list('book_id', 'title', 'names', 'body'):
+            self.inverted_index.add(book_id, {'title': title, 'names': names, 'body': body})
+            found.add(book_id)
+        for book_id in set(book_ids) - found:
+            self.inverted_index.remove(book_id)
+
+    def refresh(self):
+        """Apply the books written since the last refresh, checked at most once per interval"""
+        now = time.monotonic()
+        if now - self._refreshed_at < settings.BOOKS_SEARCH_REFRESH_INTERVAL:
+            return
+        # Another request is already refreshing or a reload is running
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed_at = now
+            book_ids = self._changes.read()
+            if book_ids is None:
+                self._reload.start()
+            elif book_ids:
+                self._apply(book_ids)
+        finally:
+            self._lock.release()
+
+    def search(self, query, limit):
+        if not self._loaded:
+            self._reload.start()
+            if limit is None:
+                return list(self._fallback.matching(query))
+            return self._fallback.search(query, limit)
+        self.refresh()
+        return self.inverted_index.search(query_terms(query), limit)
+
+    def index(self, book):
+        super().index(book)
+        if self._loaded:
+            if book.is_active:
+                self.inverted_index.add(book.pk, build_document(book))
+            else:
+                self.inverted_index.remove(book.pk)
+
+    def index_books(self, books):
+        books = list(books)
+        super().index_books(books)
+        if self._loaded:
+            for book in books:
+                if book.is_active:
+                    self.inverted_index.add(book.pk, build_document(book))
+                else:
+                    self.inverted_index.remove(book.pk)
+
+    def remove_many(self, book_ids):
+        super().remove_many(book_ids)
+        if self._loaded:
+            for book_id in book_ids:
+                self.inverted_index.remove(book_id)
+
+    def rebuild(self):
+        super().rebuild()
+        self.warm()
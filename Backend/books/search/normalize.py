@@ -0,0 +1,48 @@
+"""
+Search text normalisation for Books app
+Fold Uzbek Latin, Uzbek Cyrillic and Russian spellings onto one search key
+"""
+
+import re
+import unicodedata
+
+
+# Every apostrophe-like character seen in o'/g' and the tutuq belgisi
+APOSTROPHES = "'`´ʹʻʼʽ‘’‚‛′"
+
+# Cyrillic to Uzbek Latin; ў/ғ lose their apostrophe like o'/g' do
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '',
+    'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+
+_TRANSLATION = str.maketrans({
+    **{char: '' for char in APOSTROPHES},
+    **CYRILLIC_TO_LATIN,
+})
+
+_NON_WORD_RE = re.compile(r'[^\w]+')
+
+
+def normalize_text(text):
+    """
+    Return the search key for a piece of text.
+    Lowercases, drops apostrophes, transliterates Cyrillic to Latin, strips
+    diacritics and collapses punctuation, so "O'tgan kunlar", "O‘tgan kunlar"
+    and "Ўтган кунлар" all become "otgan kunlar".
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text).lower().translate(_TRANSLATION)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD_RE.sub(' ', text).replace('_', ' ').split())
+
+
+def normalize_terms(text):
+    """Split normalised text into search terms"""
+    return normalize_text(text).split()
@@ -0,0 +1,220 @@
+"""
+Spelling correction for Books app
+Symmetric-delete dictionary of title and name terms for "did you mean"
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from ..changes import ChangeFeed
+from ..models import BookSearchDocument
+from ..refresh import BackgroundTask
+from .documents import build_document
+from .normalize import normalize_terms
+
+
+def edit_distance(source, target, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = source[i - 1] != target[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and previous2 is not None
+                    and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellingIndex:
+    """
+    Symmetric-delete dictionary (as in SymSpell) over catalog terms.
+    Every term is stored under each string reachable by deleting up to
+    BOOKS_SPELLING_MAX_DISTANCE characters from its first PREFIX_LENGTH
+    characters; a misspelling is looked up the same way, so a query costs
+    a fixed number of dict probes plus a capped number of distance checks
+    and never touches the Book table. Terms are counted per book: the
+    Book signals apply this process's writes, other workers' writes are
+    re-read from the book change log every BOOKS_SEARCH_REFRESH_INTERVAL
+    seconds, and a term leaves the dictionary with its last book. A full
+    build only runs at start or, if the log cannot be followed, on a
+    background thread; until the first one is done nothing is suggested.
+    """
+
+    PREFIX_LENGTH = 7
+    MIN_TERM_LENGTH = 3
+    MAX_QUERY_TERMS = 6
+    MAX_CANDIDATES = 200
+
+    def __init__(self):
+        self._lock = threading.RLock()           # guards the dictionaries
+        self._refresh_lock = threading.Lock()    # one build or refresh at a time
+        self._terms = {}         # term -> number of books using it, also breaks ties
+        self._deletes = {}       # deleted variant -> [terms]
+        self._book_terms = {}    # book id -> terms counted for it
+        self._loaded = False
+        self._changes = ChangeFeed()
+        self._refreshed_at = 0.0
+        self._reload = BackgroundTask('spelling-index', self.warm)
+
+    @property
+    def max_distance(self):
+        return settings.BOOKS_SPELLING_MAX_DISTANCE
+
+    def _variants(self, term):
+        """The term's prefix and every string left after deleting up to max_distance characters"""
+        variants = {term[:self.PREFIX_LENGTH]}
+        edge = set(variants)
+        for _ in range(self.max_distance):
+            edge = {
+                word[:i] + word[i + 1:]
+                for word in edge if len(word) > 1
+                for i in range(len(word))
+            }
+            variants |= edge
+        return variants
+
+    def _document_terms(self, title, names):
+        return frozenset(
+            term for term in normalize_terms(f'{title} {names}')
+            if len(term) >= self.MIN_TERM_LENGTH and not term.isdigit()
+        )
+
+    def _add(self, term, terms, deletes):
+        if term in terms:
+            terms[term] += 1
+            return
+        terms[term] = 1
+        for variant in self._variants(term):
+            deletes.setdefault(variant, []).append(term)
+
+    def _discard(self, term):
+        self._terms[term] -= 1
+        if self._terms[term]:
+            return
+        del self._terms[term]
+        for variant in self._variants(term):
+            stored = self._deletes[variant]
+            stored.remove(term)
+            if not stored:
+                del self._deletes[variant]
+
+    def _set_book(self, book_id, terms):
+        """Replace the terms counted for one book; an empty set removes it"""
+        with self._lock:
+            previous = self._book_terms.pop(book_id, frozenset())
+            for term in previous - terms:
+                self._discard(term)
+            for term in terms - previous:
+                self._add(term, self._terms, self._deletes)
+            if terms:
+                self._book_terms[book_id] = terms
+
+    def warm(self):
+        """Build the dictionary from the active books' documents, then swap it in"""
+        with self._refresh_lock:
+            # Start before loading, so writes during the load are applied afterwards
+            self._changes.start()
+            terms, deletes, book_terms = {}, {}, {}
+            documents = BookSearchDocument.objects.filter(book__is_active=True)
+            for book_id, title, names in documents.values_list(
+                'book_id', 'title', 'names'
+            ).iterator(chunk_size=2000):
+                book_terms[book_id] = self._document_terms(title, names)
+                for term in book_terms[book_id]:
+                    self._add(term, terms, deletes)
+            with self._lock:
+                self._terms, self._deletes, self._book_terms = terms, deletes, book_terms
+                self._loaded = True
+            self._refreshed_at = time.monotonic()
+
+    def _apply(self, book_ids):
+        """Re-read the documents of `book_ids`; books without an active document lose their terms"""
+        documents = BookSearchDocument.objects.filter(book_id__in=book_ids, book__is_active=True)
+        found = set()
+        for book_id, title, names in documents.values_list('book_id', 'title', 'names'):
+            self._set_book(book_id, self._document_terms(title, names))
+            found.add(book_id)
+        for book_id in set(book_ids) - found:
+            self._set_book(book_id, frozenset())
+
+    def refresh(self):
+        """Apply the books written since the last refresh, checked at most once per interval"""
+        now = time.monotonic()
+        if now - self._refreshed_at < settings.BOOKS_SEARCH_REFRESH_INTERVAL:
+            return
+        # Another request is already refreshing or a build is running
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refreshed_at = now
+            book_ids = self._changes.read()
+            if book_ids is None:
+                self._reload.start()
+            elif book_ids:
+                self._apply(book_ids)
+        finally:
+            self._refresh_lock.release()
+
+    def index(self, book):
+        """Count the terms of a book saved in this process"""
+        if not self._loaded:
+            return
+        if not book.is_active:
+            self.remove(book.pk)
+            return
+        document = build_document(book)
+        self._set_book(book.pk, self._document_terms(document['title'], document['names']))
+
+    def remove(self, book_id):
+        if self._loaded:
+            self._set_book(book_id, frozenset())
+
+    def correct_term(self, term):
+        """Closest known term within max_distance, or None"""
+        if term in self._terms or len(term) < self.MIN_TERM_LENGTH:
+            return None
+        limit = self.max_distance
+        candidates = []
+        for variant in self._variants(term):
+            candidates.extend(self._deletes.get(variant, ()))
+            if len(candidates) >= self.MAX_CANDIDATES:
+                break
+
+        best = None
+        for candidate in set(candidates[:self.MAX_CANDIDATES]):
+            distance = edit_distance(term, candidate, limit)
+            if distance > limit:
+                continue
+            key = (distance, -self._terms[candidate], candidate)
+            if best is None or key < best:
+                best = key
+                limit = distance
+        return best[2] if best else None
+
+    def suggest(self, query):
+        """The query with unknown terms replaced by their closest catalog term, or None"""
+        terms = normalize_terms(query)
+        if not terms or len(terms) > self.MAX_QUERY_TERMS:
+            return None
+        if not self._loaded:
+            self._reload.start()
+            return None
+        self.refresh()
+        with self._lock:
+            corrected = [self.correct_term(term) or term for term in terms]
+        if corrected == terms:
+            return None
+        return ' '.join(corrected)
+
+
+spelling_index = SpellingIndex()
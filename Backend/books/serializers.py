@@ -2,101 +2,92 @@
 Serializers for Books app
 """
 from rest_framework import serializers
+from .categories import category_node
 from .models import Book, Category, Author, Publisher, Cart, CartItem, Wishlist
+from .sparse import SparseFieldsMixin
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Category model"""
     children = serializers.SerializerMethodField()
-    book_count = serializers.SerializerMethodField()
+    field_sources = {'children': ()}
+    book_count = serializers.IntegerField(source='active_book_count', read_only=True)
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'icon', 'parent', 
+        fields = ['id', 'name', 'slug', 'description', 'icon', 'parent', 'depth',
                   'children', 'book_count', 'is_active', 'created_at']
-        read_only_fields = ['slug', 'created_at']
+        read_only_fields = ['slug', 'depth', 'created_at']
     
     def get_children(self, obj):
-        if obj.children.exists():
-            return CategorySerializer(obj.children.all(), many=True).data
-        return []
-    
-    def get_book_count(self, obj):
-        return obj.book_set.count()
+        # Nested nodes from the cached tree rather than two queries per child
+        node = category_node(obj.id)
+        return node['children'] if node else []
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Author model"""
-    book_count = serializers.SerializerMethodField()
+    book_count = serializers.IntegerField(source='active_book_count', read_only=True)
     
     class Meta:
         model = Author
         fields = ['id', 'name', 'slug', 'bio', 'photo', 'birth_date', 
                   'nationality', 'book_count', 'created_at']
         read_only_fields = ['slug', 'created_at']
-    
-    def get_book_count(self, obj):
-        return obj.book_set.count()
 
 
-class PublisherSerializer(serializers.ModelSerializer):
+class PublisherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Publisher model"""
-    book_count = serializers.SerializerMethodField()
+    book_count = serializers.IntegerField(source='active_book_count', read_only=True)
     
     class Meta:
         model = Publisher
         fields = ['id', 'name', 'slug', 'website', 'logo', 'book_count', 'created_at']
         read_only_fields = ['slug', 'created_at']
-    
-    def get_book_count(self, obj):
-        return obj.book_set.count()
 
 
-class BookListSerializer(serializers.ModelSerializer):
+class BookListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for book lists"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.CharField(source='author.name', read_only=True)
     publisher_name = serializers.CharField(source='publisher.name', read_only=True)
-    discount_percentage = serializers.SerializerMethodField()
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_percentage = serializers.IntegerField(read_only=True)
     average_rating = serializers.SerializerMethodField()
+    # Not in the default row; output only when named in ?fields= or ?expand=
+    expandable_fields = {'category': CategorySerializer, 'author': AuthorSerializer, 'publisher': PublisherSerializer}
+    field_sources = {'average_rating': ('rating',)}
     
     class Meta:
         model = Book
         fields = ['id', 'title', 'slug', 'author_name', 'category_name', 
-                  'publisher_name', 'price', 'original_price', 'discount_percentage',
-                  'cover_image', 'average_rating', 'rating_count', 'stock', 
+                  'publisher_name', 'price', 'discount_price', 'effective_price', 'discount_percentage',
+                  'cover_image', 'average_rating', 'review_count', 'stock', 
                   'is_featured', 'is_bestseller', 'language']
-        read_only_fields = ['slug', 'average_rating', 'rating_count']
-    
-    def get_discount_percentage(self, obj):
-        if obj.original_price and obj.original_price > obj.price:
-            return round(((obj.original_price - obj.price) / obj.original_price) * 100)
-        return 0
+        read_only_fields = ['slug', 'average_rating', 'review_count']
     
     def get_average_rating(self, obj):
-        return obj.average_rating or 0
+        return obj.rating or 0
 
 
-class BookDetailSerializer(serializers.ModelSerializer):
+class BookDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Detailed serializer for single book view"""
     category = CategorySerializer(read_only=True)
     author = AuthorSerializer(read_only=True)
     publisher = PublisherSerializer(read_only=True)
-    discount_percentage = serializers.SerializerMethodField()
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_percentage = serializers.IntegerField(read_only=True)
     average_rating = serializers.SerializerMethodField()
+    expandable_fields = {'category': CategorySerializer, 'author': AuthorSerializer, 'publisher': PublisherSerializer}
+    field_sources = {'average_rating': ('rating',)}
     
     class Meta:
         model = Book
         fields = '__all__'
-        read_only_fields = ['slug', 'created_at', 'updated_at', 'average_rating', 'rating_count']
-    
-    def get_discount_percentage(self, obj):
-        if obj.original_price and obj.original_price > obj.price:
-            return round(((obj.original_price - obj.price) / obj.original_price) * 100)
-        return 0
+        read_only_fields = ['slug', 'created_at', 'updated_at', 'average_rating', 'review_count']
     
     def get_average_rating(self, obj):
-        return obj.average_rating or 0
+        return obj.rating or 0
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -111,7 +102,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['subtotal', 'added_at']
     
     def get_subtotal(self, obj):
-        return obj.book.price * obj.quantity
+        return obj.book.effective_price * obj.quantity
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -130,7 +121,7 @@ class CartSerializer(serializers.ModelSerializer):
         return sum(item.quantity for item in obj.items.all())
     
     def get_total_price(self, obj):
-        return sum(item.book.price * item.quantity for item in obj.items.all())
+        return sum(item.book.effective_price * item.quantity for item in obj.items.all())
 
 
 class WishlistSerializer(serializers.ModelSerializer):
@@ -0,0 +1,115 @@
+"""
+Homepage shelves for Books app
+Featured, bestseller and new-arrival lists served as cached serialised payloads
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Book
+
+
+# Book fields whose change can move a book onto, off or around a shelf, or
+# change what its row shows (BookListSerializer and the list projection)
+SHELF_FIELDS = (
+    'is_featured', 'is_bestseller', 'is_active', 'bestseller_rank',
+    'title', 'slug', 'author_id', 'category_id', 'publisher_id', 'price', 'discount_price',
+    'cover_image', 'rating', 'review_count', 'stock', 'language',
+)
+
+
+class Shelf:
+    """An ordered slice of the active catalog, optionally limited to one flag"""
+
+    def __init__(self, name, ordering, flag=None):
+        self.name = name
+        self.ordering = ordering
+        self.flag = flag
+
+    def queryset(self):
+        books = Book.objects.filter(is_active=True).select_related('author', 'category', 'publisher')
+        if self.flag:
+            books = books.filter(**{self.flag: True})
+        return books.order_by(*self.ordering)[:settings.BOOKS_SHELF_SIZE]
+
+    def may_enter(self, book, created):
+        """Whether a saved book could now belong on the shelf"""
+        if not book.is_active:
+            return False
+        if self.flag:
+            return getattr(book, self.flag)
+        # Only a new or reactivated book can displace the newest arrivals
+        return created
+
+
+SHELVES = {
+    'featured': Shelf('featured', ['-created_at', '-id'], flag='is_featured'),
+    # Ranked by books.bestsellers from recent sales
+    'bestsellers': Shelf('bestsellers', ['bestseller_rank', '-id'], flag='is_bestseller'),
+    'new_arrivals': Shelf('new_arrivals', ['-created_at', '-id']),
+}
+
+
+def _version_key(name):
+    return f'books:shelf_version:{name}'
+
+
+def shelf_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(name), version, None)
+        version = cache.get(_version_key(name), version)
+    return version
+
+
+def invalidate_shelf(name):
+    """Drop every cached payload of a shelf; the next read rebuilds it"""
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), time.time_ns(), None)
+
+
+def invalidate_shelves():
+    """Drop every shelf, e.g. after an author, category or publisher rename shown in the rows"""
+    for name in SHELVES:
+        invalidate_shelf(name)
+
+
+def shelf_members(name):
+    """Ids on the shelf as last built, or None if it has not been built"""
+    return cache.get(f'books:shelf:{name}:{shelf_version(name)}:ids')
+
+
+def shelf_payload(name, serialize, variant, limit=None):
+    """
+    The shelf's books as produced by `serialize(queryset)`, cached per
+    `variant` so DRF and FastAPI keep their own response shapes.
+    `serialize` must return a list, one item (dict or object) with an
+    `id` per book.
+    """
+    shelf = SHELVES[name]
+    prefix = f'books:shelf:{name}:{shelf_version(name)}'
+    payload = cache.get(f'{prefix}:{variant}')
+    if payload is None:
+        payload = serialize(shelf.queryset())
+        cache.set_many({
+            f'{prefix}:{variant}': payload,
+            f'{prefix}:ids': [item['id'] if isinstance(item, dict) else item.id for item in payload],
+        }, settings.BOOKS_SHELF_CACHE_TIMEOUT)
+    return payload[:limit] if limit is not None else payload
+
+
+def book_shelves_changed(book, created=False, deleted=False, changed=SHELF_FIELDS):
+    """Invalidate the shelves a saved or deleted book is, or could now be, on"""
+    if not created and not deleted and not changed:
+        return
+    for name, shelf in SHELVES.items():
+        members = shelf_members(name)
+        if members is None:
+            continue
+        if book.pk in members or (not deleted and shelf.may_enter(book, created or 'is_active' in changed)):
+            invalidate_shelf(name)
@@ -0,0 +1,141 @@
+"""
+Signal handlers for Books app
+Keep catalog caches and the search index in step with Book changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .catalog import catalog_snapshot
+from .categories import invalidate_category_tree
+from .changes import log_book_changes
+from .counters import book_counts_changed
+from .models import Book, Category, Author, Publisher, Cart, CartItem, RelatedBook, Wishlist
+from .recommendations import recommendations_changed
+from .related import RELATED_FIELDS, related_books_refresh, related_lists_refresh
+from .search import get_search_backend
+from .search.autocomplete import autocomplete_index
+from .search.spelling import spelling_index
+from .shelves import SHELF_FIELDS, book_shelves_changed, invalidate_shelves
+from .trending import record_activity
+
+
+# Book fields that feed the search document
+SEARCH_FIELDS = {'title', 'subtitle', 'description', 'isbn', 'author', 'publisher', 'is_active'}
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    """Any Book write can change listing counts, and other workers' indexes apply it from the log"""
+    bump_catalog_version()
+    log_book_changes([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def book_counted_fields_saved(sender, instance, created, **kwargs):
+    """Keep active_book_count on the book's category, author and publisher"""
+    book_counts_changed(instance, created=created)
+
+
+@receiver(post_delete, sender=Book)
+def book_counted_deleted(sender, instance, **kwargs):
+    book_counts_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, update_fields=None, **kwargs):
+    """Refresh the search document unless only unrelated fields were saved"""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index(instance)
+    spelling_index.index(instance)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+    spelling_index.remove(instance.pk)
+    catalog_snapshot.discard(instance.pk)
+    book_shelves_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Book)
+def book_shelf_fields_saved(sender, instance, created, **kwargs):
+    """Rebuild shelves only when a field they show or select on changed"""
+    book_shelves_changed(instance, created=created, changed=instance.changed_fields(SHELF_FIELDS))
+
+
+@receiver(post_save, sender=Book)
+def book_related_fields_saved(sender, instance, created, **kwargs):
+    """Re-rank related books when a book's author, category or visibility changed"""
+    if created or instance.changed_fields(RELATED_FIELDS):
+        transaction.on_commit(lambda: related_books_refresh.add([instance.pk]))
+
+
+@receiver(pre_delete, sender=Book)
+def book_related_deleting(sender, instance, **kwargs):
+    """Lists holding a deleted book lose that row to the cascade; refill them afterwards"""
+    holding = list(RelatedBook.objects.filter(related_id=instance.pk).values_list('book_id', flat=True))
+    if holding:
+        transaction.on_commit(lambda: related_lists_refresh.add(holding))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+def book_relation_changed(sender, instance, created, **kwargs):
+    """Renames change which books match a name search, and the names shelf rows show"""
+    if not created:
+        bump_catalog_version()
+        invalidate_shelves()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Any category write can change the menu tree, and the homepage bundle and details that carry it"""
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+def book_names_changed(sender, instance, created, **kwargs):
+    """Author and publisher names are part of every book's search document"""
+    if not created:
+        books = list(instance.books.select_related('author', 'publisher'))
+        get_search_backend().index_books(books)
+        for book in books:
+            spelling_index.index(book)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def autocomplete_row_deleted(sender, instance, **kwargs):
+    """Drop a deleted row from this process's typeahead before the next refresh"""
+    autocomplete_index.discard(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_item_changed(sender, instance, **kwargs):
+    """Cart contents feed the owner's recommendations"""
+    user_id = Cart.objects.filter(id=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        recommendations_changed(user_id)
+
+
+@receiver(post_save, sender=CartItem)
+def cart_item_added(sender, instance, created, **kwargs):
+    """Adding a book to a cart counts towards its trending score"""
+    if created:
+        transaction.on_commit(lambda: record_activity('cart_adds', [instance.book_id], instance.quantity))
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    recommendations_changed(instance.user_id)
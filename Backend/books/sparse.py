@@ -0,0 +1,224 @@
+"""
+Sparse fieldsets for Books app
+?fields= and ?expand= for DRF serializers, and the only()/select_related/prefetch_related to match
+"""
+
+from django.db.models import Prefetch
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_paths(value):
+    """'id,category.name' -> {'id': {}, 'category': {'name': {}}}; None when the parameter is absent"""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def request_sparse(request):
+    """(fields, expand) trees from the query string; (None, None) leaves a serializer as declared"""
+    if request is None:
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+    return parse_paths(params.get('fields')), parse_paths(params.get('expand'))
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin for `?fields=` and `?expand=`.
+
+    Without either parameter the serializer is unchanged. `fields` keeps
+    only the named fields (dotted names select inside a relation). Once
+    either parameter is given, the relations in `expandable_fields`
+    render as primary keys unless named in `expand` (or selected into
+    with a dotted field), and expanded ones apply the rest of the path to
+    their own fields. An expandable relation missing from Meta.fields is
+    only output when asked for. Unknown names are a 400. `field_sources`
+    lists the model lookups that SerializerMethodFields read, so the
+    queryset can be narrowed to them.
+    """
+
+    # name -> nested serializer class; `many` is taken from the model relation
+    expandable_fields = {}
+    # SerializerMethodField name -> model lookups it reads
+    field_sources = {}
+
+    def __init__(self, *args, sparse=None, sparse_path='', **kwargs):
+        self._sparse = sparse
+        self._sparse_path = sparse_path
+        super().__init__(*args, **kwargs)
+
+    @property
+    def sparse(self):
+        """(fields, expand) for this serializer; only the outermost one reads the request"""
+        if self._sparse is None:
+            parent = self.parent
+            if isinstance(parent, serializers.ListSerializer):
+                parent = parent.parent
+            self._sparse = request_sparse(self.context.get('request')) if parent is None else (None, None)
+        return self._sparse
+
+    def _check_sparse(self, available):
+        """Reject names this serializer cannot output or expand"""
+        fields, expand = self.sparse
+        errors = {}
+        unknown = [
+            name if name not in available else f'{name}.{next(iter(below))}'
+            for name, below in (fields or {}).items()
+            if name not in available or (below and name not in self.expandable_fields)
+        ]
+        if unknown:
+            errors['fields'] = [f"Unknown field '{self._sparse_path}{name}'." for name in unknown]
+        unknown = [name for name in (expand or {}) if name not in self.expandable_fields]
+        if unknown:
+            errors['expand'] = [f"'{self._sparse_path}{name}' cannot be expanded." for name in unknown]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        fields, expand = self.sparse
+        if fields is None and expand is None:
+            return names
+        available = [*names, *(name for name in self.expandable_fields if name not in names)]
+        self._check_sparse(available)
+        wanted = {*(names if fields is None else fields), *(expand or ())}
+        return [name for name in available if name in wanted]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, expand = self.sparse
+        if selected is None and expand is None:
+            return fields
+        expand = expand or {}
+        model = self.Meta.model
+        for name, serializer_class in self.expandable_fields.items():
+            if name not in fields:
+                continue
+            many = model._meta.get_field(name).one_to_many or model._meta.get_field(name).many_to_many
+            sub_fields = (selected or {}).get(name) or None
+            if name in expand or sub_fields:
+                fields[name] = serializer_class(
+                    many=many, read_only=True,
+                    sparse=(sub_fields, expand.get(name, {})), sparse_path=f'{self._sparse_path}{name}.'
+                )
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+        return fields
+
+
+class Loads:
+    """What a serializer reads at one model level: its columns and the relations below it"""
+
+    def __init__(self):
+        self.columns = set()
+        self.relations = {}
+        # False once a field reads something we cannot name, so only() is skipped
+        self.exhaustive = True
+
+    def add(self, model, lookup, nested=False):
+        """
+        Record a lookup such as 'rating' or 'category__name' and return the
+        Loads it ends in. A trailing foreign key is read as its id column
+        unless `nested`, when its row is serialised.
+        """
+        loads = self
+        parts = lookup.split('__')
+        for position, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                loads.exhaustive = False
+                return loads
+            if not field.is_relation or (field.many_to_one and position == len(parts) - 1 and not nested):
+                loads.columns.add(part)
+                return loads
+            loads = loads.relations.setdefault(part, Loads())
+            model = field.related_model
+        return loads
+
+
+def serializer_loads(serializer, model, loads=None):
+    """Loads for a (sparse) serializer over `model`"""
+    loads = Loads() if loads is None else loads
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    sources = getattr(serializer, 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if name not in sources:
+                loads.exhaustive = False
+            for lookup in sources.get(name, ()):
+                loads.add(model, lookup)
+            continue
+        lookup = '__'.join(field.source_attrs)
+        if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+            related = loads.add(model, lookup, nested=True)
+            if related is not loads and isinstance(field, serializers.BaseSerializer):
+                serializer_loads(field, _related_model(model, field.source_attrs), related)
+        else:
+            loads.add(model, lookup)
+    return loads
+
+
+def _related_model(model, attrs):
+    for attr in attrs:
+        model = model._meta.get_field(attr).related_model
+    return model
+
+
+def _apply(queryset, loads, keep=()):
+    """`queryset` with only()/select_related/prefetch_related for `loads`"""
+    only, select, prefetch = [], [], []
+
+    def walk(model, loads, prefix, restrict):
+        if restrict:
+            only.extend(prefix + column for column in loads.columns)
+        for name, related in loads.relations.items():
+            field = model._meta.get_field(name)
+            if field.many_to_one or (field.one_to_one and field.concrete):
+                select.append(prefix + name)
+                if restrict:
+                    only.append(prefix + name)
+                # A related row we cannot narrow is loaded whole
+                walk(field.related_model, related, f'{prefix}{name}__',
+                     restrict and related.exhaustive and bool(related.columns))
+            else:
+                # Reverse foreign keys also need the key back to the parent
+                back = (field.field.name,) if field.one_to_many else ()
+                children = _apply(field.related_model._default_manager.all(), related, back)
+                prefetch.append(Prefetch(prefix + name, queryset=children))
+
+    walk(queryset.model, loads, '', loads.exhaustive)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if loads.exhaustive:
+        queryset = queryset.only(*only, *keep)
+    return queryset
+
+
+def sparse_queryset(queryset, serializer):
+    """`queryset` narrowed to what `serializer` will read"""
+    return _apply(queryset, serializer_loads(serializer, queryset.model))
+
+
+class SparseFieldsViewSetMixin:
+    """Narrow the viewset queryset to the serializer's sparse fieldset on reads"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = request_sparse(self.request)
+        if self.request.method != 'GET' or (fields is None and expand is None):
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer())
@@ -1,3 +1,812 @@
-from django.test import TestCase
+import dataclasses
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.cache import has_vary_header
+
+from orders.models import Order, OrderItem
+from users.models import Address
+
+from .bestsellers import rebuild_bestsellers
+from .cache import CachedCountPaginator, bump_catalog_version
+from .catalog import CatalogSnapshot
+from .categories import subtree_ids
+from .changes import ChangeFeed, log_book_changes
+from .counters import reconcile_book_counts
+from .copurchase import rebuild_co_purchases, refresh_co_purchases
+from .management.commands.benchmark_projection import model_rows
+from .models import (
+    Author, Book, BookChange, BookCoPurchase, Category, Publisher, RelatedBook, TrendingBook, UserRecommendation, Wishlist
+)
+from .projection import list_rows, project_books
+from .recommendations import recommendation_refresh, recommended_book_ids
+from .related import rebuild_related_books, refresh_related_books, refresh_related_lists
+from .renderers import dumps
+from .search.autocomplete import AutocompleteIndex
+from .search.memory import MemorySearchBackend
+from .search.normalize import normalize_terms, normalize_text
+from .search.spelling import SpellingIndex
+from .trending import record_activity, refresh_trending, trending_book_ids, trending_refresh
+from .viewcounts import ViewCounter
+
+
+def make_book(title='Kitob', **fields):
+    author, _ = Author.objects.get_or_create(name='Muallif', slug='muallif')
+    category, _ = Category.objects.get_or_create(name='Adabiyot', slug='adabiyot')
+    publisher, _ = Publisher.objects.get_or_create(name='Nashriyot', slug='nashriyot')
+    defaults = {
+        'author': author, 'category': category, 'publisher': publisher,
+        'description': '', 'price': Decimal('10000'), 'pages': 100, 'publication_year': 2020,
+        'cover_image': 'books/covers/default.jpg',
+    }
+    return Book.objects.create(title=title, **{**defaults, **fields})
+
+
+def make_order(items, status='delivered'):
+    user, _ = get_user_model().objects.get_or_create(email='xaridor@example.com', defaults={'username': 'xaridor'})
+    address = Address.objects.filter(user=user).first() or Address.objects.create(
+        user=user, full_name='Xaridor', phone='1', address_line_1='Ko\'cha', city='Toshkent',
+        state='Toshkent', postal_code='100000'
+    )
+    order = Order.objects.create(user=user, shipping_address=address, subtotal=1, total=1, status=status)
+    for book, quantity in items:
+        OrderItem.objects.create(order=order, book=book, quantity=quantity, price=book.price)
+    return order
+
+
+class DiscountPercentageTests(TestCase):
+    """The stored discount_percentage rounds like the old Python property"""
+
+    def percentage(self, book):
+        return Book.objects.values_list('discount_percentage', flat=True).get(id=book.id)
+
+    def test_rounds_instead_of_truncating(self):
+        # 10150 / 30000 = 33.83%
+        book = make_book(price=Decimal('30000'), discount_price=Decimal('19850'))
+        self.assertEqual(self.percentage(book), 34)
+
+    def test_whole_percentage(self):
+        book = make_book(price=Decimal('50000'), discount_price=Decimal('40000'))
+        self.assertEqual(self.percentage(book), 20)
+
+    def test_no_discount(self):
+        self.assertEqual(self.percentage(make_book(title='A')), 0)
+        self.assertEqual(self.percentage(make_book(title='B', discount_price=Decimal('12000'))), 0)
+
+    def test_follows_bulk_price_updates(self):
+        book = make_book(price=Decimal('30000'), discount_price=Decimal('20000'))
+        Book.objects.filter(id=book.id).update(discount_price=Decimal('19850'))
+        self.assertEqual(self.percentage(book), 34)
+
+
+@override_settings(BOOKS_BESTSELLER_MIN_UNITS=3, BOOKS_BESTSELLER_SIZE=20)
+class RebuildBestsellersTests(TestCase):
+
+    def test_ranks_books_over_the_minimum(self):
+        first, second, quiet = make_book(title='A'), make_book(title='B'), make_book(title='C')
+        make_order([(first, 5), (second, 3), (quiet, 1)])
+        self.assertEqual(rebuild_bestsellers(), 2)
+        rows = dict(Book.objects.values_list('id', 'bestseller_rank'))
+        self.assertEqual((rows[first.id], rows[second.id], rows[quiet.id]), (1, 2, None))
+        self.assertFalse(Book.objects.get(id=quiet.id).is_bestseller)
+
+    def test_no_sales_clears_previous_bestsellers(self):
+        book = make_book()
+        Book.objects.filter(id=book.id).update(is_bestseller=True, bestseller_rank=1, units_sold=7)
+        self.assertEqual(rebuild_bestsellers(), 0)
+        book = Book.objects.get(id=book.id)
+        self.assertEqual((book.is_bestseller, book.bestseller_rank, book.units_sold), (False, None, 0))
+
+
+@override_settings(BOOKS_ALSO_BOUGHT_METRIC='cosine', BOOKS_ALSO_BOUGHT_MIN_ORDERS=1,
+                   BOOKS_ALSO_BOUGHT_SIZE=2, BOOKS_ALSO_BOUGHT_MAX_BASKET=3)
+class RefreshCoPurchasesTests(TestCase):
+
+    def stored(self):
+        return sorted(
+            (book_id, related_id, orders, round(score, 9))
+            for book_id, related_id, orders, score in
+            BookCoPurchase.objects.values_list('book_id', 'related_id', 'orders', 'score')
+        )
+
+    def test_matches_a_full_rebuild(self):
+        a, b, c, d, e = (make_book(title=title) for title in 'ABCDE')
+        make_order([(a, 1), (b, 1)])
+        make_order([(a, 1), (c, 1)])
+        make_order([(b, 1), (c, 1), (d, 1)])
+        rebuild_co_purchases()
+        # b's and c's order counts change, which reorders a's and d's lists too
+        make_order([(b, 1), (c, 1)])
+        make_order([(c, 1), (e, 1)])
+        refresh_co_purchases([b.id, c.id, e.id])
+        refreshed = self.stored()
+        rebuild_co_purchases()
+        self.assertEqual(refreshed, self.stored())
+
+    def test_skips_baskets_over_the_cap(self):
+        a, b, c, d = (make_book(title=title) for title in 'ABCD')
+        make_order([(a, 1), (b, 1), (c, 1), (d, 1)])
+        refresh_co_purchases([a.id, b.id, c.id, d.id])
+        self.assertEqual(self.stored(), [])
+
+
+@override_settings(BOOKS_RELATED_SIZE=2)
+class RefreshRelatedBooksTests(TestCase):
+
+    def stored(self):
+        return sorted(
+            (book_id, related_id, round(score, 9))
+            for book_id, related_id, score in RelatedBook.objects.values_list('book_id', 'related_id', 'score')
+        )
+
+    def setUp(self):
+        self.books = [make_book(title=title, rating=Decimal(rating)) for title, rating in zip('ABCDE', '54321')]
+        rebuild_related_books()
+
+    def test_purchase_matches_a_full_rebuild(self):
+        a, b, c, d, e = self.books
+        make_order([(d, 1), (e, 1)])
+        refresh_related_lists([d.id, e.id])
+        refreshed = self.stored()
+        rebuild_related_books()
+        self.assertEqual(refreshed, self.stored())
+
+    def test_moved_book_leaves_no_short_lists(self):
+        a = self.books[0]
+        other = Category.objects.create(name='Tarix', slug='tarix')
+        Book.objects.filter(id=a.id).update(category=other)
+        refresh_related_books([a.id])
+        refreshed = self.stored()
+        rebuild_related_books()
+        self.assertEqual(refreshed, self.stored())
+
+    def test_hidden_book_is_replaced(self):
+        a = self.books[0]
+        Book.objects.filter(id=a.id).update(is_active=False)
+        refresh_related_books([a.id])
+        self.assertFalse(RelatedBook.objects.filter(related_id=a.id).exists())
+        refreshed = self.stored()
+        rebuild_related_books()
+        self.assertEqual(refreshed, self.stored())
+
+
+class SearchFilterTests(TestCase):
+
+    @override_settings(BOOKS_SEARCH_MAX_RESULTS=1)
+    def test_filter_is_not_capped_at_the_ranked_results(self):
+        for title in ('Tarix birinchi', 'Tarix ikkinchi', 'Tarix uchinchi', 'Boshqa'):
+            make_book(title=title)
+        response = self.client.get('/api/books/books/', {'search': 'tarix'})
+        self.assertEqual(response.json()['count'], 3)
+
+
+class SparseFieldsTests(TestCase):
+
+    def setUp(self):
+        make_book(title='Kitob')
+
+    def results(self, **params):
+        response = self.client.get('/api/books/books/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_fields_select_and_expand_on_the_list(self):
+        self.assertEqual(self.results(fields='title,author.name'), [{'title': 'Kitob', 'author': {'name': 'Muallif'}}])
+        self.assertEqual(self.results(fields='title,author'), [{'title': 'Kitob', 'author': Author.objects.get().id}])
+        self.assertEqual(self.results(expand='author')[0]['author']['name'], 'Muallif')
+
+    def test_unknown_names_are_rejected(self):
+        for params in ({'fields': 'bogus'}, {'fields': 'author.bogus'}, {'fields': 'title.x'}, {'expand': 'title'}):
+            self.assertEqual(self.client.get('/api/books/books/', params).status_code, 400, params)
+
+
+class ShelfInvalidationTests(TestCase):
+
+    def featured(self):
+        return self.client.get('/api/books/featured/').json()[0]
+
+    def test_discount_and_author_edits_reach_cached_shelves(self):
+        book = make_book(is_featured=True)
+        self.assertEqual(self.featured()['discount_percentage'], 0)
+        book.discount_price = Decimal('7500')
+        book.save()
+        self.assertEqual(self.featured()['discount_percentage'], 25)
+        book.author.name = 'Boshqa muallif'
+        book.author.save()
+        self.assertEqual(self.featured()['author_name'], 'Boshqa muallif')
+
+    def test_cover_urls_match_the_list(self):
+        make_book(is_featured=True)
+        listed = self.client.get('/api/books/books/').json()['results'][0]['cover_image']
+        self.assertTrue(listed.startswith('http://testserver/'))
+        self.assertEqual(self.featured()['cover_image'], listed)
+        home = self.client.get('/api/home/').json()
+        self.assertEqual(home['featured'][0]['cover_image'], listed)
+
+
+class CachedCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        make_book(title='A', language='uz')
+        make_book(title='B', language='ru')
+
+    def count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/books/', params)
+        return response.json()['count'], sum('__count' in query['sql'] for query in queries.captured_queries)
+
+    def test_repeated_filtered_list_reuses_the_count(self):
+        self.assertEqual(self.count_queries({'language': 'uz'}), (1, 1))
+        self.assertEqual(self.count_queries({'language': 'uz'}), (1, 0))
+        # Another filter has its own count
+        self.assertEqual(self.count_queries({'language': 'ru'}), (1, 1))
+
+    def test_catalog_version_bump_invalidates_the_count(self):
+        rows = Book.objects.filter(language='uz')
+        self.assertEqual(CachedCountPaginator(rows, 10, signature='uz').count, 1)
+        Book.objects.filter(language='ru').update(language='uz')
+        self.assertEqual(CachedCountPaginator(rows, 10, signature='uz').count, 1)
+        bump_catalog_version()
+        self.assertEqual(CachedCountPaginator(rows, 10, signature='uz').count, 2)
+
+
+@override_settings(BOOKS_CATALOG_REFRESH_INTERVAL=0)
+class CatalogSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.first, self.second, self.third = (make_book(title=title) for title in 'ABC')
+        self.snapshot = CatalogSnapshot()
+        self.snapshot.warm()
+
+    def test_merges_logged_changes_without_a_reload(self):
+        self.assertEqual(self.snapshot.page()[1], 3)
+        # Another worker's writes: neither sends a signal to this process
+        Book.objects.filter(id=self.first.id).delete()
+        Book.objects.filter(id=self.second.id).update(is_active=False)
+        log_book_changes([self.first.id, self.second.id])
+        added = make_book(title='D')
+        with mock.patch.object(self.snapshot, 'warm') as warm:
+            self.assertEqual(self.snapshot.page(), ([added.id, self.third.id], 2))
+        warm.assert_not_called()
+
+    def test_first_load_and_full_reload_run_off_the_request(self):
+        snapshot = CatalogSnapshot()
+        with mock.patch.object(snapshot._reload, 'start') as start:
+            self.assertIsNone(snapshot.page())
+        start.assert_called_once_with()
+        with mock.patch('books.catalog.ChangeFeed.read', return_value=None), \
+                mock.patch.object(self.snapshot._reload, 'start') as start:
+            self.assertEqual(self.snapshot.page()[1], 3)
+        start.assert_called_once_with()
+
+
+class ChangeFeedTests(TestCase):
+
+    def log(self, change_id, book_id):
+        BookChange.objects.create(id=change_id, book_id=book_id)
+
+    def test_late_commits_are_read_once(self):
+        feed = ChangeFeed()
+        feed.start()
+        self.log(1, 10)
+        self.log(3, 30)
+        self.assertEqual(feed.read(), {10, 30})
+        # Id 2 committed after 3 was read
+        self.log(2, 20)
+        self.assertEqual(feed.read(), {20})
+        self.assertEqual(feed.read(), set())
+
+    def test_a_gap_is_passed_once_the_row_after_it_settles(self):
+        feed = ChangeFeed()
+        feed.start()
+        self.log(2, 20)
+        self.assertEqual(feed.read(), {20})
+        self.assertEqual(feed._position, 0)
+        BookChange.objects.filter(id=2).update(created_at=timezone.now() - timedelta(minutes=5))
+        feed.read()
+        self.assertEqual(feed._position, 2)
+
+    def test_a_reader_idle_past_the_retention_needs_a_full_load(self):
+        feed = ChangeFeed()
+        self.assertIsNone(feed.read())
+        feed.start()
+        feed._read_at -= timedelta(hours=settings.BOOKS_CHANGE_LOG_RETENTION_HOURS)
+        self.assertIsNone(feed.read())
+
+
+@override_settings(BOOKS_SEARCH_REFRESH_INTERVAL=0)
+class MemorySearchTests(TestCase):
+
+    def setUp(self):
+        self.kept, self.hidden = make_book(title='Tarix kitobi'), make_book(title='Tarix darsligi')
+        self.backend = MemorySearchBackend()
+        self.backend.warm()
+
+    def test_applies_logged_bulk_changes_without_a_reload(self):
+        self.assertEqual(sorted(self.backend.search('tarix', 10)), sorted([self.kept.id, self.hidden.id]))
+        # Another worker's bulk update: no signal reaches this index, only the log
+        Book.objects.filter(id=self.hidden.id).update(is_active=False)
+        log_book_changes([self.hidden.id])
+        with mock.patch.object(self.backend, 'warm') as warm:
+            self.assertEqual(self.backend.search('tarix', 10), [self.kept.id])
+        warm.assert_not_called()
+
+    def test_applies_other_workers_edits_and_deletes(self):
+        other = MemorySearchBackend()
+        other.warm()
+        self.kept.title = 'Yangi roman'
+        self.kept.save()
+        self.hidden.delete()
+        self.assertEqual(other.search('tarix', 10), [])
+        self.assertEqual(other.search('roman', 10), [self.kept.id])
+
+    def test_full_reload_runs_off_the_request(self):
+        with mock.patch('books.search.memory.ChangeFeed.read', return_value=None), \
+                mock.patch.object(self.backend._reload, 'start') as start:
+            self.assertEqual(len(self.backend.search('tarix', 10)), 2)
+        start.assert_called_once_with()
+
+
+@override_settings(BOOKS_SEARCH_REFRESH_INTERVAL=0, BOOKS_SPELLING_MAX_DISTANCE=2)
+class SpellingIndexTests(TestCase):
+
+    def setUp(self):
+        self.book = make_book(title='Mehrobdan chayon')
+        self.index = SpellingIndex()
+        self.index.warm()
+
+    def test_forgets_terms_of_books_hidden_by_other_workers(self):
+        self.assertEqual(self.index.suggest('mehrobdn'), 'mehrobdan')
+        Book.objects.filter(id=self.book.id).update(is_active=False)
+        log_book_changes([self.book.id])
+        with mock.patch.object(self.index, 'warm') as warm:
+            self.assertIsNone(self.index.suggest('mehrobdn'))
+        warm.assert_not_called()
+        self.assertNotIn('mehrobdan', self.index._terms)
+
+    def test_counts_follow_saves_in_this_process(self):
+        other = make_book(title='Mehrobdan chayon 2')
+        self.index.index(other)
+        self.assertEqual(self.index._terms['mehrobdan'], 2)
+        self.index.remove(self.book.id)
+        self.index.remove(other.id)
+        self.assertNotIn('mehrobdan', self.index._terms)
+        self.assertFalse(any('mehrobdan' in terms for terms in self.index._deletes.values()))
+
+    def test_builds_off_the_request(self):
+        index = SpellingIndex()
+        with mock.patch.object(index._reload, 'start') as start:
+            self.assertIsNone(index.suggest('mehrobdn'))
+        start.assert_called_once_with()
+
+
+@override_settings(BOOKS_AUTOCOMPLETE_REFRESH_INTERVAL=0)
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.books = [make_book(title=f'Bahor {number:02}') for number in range(12)]
+        self.popular = make_book(title='Bahorgi sayr', view_count=100)
+        self.index = AutocompleteIndex()
+        self.index.warm()
+
+    def test_ranks_every_match_by_popularity(self):
+        # Twelve closer completions sort ahead of the most viewed one
+        self.assertEqual([row['id'] for row in self.index.suggest('bahor', 1)], [self.popular.id])
+
+    def test_applies_logged_changes_and_new_counts_without_a_reload(self):
+        self.assertEqual(self.index.suggest('bahorgi'), [
+            {'type': 'book', 'id': self.popular.id, 'label': 'Bahorgi sayr', 'slug': self.popular.slug}
+        ])
+        Book.objects.filter(id=self.popular.id).update(is_active=False)
+        log_book_changes([self.popular.id])
+        added = make_book(title='Yangi bahor')
+        with mock.patch.object(self.index, 'warm') as warm:
+            self.assertEqual(self.index.suggest('bahorgi'), [])
+            self.assertIn(added.id, [row['id'] for row in self.index.suggest('yangi')])
+        warm.assert_not_called()
+        author = self.index._entries[('author', added.author_id)]
+        self.assertEqual(author['popularity'], Author.objects.get(id=added.author_id).active_book_count)
+        self.assertGreater(author['popularity'], 13)
+
+    def test_loads_off_the_request(self):
+        index = AutocompleteIndex()
+        with mock.patch.object(index._reload, 'start') as start:
+            self.assertEqual(index.suggest('bahor'), [])
+        start.assert_called_once_with()
+
+
+class NormalizeTests(SimpleTestCase):
+
+    def test_folds_every_apostrophe_variant(self):
+        for title in ("O'tgan kunlar", 'O‘tgan kunlar', 'Oʻtgan kunlar', 'O`tgan kunlar', 'Oʼtgan kunlar'):
+            with self.subTest(title=title):
+                self.assertEqual(normalize_text(title), 'otgan kunlar')
+
+    def test_folds_cyrillic_onto_uzbek_latin(self):
+        self.assertEqual(normalize_text('Ўтган кунлар'), 'otgan kunlar')
+        self.assertEqual(normalize_text('Ғарб ҳаёти'), normalize_text('G‘arb hayoti'))
+        self.assertEqual(normalize_text('Қўшиқ'), 'qoshiq')
+        self.assertEqual(normalize_text('Преступление и наказание'), 'prestuplenie i nakazanie')
+
+    def test_strips_diacritics_and_punctuation(self):
+        self.assertEqual(normalize_terms('Café — «Kitob»!'), ['cafe', 'kitob'])
+        self.assertEqual(normalize_text(''), '')
+
+
+class SearchFoldingTests(TestCase):
+
+    def test_cyrillic_query_finds_a_latin_title(self):
+        book = make_book(title='O‘tgan kunlar')
+        response = self.client.get('/api/books/search/', {'q': 'Ўтган'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [book.id])
+
+
+class FacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        history = Category.objects.create(name='Tarix', slug='tarix')
+        self.uz = [make_book(title='A', language='uz', price=Decimal('20000')),
+                   make_book(title='B', language='uz', price=Decimal('60000'))]
+        self.ru = make_book(title='C', language='ru', price=Decimal('40000'), category=history)
+
+    def facets(self, params):
+        response = self.client.get('/api/books/books/', {'facets': 'all', **params})
+        return response.json()
+
+    def test_counts_every_family(self):
+        facets = self.facets({})['facets']
+        self.assertEqual(facets['language'], [{'value': 'uz', 'count': 2}, {'value': 'ru', 'count': 1}])
+        self.assertEqual([row['count'] for row in facets['category']], [2, 1])
+        self.assertEqual([row['count'] for row in facets['price']], [1, 1, 1, 0])
+
+    def test_a_family_is_counted_without_its_own_filter(self):
+        data = self.facets({'language': 'uz'})
+        self.assertEqual(data['count'], 2)
+        # The other languages stay visible, while every other family narrows to the uz books
+        self.assertEqual(data['facets']['language'], [{'value': 'uz', 'count': 2}, {'value': 'ru', 'count': 1}])
+        self.assertEqual([row['slug'] for row in data['facets']['category']], ['adabiyot'])
+        self.assertEqual([row['count'] for row in data['facets']['price']], [1, 0, 1, 0])
+
+    def test_price_range_is_counted_without_the_range(self):
+        data = self.facets({'min_price': 30000, 'max_price': 50000})
+        self.assertEqual(data['count'], 1)
+        self.assertEqual([row['count'] for row in data['facets']['price']], [1, 1, 1, 0])
+        self.assertEqual(data['facets']['language'], [{'value': 'ru', 'count': 1}])
+
+
+class ListProjectionTests(TestCase):
+
+    def test_rows_serialize_like_the_model_rows(self):
+        make_book(title='Chegirmali', price=Decimal('30000'), discount_price=Decimal('19850'), stock=0)
+        make_book(title='Oddiy', price=Decimal('12500.50'), stock=3, is_featured=True)
+        make_book(title='Muqovasiz', cover_image='', rating=Decimal('4.5'), is_bestseller=True)
+        queryset = Book.objects.filter(is_active=True).order_by('title')
+        projected = [dataclasses.asdict(row) for row in list_rows(project_books(queryset))]
+        self.assertEqual(projected, model_rows(queryset))
+        self.assertEqual(dumps(projected), dumps(model_rows(queryset)))
+
+
+class CategoryTreeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.prose = Category.objects.create(name='Nasr', slug='nasr')
+        self.novels = Category.objects.create(name='Romanlar', slug='romanlar', parent=self.prose)
+        self.history = Category.objects.create(name='Tarixiy', slug='tarixiy', parent=self.novels)
+        self.poetry = Category.objects.create(name="She'riyat", slug='sheriyat')
+
+    def paths(self):
+        return {row['slug']: (row['path'], row['depth']) for row in Category.objects.values('slug', 'path', 'depth')}
+
+    def tree(self):
+        def shape(nodes):
+            return [(node['slug'], node['depth'], shape(node['children'])) for node in nodes]
+        return shape(self.client.get('/api/books/categories/tree/').json())
+
+    def test_moving_a_category_carries_its_subtree(self):
+        prose, novels, poetry = self.prose.id, self.novels.id, self.poetry.id
+        self.assertEqual(self.paths()['tarixiy'], (f'{prose}/{novels}/{self.history.id}/', 2))
+        self.novels.parent = self.poetry
+        self.novels.save()
+        paths = self.paths()
+        self.assertEqual(paths['romanlar'], (f'{poetry}/{novels}/', 1))
+        self.assertEqual(paths['tarixiy'], (f'{poetry}/{novels}/{self.history.id}/', 2))
+        self.assertEqual(subtree_ids(prose), [prose])
+        self.assertCountEqual(subtree_ids(poetry), [poetry, novels, self.history.id])
+        self.novels.parent = None
+        self.novels.save()
+        self.assertEqual(self.paths()['tarixiy'], (f'{novels}/{self.history.id}/', 1))
+
+    def test_cannot_move_under_its_own_subtree(self):
+        self.prose.refresh_from_db()
+        self.prose.parent = self.history
+        with self.assertRaises(ValidationError):
+            self.prose.clean()
+
+    def test_tree_endpoint_follows_moves_and_hides_inactive_branches(self):
+        self.assertEqual(self.tree(), [
+            ('nasr', 0, [('romanlar', 1, [('tarixiy', 2, [])])]),
+            ('sheriyat', 0, []),
+        ])
+        self.novels.parent = self.poetry
+        self.novels.save()
+        self.assertEqual(self.tree(), [
+            ('nasr', 0, []),
+            ('sheriyat', 0, [('romanlar', 1, [('tarixiy', 2, [])])]),
+        ])
+        self.novels.is_active = False
+        self.novels.save()
+        self.assertEqual(self.tree(), [('nasr', 0, []), ('sheriyat', 0, [])])
+
+
+class ActiveBookCountTests(TestCase):
+
+    def setUp(self):
+        self.book = make_book(title='Sanoq')
+        self.history = Category.objects.create(name='Tarix', slug='tarix')
+
+    def counts(self):
+        """(literature, history, author, publisher) active book counts"""
+        return (
+            Category.objects.get(slug='adabiyot').active_book_count,
+            Category.objects.get(slug='tarix').active_book_count,
+            Author.objects.get(slug='muallif').active_book_count,
+            Publisher.objects.get(slug='nashriyot').active_book_count,
+        )
+
+    def test_create_deactivate_and_reactivate(self):
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        self.book.is_active = False
+        self.book.save()
+        self.assertEqual(self.counts(), (0, 0, 0, 0))
+        # A second save of the same instance must not count the change again
+        self.book.save()
+        self.assertEqual(self.counts(), (0, 0, 0, 0))
+        self.book.is_active = True
+        self.book.save(update_fields=['is_active'])
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+
+    def test_category_move_and_delete(self):
+        self.book.category = self.history
+        self.book.save()
+        self.assertEqual(self.counts(), (0, 1, 1, 1))
+        # A freshly loaded copy moves the count back from the stored state
+        book = Book.objects.get(id=self.book.id)
+        book.category = Category.objects.get(slug='adabiyot')
+        book.save()
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        book.delete()
+        self.assertEqual(self.counts(), (0, 0, 0, 0))
+
+    def test_inactive_books_count_nowhere(self):
+        make_book(title='Yashirin', is_active=False)
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        Book.objects.filter(slug='yashirin').delete()
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+
+    def test_reconcile_corrects_bulk_updates(self):
+        Book.objects.filter(id=self.book.id).update(category=self.history)
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        self.assertEqual(reconcile_book_counts(), {'Categories': 2, 'Authors': 0, 'Publishers': 0})
+        self.assertEqual(self.counts(), (0, 1, 1, 1))
+
+
+class BookBatchTests(TestCase):
+
+    def test_matches_the_list_serializer(self):
+        first, second = make_book(title='A'), make_book(title='B')
+        response = self.client.get('/api/books/books/batch/', {'ids': f'{second.id},999,{first.id}'})
+        self.assertEqual(response.status_code, 200)
+        listed = {book['id']: book for book in self.client.get('/api/books/books/').json()['results']}
+        self.assertEqual(response.json()['books'], [listed[second.id], listed[first.id]])
+        self.assertEqual(response.json()['missing'], [999])
+
+    def test_sparse_fields(self):
+        book = make_book(title='A')
+        response = self.client.get('/api/books/books/batch/', {'ids': book.id, 'fields': 'title,author.name'})
+        self.assertEqual(response.json()['books'], [{'title': 'A', 'author': {'name': 'Muallif'}}])
+
+
+class CursorPaginationTests(TestCase):
+
+    def walk(self, **params):
+        titles, cursor = [], None
+        while True:
+            query = {'pagination': 'cursor', 'page_size': 2, **params, **({'cursor': cursor} if cursor else {})}
+            body = self.client.get('/api/books/books/', query).json()
+            titles += [book['title'] for book in body['results']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                return titles
+
+    def test_every_ordering_term_is_kept_across_pages(self):
+        # Ties on rating are broken by title, not by id
+        for title, rating in (('D', '4'), ('A', '4'), ('C', '4'), ('B', '5'), ('E', '3')):
+            make_book(title=title, rating=Decimal(rating))
+        self.assertEqual(self.walk(ordering='-rating,title'), ['B', 'A', 'C', 'D', 'E'])
+        self.assertEqual(self.walk(ordering='rating,-title'), ['E', 'D', 'C', 'A', 'B'])
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        for title in 'ABC':
+            make_book(title=title)
+        cursor = self.client.get(
+            '/api/books/books/', {'pagination': 'cursor', 'page_size': 1, 'ordering': '-rating,title'}
+        ).json()['next_cursor']
+        response = self.client.get('/api/books/books/', {'ordering': '-rating', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class CompressionTests(TestCase):
+
+    def get(self, **headers):
+        return self.client.get('/api/books/books/', headers=headers)
+
+    def test_varies_on_accept_encoding_whether_compressed_or_not(self):
+        make_book()
+        with override_settings(BOOKS_COMPRESSION_MIN_SIZE=0):
+            compressed = self.get(accept_encoding='gzip')
+            self.assertEqual(compressed['Content-Encoding'], 'gzip')
+            self.assertTrue(has_vary_header(compressed, 'Accept-Encoding'))
+            identity = self.get()
+            self.assertFalse(identity.has_header('Content-Encoding'))
+            self.assertTrue(has_vary_header(identity, 'Accept-Encoding'))
+        with override_settings(BOOKS_COMPRESSION_MIN_SIZE=10 ** 6):
+            small = self.get(accept_encoding='gzip')
+            self.assertFalse(small.has_header('Content-Encoding'))
+            self.assertTrue(has_vary_header(small, 'Accept-Encoding'))
+
+
+@override_settings(BOOKS_RECOMMENDATIONS_SIZE=2, BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL=0)
+class RecommendationTests(TestCase):
+
+    def test_reads_are_read_only_and_activity_refreshes_in_the_background(self):
+        wished, similar, other = make_book(title='A'), make_book(title='B'), make_book(title='C')
+        Book.objects.filter(id=other.id).update(category=Category.objects.create(name='Tarix', slug='tarix'))
+        user = make_order([]).user
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.create(user=user, book=wished)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotIn(wished.id, recommended_book_ids(user.id))
+        self.assertFalse(any(query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) for query in queries))
+        self.assertFalse(UserRecommendation.objects.exists())
+
+        recommendation_refresh.flush()
+        self.assertEqual(recommended_book_ids(user.id)[0], similar.id)
+
+
+class HomeBundleTests(TestCase):
+
+    def setUp(self):
+        self.featured = make_book(title='Tanlangan', is_featured=True)
+        self.bestseller = make_book(title='Xit', is_bestseller=True, bestseller_rank=1)
+
+    def test_carries_every_shelf_and_the_category_menu(self):
+        body = self.client.get('/api/home/').json()
+        self.assertEqual(set(body), {'featured', 'bestsellers', 'new_arrivals', 'categories'})
+        self.assertEqual([book['id'] for book in body['featured']], [self.featured.id])
+        self.assertEqual([book['id'] for book in body['bestsellers']], [self.bestseller.id])
+        self.assertEqual(body['featured'][0]['average_rating'], float(self.featured.rating))
+        self.assertEqual([node['slug'] for node in body['categories']], ['adabiyot'])
+
+    def test_warm_reads_run_no_queries(self):
+        self.client.get('/api/home/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/home/').status_code, 200)
+
+    def test_not_modified_until_a_shelf_changes(self):
+        etag = self.client.get('/api/home/')['ETag']
+        self.assertEqual(self.client.get('/api/home/', headers={'if_none_match': etag}).status_code, 304)
+        self.featured.title = 'Yangi nom'
+        self.featured.save()
+        response = self.client.get('/api/home/', headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['featured'][0]['title'], 'Yangi nom')
+
+
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_are_read_only_and_activity_reranks_in_the_background(self):
+        quiet, busy = make_book(title='A'), make_book(title='B')
+        record_activity('purchases', [busy.id])
+        record_activity('views', [quiet.id])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(trending_book_ids(), [])
+        self.assertEqual(len(queries), 1)
+
+        trending_refresh.flush()
+        self.assertEqual(trending_book_ids(), [busy.id, quiet.id])
+        self.assertEqual(trending_book_ids(Category.objects.get().id, limit=1), [busy.id])
+
+    def test_activity_before_the_interval_is_kept_for_later(self):
+        book = make_book()
+        refresh_trending()
+        record_activity('views', [book.id])
+        trending_refresh.flush()
+        self.assertFalse(TrendingBook.objects.exists())
+        cache.clear()
+        trending_refresh.flush()
+        self.assertEqual(trending_book_ids(), [book.id])
+
+
+@mock.patch.object(ViewCounter, '_start')
+class ViewCounterTests(TestCase):
+
+    def views(self, book):
+        return Book.objects.values_list('view_count', flat=True).get(id=book.id)
+
+    @override_settings(BOOKS_VIEW_FLUSH_SIZE=3)
+    def test_record_never_writes_in_the_request(self, start):
+        book = make_book()
+        counter = ViewCounter()
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                counter.record(book.id)
+        self.assertTrue(counter._wake.is_set())
+        self.assertEqual((self.views(book), counter.pending(book.id)), (0, 5))
+
+    def test_flush_writes_one_update_per_increment(self, start):
+        first, second, third = make_book(title='A'), make_book(title='B'), make_book(title='C')
+        counter = ViewCounter()
+        for book, views in ((first, 3), (second, 3), (third, 1)):
+            counter.record(book.id, views)
+        self.assertEqual(counter.flush(), 7)
+        self.assertEqual([self.views(book) for book in (first, second, third)], [3, 3, 1])
+        self.assertEqual(counter.pending(first.id), 0)
+        self.assertEqual(counter.flush(), 0)
+
+    def test_failed_flush_keeps_the_counts(self, start):
+        book = make_book()
+        counter = ViewCounter()
+        counter.record(book.id, 2)
+        with mock.patch('books.viewcounts.record_activity', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                counter.flush()
+        self.assertEqual((self.views(book), counter.pending(book.id)), (0, 2))
+        counter.flush()
+        self.assertEqual(self.views(book), 2)
+
+
+class BookDetailValidatorTests(TestCase):
+
+    def setUp(self):
+        self.book = make_book(title='Kitob')
+        self.url = f'/api/books/books/{self.book.slug}/'
+        self.etag = self.client.get(self.url)['ETag']
+
+    def revalidate(self):
+        return self.client.get(self.url, headers={'if_none_match': self.etag})
+
+    def test_unchanged_book_is_not_modified(self):
+        response = self.revalidate()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+
+    def test_book_edit_invalidates(self):
+        self.book.title = 'Yangi nom'
+        self.book.save()
+        self.assertEqual(self.revalidate().json()['title'], 'Yangi nom')
+
+    def test_category_count_change_invalidates(self):
+        make_book(title='Boshqa')
+        self.assertEqual(self.revalidate().json()['category']['book_count'], 2)
+
+    def test_new_subcategory_invalidates(self):
+        Category.objects.create(name='Nasr', slug='nasr', parent=self.book.category)
+        children = self.revalidate().json()['category']['children']
+        self.assertEqual([child['slug'] for child in children], ['nasr'])
@@ -0,0 +1,150 @@
+"""
+Trending books for Books app
+Time-bucketed view, cart and purchase counters ranked by an exponentially decayed score
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Book, BookActivity, Category, TrendingBook
+from .refresh import RefreshQueue
+
+
+# What one event of each kind adds to a book's score before decay
+EVENT_WEIGHTS = {'views': 1.0, 'cart_adds': 5.0, 'purchases': 10.0}
+
+# Held while one process recomputes, and until the next refresh is due
+REFRESH_KEY = 'books:trending:refreshed'
+
+
+def bucket_start(moment=None):
+    """Start of the BOOKS_TRENDING_BUCKET_SECONDS bucket holding `moment`"""
+    moment = moment or timezone.now()
+    seconds = int(moment.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % settings.BOOKS_TRENDING_BUCKET_SECONDS, tz=dt_timezone.utc)
+
+
+def record_activity(kind, book_ids, count=1):
+    """
+    Add `count` events of `kind` to each book's current bucket: one
+    insert of the missing rows, then one UPDATE for all of them. Ids of
+    books deleted since the event are skipped.
+    """
+    book_ids = list(Book.objects.filter(id__in=book_ids).values_list('id', flat=True))
+    if not book_ids:
+        return
+    bucket = bucket_start()
+    BookActivity.objects.bulk_create(
+        [BookActivity(book_id=book_id, bucket=bucket) for book_id in book_ids],
+        ignore_conflicts=True
+    )
+    BookActivity.objects.filter(book_id__in=book_ids, bucket=bucket).update(**{kind: F(kind) + count})
+    trending_refresh.add(book_ids)
+
+
+def decay(age):
+    """Weight left after `age` at a half-life of BOOKS_TRENDING_HALF_LIFE_HOURS"""
+    return 0.5 ** (age.total_seconds() / 3600 / settings.BOOKS_TRENDING_HALF_LIFE_HOURS)
+
+
+def trending_scores(now=None):
+    """{book_id: decayed score} over the buckets inside BOOKS_TRENDING_WINDOW_HOURS"""
+    now = now or timezone.now()
+    since = now - timedelta(hours=settings.BOOKS_TRENDING_WINDOW_HOURS)
+    weights = {}
+    scores = defaultdict(float)
+    rows = (
+        BookActivity.objects.filter(bucket__gte=since, book__is_active=True)
+        .values_list('book_id', 'bucket', *EVENT_WEIGHTS)
+        .iterator(chunk_size=5000)
+    )
+    for book_id, bucket, *counts in rows:
+        if bucket not in weights:
+            weights[bucket] = decay(now - bucket)
+        scores[book_id] += weights[bucket] * sum(
+            weight * count for weight, count in zip(EVENT_WEIGHTS.values(), counts)
+        )
+    return scores
+
+
+def category_ancestors():
+    """Every category id mapped to itself and its ancestors, from the materialised paths"""
+    return {
+        category_id: [int(ancestor_id) for ancestor_id in path.split('/')[:-1]]
+        for category_id, path in Category.objects.values_list('id', 'path')
+    }
+
+
+def rebuild_trending(now=None):
+    """
+    Rank the storewide and per-category trending lists from the current
+    scores and drop buckets older than the window. Returns the number of
+    rows written.
+    """
+    now = now or timezone.now()
+    scores = trending_scores(now)
+    ancestors = category_ancestors()
+    size = settings.BOOKS_TRENDING_SIZE
+
+    by_category = defaultdict(list)
+    categories = Book.objects.filter(id__in=list(scores)).values_list('id', 'category_id')
+    for book_id, category_id in categories.iterator(chunk_size=5000):
+        item = (scores[book_id], -book_id)
+        by_category[None].append(item)
+        for ancestor_id in ancestors.get(category_id, [category_id]):
+            by_category[ancestor_id].append(item)
+
+    rows = [
+        TrendingBook(book_id=-negative_id, category_id=category_id, rank=rank, score=score)
+        for category_id, items in by_category.items()
+        for rank, (score, negative_id) in enumerate(heapq.nlargest(size, items), start=1)
+        if score > 0
+    ]
+    with transaction.atomic():
+        TrendingBook.objects.all().delete()
+        TrendingBook.objects.bulk_create(rows, batch_size=5000)
+    BookActivity.objects.filter(bucket__lt=now - timedelta(hours=settings.BOOKS_TRENDING_WINDOW_HOURS)).delete()
+    return len(rows)
+
+
+def refresh_trending():
+    """
+    Rebuild the lists if BOOKS_TRENDING_REFRESH_INTERVAL has passed since
+    the last rebuild in any process; cache.add lets only one of them do it.
+    Returns whether this call rebuilt them.
+    """
+    if not cache.add(REFRESH_KEY, True, settings.BOOKS_TRENDING_REFRESH_INTERVAL):
+        return False
+    try:
+        rebuild_trending()
+    except Exception:
+        cache.delete(REFRESH_KEY)
+        raise
+    return True
+
+
+def _refresh_queued(book_ids):
+    # Not due yet: keep the books for a later interval so their activity is ranked
+    if not refresh_trending():
+        trending_refresh.add(book_ids)
+
+
+# Books with new activity; the background thread re-ranks once the interval is up
+trending_refresh = RefreshQueue('trending', _refresh_queued)
+
+
+def trending_book_ids(category_id=None, limit=None):
+    """
+    Ids of a precomputed trending list, best first; the storewide list
+    without `category_id`. Read-only: the lists are ranked by the
+    rebuild_trending command and the background refresh.
+    """
+    rows = TrendingBook.objects.filter(category_id=category_id).order_by('rank')
+    return list(rows.values_list('book_id', flat=True)[:limit])
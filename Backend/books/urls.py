@@ -15,4 +15,5 @@ urlpatterns = [
     path('featured/', views.featured_books, name='featured-books'),
     path('bestsellers/', views.bestseller_books, name='bestseller-books'),
     path('search/', views.search_books, name='search-books'),
+    path('autocomplete/', views.autocomplete, name='book-autocomplete'),
 ]
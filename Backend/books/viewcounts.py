@@ -0,0 +1,106 @@
+"""
+View counting for Books app
+Buffered book views written as batched F('view_count') + n updates
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Book
+from .trending import record_activity
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Per-process tally of book views. `record` only bumps a Counter and
+    never writes: a background thread writes the counts every
+    BOOKS_VIEW_FLUSH_INTERVAL seconds, or as soon as `record` wakes it
+    with BOOKS_VIEW_FLUSH_SIZE views pending, as one UPDATE per distinct
+    increment instead of a row write per view, along with the same
+    increment to the books' trending buckets. An atexit hook writes what
+    is left on a graceful shutdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._size = 0
+        self._flushed_at = time.monotonic()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def record(self, book_id, views=1):
+        with self._lock:
+            self._pending[book_id] += views
+            self._size += views
+            if self._thread is None:
+                self._start()
+            if self._size >= settings.BOOKS_VIEW_FLUSH_SIZE:
+                # The write happens on the background thread, not in this request
+                self._wake.set()
+
+    def pending(self, book_id):
+        """Views of a book recorded here but not yet written"""
+        return self._pending.get(book_id, 0)
+
+    def flush(self):
+        """Write every pending count; returns the number of views written"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._size = 0
+            self._flushed_at = time.monotonic()
+        by_views = defaultdict(list)
+        for book_id, views in pending.items():
+            by_views[views].append(book_id)
+
+        written = 0
+        try:
+            while by_views:
+                views, book_ids = next(iter(by_views.items()))
+                with transaction.atomic():
+                    Book.objects.filter(id__in=book_ids).update(view_count=F('view_count') + views)
+                    record_activity('views', book_ids, views)
+                del by_views[views]
+                written += views * len(book_ids)
+        finally:
+            if by_views:
+                # Put back what was not written so the next flush retries it
+                with self._lock:
+                    for views, book_ids in by_views.items():
+                        for book_id in book_ids:
+                            self._pending[book_id] += views
+                            self._size += views
+        return written
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='book-view-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            woken = self._wake.wait(settings.BOOKS_VIEW_FLUSH_INTERVAL)
+            self._wake.clear()
+            if not self._size or (
+                not woken and time.monotonic() - self._flushed_at < settings.BOOKS_VIEW_FLUSH_INTERVAL
+            ):
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing book view counts failed; retrying on the next interval')
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
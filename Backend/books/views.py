@@ -1,14 +1,31 @@
 """
 Views for Books app - API endpoints
 """
+import functools
+
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from django.conf import settings
 from django.db.models import Q, Avg, Count
 from django_filters.rest_framework import DjangoFilterBackend
 
+from .catalog import hydrate
+from .categories import category_tree
+from .conditional import book_validators, conditional, list_validators, not_modified
+from .facets import FACET_PARAMS, facet_counts, parse_facets
+from .filters import BookOrderingFilter
+from .home import home_headers, home_payload
 from .models import Book, Category, Author, Publisher, Cart, CartItem, Wishlist
+from .pagination import BookPagination
+from .projection import parse_book_ids
+from .search import search_book_ids
+from .search.autocomplete import autocomplete_index
+from .search.filters import BookSearchFilter
+from .search.spelling import spelling_index
+from .shelves import shelf_payload
+from .sparse import SparseFieldsViewSetMixin
 from .serializers import (
     BookListSerializer, BookDetailSerializer, CategorySerializer,
     AuthorSerializer, PublisherSerializer, CartSerializer, 
@@ -16,7 +33,20 @@ from .serializers import (
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def serialize_book_list(books, request=None):
+    """Plain list of BookListSerializer rows, safe to keep in the cache"""
+    return [dict(row) for row in BookListSerializer(books, many=True, context={'request': request}).data]
+
+
+def shelf_serializer(request):
+    """
+    (serialize, variant) for shelf_payload: rows carry absolute cover URLs
+    like the list and detail responses, so they are cached per base URL
+    """
+    return functools.partial(serialize_book_list, request=request), f'drf:{request.build_absolute_uri("/")}'
+
+
+class CategoryViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for Category model"""
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
@@ -25,9 +55,14 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """The whole active category tree, nested, from the cache"""
+        return Response(category_tree())
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for Author model"""
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
@@ -49,16 +84,17 @@ class PublisherViewSet(viewsets.ModelViewSet):
     ordering = ['name']
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for Book model"""
     queryset = Book.objects.filter(is_active=True).select_related(
         'category', 'author', 'publisher'
     )
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = BookPagination
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, BookOrderingFilter]
     filterset_fields = ['category', 'author', 'publisher', 'language', 'is_featured', 'is_bestseller']
     search_fields = ['title', 'description', 'author__name', 'publisher__name']
-    ordering_fields = ['title', 'price', 'created_at', 'average_rating', 'rating_count']
+    ordering_fields = ['title', 'price', 'created_at', 'rating']
     ordering = ['-created_at']
     lookup_field = 'slug'
     
@@ -70,18 +106,24 @@ class BookViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filter by price range
+        # Filter by the price the buyer pays
         min_price = self.request.query_params.get('min_price')
         max_price = self.request.query_params.get('max_price')
         if min_price:
-            queryset = queryset.filter(price__gte=min_price)
+            queryset = queryset.filter(effective_price__gte=min_price)
         if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+            queryset = queryset.filter(effective_price__lte=max_price)
+        
+        # Filter by a category and everything under it
+        category_tree_id = self.request.query_params.get('category_tree')
+        if category_tree_id:
+            path = Category.objects.filter(id=category_tree_id).values_list('path', flat=True).first()
+            queryset = queryset.filter(category__path__startswith=path) if path else queryset.none()
         
         # Filter by rating
         min_rating = self.request.query_params.get('min_rating')
         if min_rating:
-            queryset = queryset.filter(average_rating__gte=min_rating)
+            queryset = queryset.filter(rating__gte=min_rating)
         
         # Filter by stock availability
         in_stock = self.request.query_params.get('in_stock')
@@ -90,26 +132,73 @@ class BookViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @conditional(lambda view, request, *args, **kwargs: list_validators(view.basename, request.query_params))
+    def list(self, request, *args, **kwargs):
+        """List books; `?facets=category,author,language,price` (or `all`) adds facet counts"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        
+        families = parse_facets(request.query_params.get('facets'))
+        if families:
+            signature = self.paginator.get_filter_signature(request, self)
+            response.data['facets'] = facet_counts(
+                queryset, signature, families, without=functools.partial(self.facet_queryset, queryset)
+            )
+        return response
+    
+    def facet_queryset(self, queryset, family):
+        """The listing filtered as if the request lacked `family`'s own parameters"""
+        params = self.request.query_params
+        own = [name for name in FACET_PARAMS[family] if name in params]
+        if not own:
+            return queryset
+        others = params.copy()
+        for name in own:
+            del others[name]
+        # Filter backends and get_queryset read the parameters while building the queryset
+        request = self.request._request
+        request.GET, params = others, request.GET
+        try:
+            return self.filter_queryset(self.get_queryset())
+        finally:
+            request.GET = params
+    
+    @conditional(lambda view, request, *args, **kwargs: book_validators(slug=kwargs[view.lookup_field]))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """`?ids=1,2,3`: several books as list items in the order asked, plus the ids not found"""
+        try:
+            book_ids = parse_book_ids(request.query_params.getlist('ids'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        # Same serializer as the list, so `fields` and `expand` work here too
+        books = hydrate(self.get_queryset(), book_ids)
+        found = {book.pk for book in books}
+        serializer = self.get_serializer(books, many=True)
+        return Response({
+            'books': serializer.data,
+            'missing': [book_id for book_id in book_ids if book_id not in found],
+        })
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured books"""
-        books = self.get_queryset().filter(is_featured=True)[:10]
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        return Response(shelf_payload('featured', *shelf_serializer(request), limit=10))
     
     @action(detail=False, methods=['get'])
     def bestsellers(self, request):
         """Get bestseller books"""
-        books = self.get_queryset().filter(is_bestseller=True).order_by('-rating_count')[:10]
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        return Response(shelf_payload('bestsellers', *shelf_serializer(request), limit=10))
     
     @action(detail=False, methods=['get'])
     def new_arrivals(self, request):
         """Get new arrival books"""
-        books = self.get_queryset().order_by('-created_at')[:10]
-        serializer = self.get_serializer(books, many=True)
-        return Response(serializer.data)
+        return Response(shelf_payload('new_arrivals', *shelf_serializer(request), limit=10))
 
 
 class CartViewSet(viewsets.ModelViewSet):
@@ -266,23 +355,27 @@ class WishlistViewSet(viewsets.ModelViewSet):
             )
 
 
+@api_view(['GET'])
+def home(request):
+    """Featured, bestseller and new-arrival shelves plus the category menu for first paint"""
+    serialize, variant = shelf_serializer(request)
+    etag, payload = home_payload(variant, serialize)
+    headers = home_headers(etag)
+    if not_modified(request.headers, etag, None):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(payload, headers=headers)
+
+
 @api_view(['GET'])
 def featured_books(request):
     """Get featured books"""
-    books = Book.objects.filter(is_active=True, is_featured=True)[:10]
-    serializer = BookListSerializer(books, many=True)
-    return Response(serializer.data)
+    return Response(shelf_payload('featured', *shelf_serializer(request), limit=10))
 
 
 @api_view(['GET'])
 def bestseller_books(request):
     """Get bestseller books"""
-    books = Book.objects.filter(
-        is_active=True, 
-        is_bestseller=True
-    ).order_by('-rating_count')[:10]
-    serializer = BookListSerializer(books, many=True)
-    return Response(serializer.data)
+    return Response(shelf_payload('bestsellers', *shelf_serializer(request), limit=10))
 
 
 @api_view(['GET'])
@@ -293,16 +386,40 @@ def search_books(request):
     if not query:
         return Response({'error': 'Qidiruv so\'zi kiritilmagan'}, status=status.HTTP_400_BAD_REQUEST)
     
-    books = Book.objects.filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(author__name__icontains=query) |
-        Q(publisher__name__icontains=query)
-    ).filter(is_active=True).distinct()
+    # Ranked ids from the search index, then one primary-key lookup
+    book_ids = search_book_ids(query)
+    suggestion = None
+    corrected = False
+    if not book_ids:
+        # Nothing matched: offer the closest catalog terms instead
+        suggestion = spelling_index.suggest(query)
+        if suggestion and settings.BOOKS_SPELLING_RERUN:
+            book_ids = search_book_ids(suggestion)
+            corrected = bool(book_ids)
+    rank = {book_id: position for position, book_id in enumerate(book_ids)}
+    books = sorted(
+        Book.objects.filter(id__in=book_ids, is_active=True).select_related('category', 'author', 'publisher'),
+        key=lambda book: rank[book.id]
+    )
     
+    # The list is materialised anyway, so count it instead of issuing a COUNT
     serializer = BookListSerializer(books, many=True)
+    results = serializer.data
     return Response({
         'query': query,
-        'count': books.count(),
-        'results': serializer.data
+        'suggestion': suggestion,
+        'corrected': corrected,
+        'count': len(results),
+        'results': results
     })
+
+
+@api_view(['GET'])
+def autocomplete(request):
+    """Typeahead suggestions for titles, authors and categories"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    return Response(autocomplete_index.suggest(query, limit))
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'books.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,6 +131,10 @@ AUTH_USER_MODEL = 'users.User'
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'books.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -158,6 +163,85 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Cache Configuration
+# LocMemCache is per-process; point CACHE_BACKEND at Redis/Memcached when
+# running several workers so catalog caches are shared and invalidated together
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='booknest'),
+    }
+}
+
+# Catalog Settings
+BOOKS_COUNT_CACHE_TIMEOUT = config('BOOKS_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+# 'auto' picks FTS5 on SQLite and tsvector on PostgreSQL; or 'sqlite', 'postgresql',
+# 'simple', or 'memory' for the in-process BM25 index
+BOOKS_SEARCH_BACKEND = config('BOOKS_SEARCH_BACKEND', default='auto')
+BOOKS_SEARCH_MAX_RESULTS = config('BOOKS_SEARCH_MAX_RESULTS', default=500, cast=int)
+BOOKS_SEARCH_REFRESH_INTERVAL = config('BOOKS_SEARCH_REFRESH_INTERVAL', default=30, cast=int)
+BOOKS_AUTOCOMPLETE_REFRESH_INTERVAL = config('BOOKS_AUTOCOMPLETE_REFRESH_INTERVAL', default=30, cast=int)
+# Book change log read by the in-process indexes: hours rows are kept (a reader idle for longer
+# reloads in full) and seconds before a missing id, an uncommitted or rolled-back write, is passed
+BOOKS_CHANGE_LOG_RETENTION_HOURS = config('BOOKS_CHANGE_LOG_RETENTION_HOURS', default=24, cast=int)
+BOOKS_CHANGE_LOG_GAP_SECONDS = config('BOOKS_CHANGE_LOG_GAP_SECONDS', default=60, cast=int)
+# "Did you mean" for searches without results; RERUN also returns the corrected query's results
+BOOKS_SPELLING_MAX_DISTANCE = config('BOOKS_SPELLING_MAX_DISTANCE', default=2, cast=int)
+BOOKS_SPELLING_RERUN = config('BOOKS_SPELLING_RERUN', default=True, cast=bool)
+# Listing facets: values shown per family and the price bucket boundaries (so'm)
+BOOKS_FACET_SIZE = config('BOOKS_FACET_SIZE', default=20, cast=int)
+BOOKS_PRICE_BUCKETS = [int(v) for v in config('BOOKS_PRICE_BUCKETS', default='30000,50000,100000').split(',')]
+# 'orm', or 'snapshot' to answer FastAPI book listings from an in-memory NumPy copy
+# of the catalog columns (requires numpy), refreshed from the book change log
+BOOKS_CATALOG_ENGINE = config('BOOKS_CATALOG_ENGINE', default='orm')
+BOOKS_CATALOG_REFRESH_INTERVAL = config('BOOKS_CATALOG_REFRESH_INTERVAL', default=5, cast=int)
+# Homepage shelves: books kept per shelf and a safety-net expiry for their payloads
+BOOKS_SHELF_SIZE = config('BOOKS_SHELF_SIZE', default=50, cast=int)
+BOOKS_SHELF_CACHE_TIMEOUT = config('BOOKS_SHELF_CACHE_TIMEOUT', default=3600, cast=int)
+# Responses at least this many bytes are brotli/gzip compressed when the client accepts it
+BOOKS_COMPRESSION_MIN_SIZE = config('BOOKS_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+# Related books: neighbours stored per book and the weight of each shared signal
+BOOKS_RELATED_SIZE = config('BOOKS_RELATED_SIZE', default=20, cast=int)
+BOOKS_RELATED_AUTHOR_WEIGHT = config('BOOKS_RELATED_AUTHOR_WEIGHT', default=3.0, cast=float)
+BOOKS_RELATED_CATEGORY_WEIGHT = config('BOOKS_RELATED_CATEGORY_WEIGHT', default=2.0, cast=float)
+BOOKS_RELATED_SUBTREE_WEIGHT = config('BOOKS_RELATED_SUBTREE_WEIGHT', default=1.0, cast=float)
+BOOKS_RELATED_PURCHASE_WEIGHT = config('BOOKS_RELATED_PURCHASE_WEIGHT', default=1.5, cast=float)
+# "Customers also bought": neighbours stored per book, 'cosine' or 'lift' scoring, pairs
+# seen in fewer orders than MIN_ORDERS are dropped, and bigger baskets are not paired
+BOOKS_ALSO_BOUGHT_SIZE = config('BOOKS_ALSO_BOUGHT_SIZE', default=20, cast=int)
+BOOKS_ALSO_BOUGHT_METRIC = config('BOOKS_ALSO_BOUGHT_METRIC', default='cosine')
+BOOKS_ALSO_BOUGHT_MIN_ORDERS = config('BOOKS_ALSO_BOUGHT_MIN_ORDERS', default=2, cast=int)
+BOOKS_ALSO_BOUGHT_MAX_BASKET = config('BOOKS_ALSO_BOUGHT_MAX_BASKET', default=50, cast=int)
+# "Recommended for you": books kept per user, how long a served list is cached, how often the
+# in-process book vectors are rebuilt, and how recent activity must be for the batch job
+BOOKS_RECOMMENDATIONS_SIZE = config('BOOKS_RECOMMENDATIONS_SIZE', default=50, cast=int)
+BOOKS_RECOMMENDATIONS_CACHE_TIMEOUT = config('BOOKS_RECOMMENDATIONS_CACHE_TIMEOUT', default=3600, cast=int)
+BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL = config('BOOKS_RECOMMENDATIONS_REFRESH_INTERVAL', default=3600, cast=int)
+BOOKS_RECOMMENDATIONS_ACTIVE_DAYS = config('BOOKS_RECOMMENDATIONS_ACTIVE_DAYS', default=90, cast=int)
+# Book views are buffered per process and written once this many are pending or this many
+# seconds have passed since the last write
+BOOKS_VIEW_FLUSH_SIZE = config('BOOKS_VIEW_FLUSH_SIZE', default=500, cast=int)
+BOOKS_VIEW_FLUSH_INTERVAL = config('BOOKS_VIEW_FLUSH_INTERVAL', default=10, cast=int)
+# Seconds between the background batches that refresh related and also-bought lists of the
+# books touched by new orders or catalog edits
+BOOKS_REFRESH_INTERVAL = config('BOOKS_REFRESH_INTERVAL', default=30, cast=int)
+# Trending: size of the activity buckets, half-life of an event's weight, how far back events
+# count, books per list and how often the lists are re-ranked (seconds unless noted)
+BOOKS_TRENDING_BUCKET_SECONDS = config('BOOKS_TRENDING_BUCKET_SECONDS', default=3600, cast=int)
+BOOKS_TRENDING_HALF_LIFE_HOURS = config('BOOKS_TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+BOOKS_TRENDING_WINDOW_HOURS = config('BOOKS_TRENDING_WINDOW_HOURS', default=168, cast=int)
+BOOKS_TRENDING_SIZE = config('BOOKS_TRENDING_SIZE', default=50, cast=int)
+BOOKS_TRENDING_REFRESH_INTERVAL = config('BOOKS_TRENDING_REFRESH_INTERVAL', default=600, cast=int)
+# Bestsellers: rolling sales windows in days, books flagged, and units a book must have sold
+# over the longest window to qualify
+BOOKS_BESTSELLER_WINDOWS = [int(days) for days in config('BOOKS_BESTSELLER_WINDOWS', default='7,30,90').split(',')]
+BOOKS_BESTSELLER_SIZE = config('BOOKS_BESTSELLER_SIZE', default=20, cast=int)
+BOOKS_BESTSELLER_MIN_UNITS = config('BOOKS_BESTSELLER_MIN_UNITS', default=3, cast=int)
+# Most ids one /books/batch request may ask for
+BOOKS_BATCH_MAX_IDS = config('BOOKS_BATCH_MAX_IDS', default=200, cast=int)
+# Seconds the /api/home bundle is cached, and may be reused by browsers and proxies
+BOOKS_HOME_CACHE_TIMEOUT = config('BOOKS_HOME_CACHE_TIMEOUT', default=60, cast=int)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
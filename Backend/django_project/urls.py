@@ -22,6 +22,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from books import views as books_views
+
 # Swagger/API Documentation setup
 schema_view = get_schema_view(
     openapi.Info(
@@ -40,6 +42,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     # API endpoints
+    path('api/home/', books_views.home, name='home'),
     path('api/books/', include('books.urls')),
     path('api/users/', include('users.urls')),
     path('api/orders/', include('orders.urls')),
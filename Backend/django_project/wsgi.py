@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
 
 application = get_wsgi_application()
+
+# Load in-process search structures before the first request
+from books.search import get_search_backend  # noqa: E402
+from books.search.autocomplete import autocomplete_index  # noqa: E402
+from books.search.spelling import spelling_index  # noqa: E402
+
+get_search_backend().warm()
+autocomplete_index.warm()
+spelling_index.warm()
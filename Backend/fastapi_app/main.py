@@ -15,7 +15,15 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
 django.setup()
 
 # Import routers
-from .routes import auth, books
+from .routes import auth, books, home
+from books.search import get_search_backend
+from books.search.autocomplete import autocomplete_index
+from .middleware import CompressionMiddleware
+from .responses import FastJSONResponse
+from books.catalog import catalog_snapshot
+from books.viewcounts import view_counter
+from books.refresh import flush_refresh_queues
+from django.conf import settings
 
 # Create FastAPI app
 app = FastAPI(
@@ -23,7 +31,8 @@ app = FastAPI(
     description="E-commerce API for BookNest book store",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=FastJSONResponse
 )
 
 # CORS Configuration
@@ -35,9 +44,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON responses (brotli or gzip, as the client accepts)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(books.router)
+app.include_router(home.router)
 
 # Mount media files
 from pathlib import Path
@@ -47,6 +60,22 @@ if MEDIA_ROOT.exists():
     app.mount("/media", StaticFiles(directory=str(MEDIA_ROOT)), name="media")
 
 
+@app.on_event("startup")
+def warm_search_backend():
+    """Load in-process search structures before the first request"""
+    get_search_backend().warm()
+    autocomplete_index.warm()
+    if settings.BOOKS_CATALOG_ENGINE == "snapshot":
+        catalog_snapshot.warm()
+
+
+@app.on_event("shutdown")
+def flush_pending_writes():
+    """Write buffered book views and pending list refreshes before the process exits"""
+    view_counter.flush()
+    flush_refresh_queues()
+
+
 @app.get("/")
 async def root():
     """API root endpoint"""
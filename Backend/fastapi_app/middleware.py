@@ -0,0 +1,55 @@
+"""
+Middleware for FastAPI application
+Negotiated brotli/gzip compression of JSON responses
+"""
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from books.compression import compress, is_compressible, negotiate, should_compress, weaken_etag
+
+
+class CompressionMiddleware:
+    """
+    ASGI counterpart of `books.compression.CompressionMiddleware`.
+    Responses sent in a single body message of at least
+    BOOKS_COMPRESSION_MIN_SIZE bytes are compressed; streamed responses
+    pass through untouched. Every compressible response varies on
+    Accept-Encoding, compressed or not.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding'))
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                # Hold the headers until we know whether the body gets compressed
+                start = message
+                return
+            if message['type'] == 'http.response.body' and start is not None:
+                body = message.get('body', b'')
+                headers = MutableHeaders(raw=start['headers'])
+                streamed = message.get('more_body', False)
+                if not streamed and is_compressible(headers.get('content-type'), headers.get('content-encoding')):
+                    headers.add_vary_header('Accept-Encoding')
+                if not streamed and encoding is not None and should_compress(
+                    headers.get('content-type'), len(body), headers.get('content-encoding')
+                ):
+                    body = compress(body, encoding)
+                    headers['Content-Encoding'] = encoding
+                    headers['Content-Length'] = str(len(body))
+                    if 'etag' in headers:
+                        headers['ETag'] = weaken_etag(headers['etag'])
+                    message = {**message, 'body': body}
+                await send(start)
+                start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
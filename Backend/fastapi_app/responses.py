@@ -0,0 +1,15 @@
+"""
+Response classes for FastAPI application
+JSON encoded with orjson through the shared Books renderer
+"""
+
+from fastapi.responses import JSONResponse
+
+from books.renderers import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by `books.renderers.dumps` (orjson when installed)"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -3,23 +3,39 @@ Books routes for FastAPI
 Browse, search, filter books
 """
 
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from typing import List, Optional
+from django.conf import settings
 from django.db.models import Q
-from django.core.paginator import Paginator
 
 from books.models import Book, Category, Author
-from ..schemas.books import BookListItem, BookDetail, CategoryResponse, AuthorResponse
-from ..dependencies import get_optional_user
+from books.cache import CachedCountPaginator, filter_signature
+from books.catalog import catalog_snapshot, hydrate
+from books.categories import category_tree, subtree_ids
+from books.conditional import book_validators, list_validators, not_modified, validator_headers
+from books.facets import facet_counts, parse_facets
+from books.pagination import KEYSET_ORDERINGS, InvalidCursor, keyset_page, offset_page, resolve_ordering
+from books.projection import batch_rows, list_rows, parse_book_ids, project_books
+from books.recommendations import recommended_book_ids
+from books.search import matching_book_ids
+from books.search.autocomplete import autocomplete_index
+from books.shelves import shelf_payload
+from books.trending import trending_book_ids
+from books.viewcounts import view_counter
+from ..schemas.books import BookListItem, BookDetail, CategoryResponse, AuthorResponse, AutocompleteItem
+from ..dependencies import get_current_active_user, get_optional_user
+from ..responses import FastJSONResponse
 
 router = APIRouter(prefix="/api/books", tags=["Books"])
 
 
 @router.get("/", response_model=dict)
 async def get_books(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     category: Optional[List[int]] = Query(None),
+    category_tree: Optional[int] = Query(None, description="Category id; books in it or any subcategory"),
     author: Optional[List[int]] = Query(None),
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
@@ -28,169 +44,237 @@ async def get_books(
     in_stock: Optional[bool] = Query(None),
     search: Optional[str] = Query(None),
     sort_by: str = Query("-created_at"),
+    pagination: str = Query("page", description="'page' for page numbers, 'cursor' for keyset paging"),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", description="'exact' for cached totals, 'has_more' to skip counting"),
+    facets: Optional[str] = Query(None, description="Comma-separated facet families (category, author, language, price) or 'all'"),
     user = Depends(get_optional_user)
 ):
     """Get all books with filters and pagination"""
-    queryset = Book.objects.filter(is_active=True).select_related('author', 'category', 'publisher')
+    etag, last_modified = list_validators("api:books", request.query_params)
+    headers = validator_headers(etag, last_modified)
+    if not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
     
-    # Apply filters
+    use_cursor = pagination == "cursor" or cursor is not None
+    # "price" sorts by the stored effective (discounted) price
+    ordering = resolve_ordering(sort_by)
+    if use_cursor and ordering not in KEYSET_ORDERINGS:
+        raise HTTPException(status_code=400, detail=f"Cursor pagination is not supported for sort_by={sort_by}")
+    
+    queryset = Book.objects.filter(is_active=True)
+    
+    # A subtree becomes its category ids, so the snapshot and cache keys need nothing new
+    if category_tree is not None:
+        subtree = subtree_ids(category_tree)
+        category = [category_id for category_id in category if category_id in subtree] if category else subtree
+        # No id is 0, so an unknown category, or no overlap with `category`, matches nothing
+        category = category or [0]
+    
+    # Facet families filter through their own Q, so each can be counted without it
+    family_filters = {}
     if category:
-        queryset = queryset.filter(category_id__in=category)
+        family_filters["category"] = Q(category_id__in=category)
     if author:
-        queryset = queryset.filter(author_id__in=author)
+        family_filters["author"] = Q(author_id__in=author)
+    price = Q()
     if min_price is not None:
-        queryset = queryset.filter(price__gte=min_price)
+        price &= Q(effective_price__gte=min_price)
     if max_price is not None:
-        queryset = queryset.filter(price__lte=max_price)
+        price &= Q(effective_price__lte=max_price)
+    if price:
+        family_filters["price"] = price
     if language:
-        queryset = queryset.filter(language__in=language)
+        family_filters["language"] = Q(language__in=language)
+    
+    # Apply filters
     if rating:
         queryset = queryset.filter(rating__gte=rating)
     if in_stock:
         queryset = queryset.filter(stock__gt=0)
+    # Every match, not the ranked top BOOKS_SEARCH_MAX_RESULTS, so totals and later pages stay right
+    search_ids = matching_book_ids(search) if search else None
     if search:
-        queryset = queryset.filter(
-            Q(title__icontains=search) |
-            Q(subtitle__icontains=search) |
-            Q(description__icontains=search) |
-            Q(author__name__icontains=search) |
-            Q(isbn__icontains=search)
+        queryset = queryset.filter(id__in=search_ids)
+    unfaceted = queryset
+    queryset = queryset.filter(*family_filters.values())
+    
+    signature = filter_signature("api:books", {
+        "category": category,
+        "author": author,
+        "min_price": min_price,
+        "max_price": max_price,
+        "language": language,
+        "rating": rating,
+        "in_stock": in_stock or None,
+        "search": search,
+    })
+    
+    # Columnar snapshot: filter and sort in memory, load only the page of rows
+    snapshot = None
+    if not use_cursor and settings.BOOKS_CATALOG_ENGINE == "snapshot":
+        snapshot_filters = dict(
+            category=category, author=author, min_price=min_price, max_price=max_price,
+            language=language, rating=rating, in_stock=in_stock,
+            book_ids=None if search_ids is None else list(search_ids)
         )
+        snapshot = catalog_snapshot.page(ordering, (page - 1) * page_size, page_size, **snapshot_filters)
+    
+    # Only the list columns are read; keyset paging also needs the sort key
+    rows = project_books(queryset, extra=[ordering.lstrip("-")] if use_cursor else ())
     
-    # Sorting
-    queryset = queryset.order_by(sort_by)
+    # Keyset pagination: one index range scan per page, no COUNT
+    if use_cursor:
+        try:
+            page_obj, next_cursor = keyset_page(rows, ordering, page_size, cursor)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    elif snapshot is not None:
+        page_ids, total = snapshot
+        if count != "has_more" and not page_ids and total:
+            # Like Paginator.get_page, an out-of-range page shows the last one
+            last_page = -(-total // page_size)
+            page_ids, total = catalog_snapshot.page(
+                ordering, (last_page - 1) * page_size, page_size, **snapshot_filters
+            )
+        page_obj = hydrate(rows, page_ids)
+        has_more = page * page_size < total
+    else:
+        # Sorting
+        rows = rows.order_by(ordering)
+        
+        # Pagination
+        if count == "has_more":
+            page_obj, has_more = offset_page(rows, page, page_size)
+        else:
+            paginator = CachedCountPaginator(rows, page_size, signature=signature)
+            page_obj = paginator.get_page(page)
     
-    # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    books = list_rows(page_obj)
     
-    books = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "slug": book.slug,
-            "author": book.author.name,
-            "author_id": book.author.id,
-            "category": book.category.name,
-            "category_id": book.category.id,
-            "price": float(book.price),
-            "discount_price": float(book.discount_price) if book.discount_price else None,
-            "final_price": float(book.final_price),
-            "discount_percentage": book.discount_percentage,
-            "cover_image": str(book.cover_image) if book.cover_image else "",
-            "rating": float(book.rating),
-            "review_count": book.review_count,
-            "is_in_stock": book.is_in_stock,
-            "is_featured": book.is_featured,
-            "is_bestseller": book.is_bestseller,
+    if use_cursor:
+        body = {
+            "books": books,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+    elif count == "has_more":
+        body = {
+            "books": books,
+            "page": page,
+            "page_size": page_size,
+            "has_more": has_more
+        }
+    elif snapshot is not None:
+        body = {
+            "books": books,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": max(-(-total // page_size), 1)
+        }
+    else:
+        body = {
+            "books": books,
+            "total": paginator.count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": paginator.num_pages
         }
-        for book in page_obj
-    ]
     
-    return {
-        "books": books,
-        "total": paginator.count,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": paginator.num_pages
-    }
+    families = parse_facets(facets)
+    if families:
+        body["facets"] = facet_counts(
+            queryset, signature, families,
+            without=lambda family: unfaceted.filter(
+                *(condition for name, condition in family_filters.items() if name != family)
+            )
+        )
+    # Plain dict payload: skip response_model re-validation and encode with orjson
+    return FastJSONResponse(body, headers=headers)
+
+
+def _api_shelf_rows(queryset):
+    return list_rows(project_books(queryset))
 
 
 @router.get("/featured", response_model=List[BookListItem])
 async def get_featured_books(limit: int = Query(10, ge=1, le=50)):
     """Get featured books"""
-    books = Book.objects.filter(is_active=True, is_featured=True).select_related('author', 'category')[:limit]
-    return [
-        {
-            "id": book.id,
-            "title": book.title,
-            "slug": book.slug,
-            "author": book.author.name,
-            "author_id": book.author.id,
-            "category": book.category.name,
-            "category_id": book.category.id,
-            "price": float(book.price),
-            "discount_price": float(book.discount_price) if book.discount_price else None,
-            "final_price": float(book.final_price),
-            "discount_percentage": book.discount_percentage,
-            "cover_image": str(book.cover_image),
-            "rating": float(book.rating),
-            "review_count": book.review_count,
-            "is_in_stock": book.is_in_stock,
-            "is_featured": book.is_featured,
-            "is_bestseller": book.is_bestseller,
-        }
-        for book in books
-    ]
+    return shelf_payload("featured", _api_shelf_rows, "api", limit=limit)
 
 
 @router.get("/bestsellers", response_model=List[BookListItem])
 async def get_bestsellers(limit: int = Query(10, ge=1, le=50)):
     """Get bestseller books"""
-    books = Book.objects.filter(is_active=True, is_bestseller=True).select_related('author', 'category')[:limit]
-    return [
-        {
-            "id": book.id,
-            "title": book.title,
-            "slug": book.slug,
-            "author": book.author.name,
-            "author_id": book.author.id,
-            "category": book.category.name,
-            "category_id": book.category.id,
-            "price": float(book.price),
-            "discount_price": float(book.discount_price) if book.discount_price else None,
-            "final_price": float(book.final_price),
-            "discount_percentage": book.discount_percentage,
-            "cover_image": str(book.cover_image),
-            "rating": float(book.rating),
-            "review_count": book.review_count,
-            "is_in_stock": book.is_in_stock,
-            "is_featured": book.is_featured,
-            "is_bestseller": book.is_bestseller,
-        }
-        for book in books
-    ]
+    return shelf_payload("bestsellers", _api_shelf_rows, "api", limit=limit)
 
 
 @router.get("/new-arrivals", response_model=List[BookListItem])
 async def get_new_arrivals(limit: int = Query(10, ge=1, le=50)):
     """Get newly added books"""
-    books = Book.objects.filter(is_active=True).select_related('author', 'category').order_by('-created_at')[:limit]
-    return [
-        {
-            "id": book.id,
-            "title": book.title,
-            "slug": book.slug,
-            "author": book.author.name,
-            "author_id": book.author.id,
-            "category": book.category.name,
-            "category_id": book.category.id,
-            "price": float(book.price),
-            "discount_price": float(book.discount_price) if book.discount_price else None,
-            "final_price": float(book.final_price),
-            "discount_percentage": book.discount_percentage,
-            "cover_image": str(book.cover_image),
-            "rating": float(book.rating),
-            "review_count": book.review_count,
-            "is_in_stock": book.is_in_stock,
-            "is_featured": book.is_featured,
-            "is_bestseller": book.is_bestseller,
-        }
-        for book in books
-    ]
+    return shelf_payload("new_arrivals", _api_shelf_rows, "api", limit=limit)
+
+
+@router.get("/recommended", response_model=List[BookListItem])
+async def get_recommended_books(limit: int = Query(10, ge=1, le=50), user = Depends(get_current_active_user)):
+    """Books picked for the current user, or popular books until they have some history"""
+    book_ids = recommended_book_ids(user.id)[:limit]
+    return list_rows(hydrate(project_books(Book.objects.filter(is_active=True)), book_ids))
+
+
+@router.get("/trending", response_model=List[BookListItem])
+async def get_trending_books(
+    limit: int = Query(10, ge=1, le=50),
+    category: Optional[int] = Query(None, description="Category id; includes its subcategories")
+):
+    """Books with the most recent views, cart additions and purchases"""
+    book_ids = trending_book_ids(category, limit)
+    return list_rows(hydrate(project_books(Book.objects.filter(is_active=True)), book_ids))
+
+
+@router.get("/batch", response_model=dict)
+async def get_books_batch(ids: List[str] = Query(..., description="Book ids, comma-separated or repeated")):
+    """Several books by id in one request, in the order asked, plus the ids not found"""
+    try:
+        book_ids = parse_book_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    books, missing = batch_rows(book_ids)
+    return FastJSONResponse({"books": books, "missing": missing})
+
+
+@router.get("/categories/tree")
+async def get_category_tree():
+    """The whole active category tree, nested, for the category menu"""
+    return category_tree()
+
+
+@router.get("/autocomplete", response_model=List[AutocompleteItem])
+async def autocomplete(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=20)):
+    """Typeahead suggestions for titles, authors and categories"""
+    return autocomplete_index.suggest(q, limit)
 
 
 @router.get("/{book_id}", response_model=BookDetail)
-async def get_book_detail(book_id: int):
+async def get_book_detail(book_id: int, request: Request, response: Response):
     """Get book detail and increment view count"""
+    etag, last_modified = book_validators(id=book_id)
+    if etag is not None:
+        headers = validator_headers(etag, last_modified)
+        if not_modified(request.headers, etag, last_modified):
+            view_counter.record(book_id)
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    
     try:
         book = Book.objects.select_related('author', 'category', 'publisher').get(id=book_id, is_active=True)
     except Book.DoesNotExist:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    # Increment view count
-    book.view_count += 1
-    book.save(update_fields=['view_count'])
+    # Buffered; written in batches rather than one UPDATE per view
+    view_counter.record(book.id)
     
     return {
         "id": book.id,
@@ -219,7 +303,7 @@ async def get_book_detail(book_id: int):
         "image_3": str(book.image_3) if book.image_3 else None,
         "rating": float(book.rating),
         "review_count": book.review_count,
-        "view_count": book.view_count,
+        "view_count": book.view_count + view_counter.pending(book.id),
         "is_in_stock": book.is_in_stock,
         "is_featured": book.is_featured,
         "is_bestseller": book.is_bestseller,
@@ -230,37 +314,29 @@ async def get_book_detail(book_id: int):
 
 @router.get("/related/{book_id}", response_model=List[BookListItem])
 async def get_related_books(book_id: int, limit: int = Query(6, ge=1, le=20)):
-    """Get related books by category and author"""
-    try:
-        book = Book.objects.get(id=book_id)
-    except Book.DoesNotExist:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    # Get books from same category or by same author
+    """Get related books by author, category subtree and co-purchases"""
+    # Top of the precomputed list: one range scan on the (book, -score) index
     related = Book.objects.filter(
-        Q(category=book.category) | Q(author=book.author),
+        related_for__book_id=book_id,
         is_active=True
-    ).exclude(id=book_id).select_related('author', 'category').distinct()[:limit]
+    ).order_by('-related_for__score')[:limit]
+    books = list_rows(project_books(related))
     
-    return [
-        {
-            "id": b.id,
-            "title": b.title,
-            "slug": b.slug,
-            "author": b.author.name,
-            "author_id": b.author.id,
-            "category": b.category.name,
-            "category_id": b.category.id,
-            "price": float(b.price),
-            "discount_price": float(b.discount_price) if b.discount_price else None,
-            "final_price": float(b.final_price),
-            "discount_percentage": b.discount_percentage,
-            "cover_image": str(b.cover_image),
-            "rating": float(b.rating),
-            "review_count": b.review_count,
-            "is_in_stock": b.is_in_stock,
-            "is_featured": b.is_featured,
-            "is_bestseller": b.is_bestseller,
-        }
-        for b in related
-    ]
+    if not books and not Book.objects.filter(id=book_id).exists():
+        raise HTTPException(status_code=404, detail="Book not found")
+    return books
+
+
+@router.get("/also-bought/{book_id}", response_model=List[BookListItem])
+async def get_also_bought(book_id: int, limit: int = Query(10, ge=1, le=20)):
+    """Books most often bought together with this one"""
+    # Precomputed from order history; no OrderItem aggregation per request
+    books = Book.objects.filter(
+        co_purchased_with__book_id=book_id,
+        is_active=True
+    ).order_by('-co_purchased_with__score')[:limit]
+    rows = list_rows(project_books(books))
+    
+    if not rows and not Book.objects.filter(id=book_id).exists():
+        raise HTTPException(status_code=404, detail="Book not found")
+    return rows
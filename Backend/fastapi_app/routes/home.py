@@ -0,0 +1,24 @@
+"""
+Homepage routes for FastAPI
+First-paint bootstrap bundle
+"""
+
+from fastapi import APIRouter, Request, Response
+
+from books.conditional import not_modified
+from books.home import home_headers, home_payload
+from .books import _api_shelf_rows
+from ..responses import FastJSONResponse
+
+router = APIRouter(prefix="/api", tags=["Home"])
+
+
+@router.get("/home")
+async def get_home(request: Request):
+    """Featured, bestseller and new-arrival shelves plus the category menu for first paint"""
+    # Same "api" shelf payloads as /api/books/featured and friends, so the caches are shared
+    etag, payload = home_payload("api", _api_shelf_rows)
+    headers = home_headers(etag)
+    if not_modified(request.headers, etag, None):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(payload, headers=headers)
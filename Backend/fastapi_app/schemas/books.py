@@ -100,6 +100,14 @@ class BookDetail(BookListItem):
     updated_at: datetime
 
 
+class AutocompleteItem(BaseModel):
+    """Schema for a typeahead suggestion"""
+    type: str
+    id: int
+    label: str
+    slug: str
+
+
 class BookFilter(BaseModel):
     """Schema for book filtering"""
     category: Optional[List[int]] = None
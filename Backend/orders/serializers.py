@@ -4,12 +4,15 @@ Serializers for Orders app
 from rest_framework import serializers
 from .models import Order, OrderItem
 from books.serializers import BookListSerializer
+from books.sparse import SparseFieldsMixin
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for order items"""
     book = BookListSerializer(read_only=True)
     subtotal = serializers.SerializerMethodField()
+    expandable_fields = {'book': BookListSerializer}
+    field_sources = {'subtotal': ('price', 'quantity')}
     
     class Meta:
         model = OrderItem
@@ -20,17 +23,19 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return obj.price * obj.quantity
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for orders"""
     items = OrderItemSerializer(many=True, read_only=True)
     total_items = serializers.SerializerMethodField()
+    expandable_fields = {'items': OrderItemSerializer}
+    field_sources = {'total_items': ('items__quantity',)}
     
     class Meta:
         model = Order
-        fields = ['id', 'order_number', 'user', 'items', 'total_amount', 
-                  'total_items', 'status', 'payment_method', 'payment_status',
-                  'shipping_address', 'shipping_city', 'shipping_postal_code',
-                  'phone', 'notes', 'created_at', 'updated_at']
+        fields = ['id', 'order_number', 'user', 'items', 'subtotal', 'shipping_cost',
+                  'discount_amount', 'total', 'total_items', 'status', 'payment_method',
+                  'is_paid', 'paid_at', 'shipping_address', 'notes', 'tracking_number',
+                  'created_at', 'updated_at', 'delivered_at']
         read_only_fields = ['order_number', 'user', 'created_at', 'updated_at']
     
     def get_total_items(self, obj):
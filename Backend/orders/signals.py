@@ -0,0 +1,25 @@
+"""
+Signal handlers for Orders app
+Keep purchase-driven book data in step with new order items
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from books.copurchase import co_purchase_refresh
+from books.recommendations import recommendations_changed
+from books.related import related_lists_refresh
+from books.trending import record_activity
+from .models import OrderItem
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_created(sender, instance, created, **kwargs):
+    """A new purchase changes the book's neighbours, trending score and the buyer's recommendations"""
+    if created:
+        # Neighbour lists are refreshed in background batches, not during checkout
+        transaction.on_commit(lambda: co_purchase_refresh.add([instance.book_id]))
+        transaction.on_commit(lambda: related_lists_refresh.add([instance.book_id]))
+        recommendations_changed(instance.order.user_id)
+        transaction.on_commit(lambda: record_activity('purchases', [instance.book_id], instance.quantity))
@@ -10,15 +10,17 @@ from django.db import transaction
 from .models import Order, OrderItem
 from .serializers import OrderSerializer
 from books.models import Book, Cart
+from books.sparse import SparseFieldsViewSetMixin
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for Order model"""
+    queryset = Order.objects.prefetch_related('items__book')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('items__book')
+        return super().get_queryset().filter(user=self.request.user)
     
     @action(detail=False, methods=['post'])
     def create_from_cart(self, request):
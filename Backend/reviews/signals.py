@@ -0,0 +1,16 @@
+"""
+Signal handlers for Reviews app
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from books.recommendations import recommendations_changed
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """Star ratings pull the reviewer's recommendations towards or away from the book"""
+    recommendations_changed(instance.user_id)
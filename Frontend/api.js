@@ -6,7 +6,9 @@
 const API_CONFIG = {
   baseURL: 'http://127.0.0.1:8000/api',
   endpoints: {
+    home: '/home/',
     books: '/books/books/',
+    autocomplete: '/books/autocomplete/',
     categories: '/books/categories/',
     authors: '/books/authors/',
     cart: '/books/cart/',
@@ -66,17 +68,37 @@ class APIClient {
     return await this.request(`${this.endpoints.books}?search=${encodeURIComponent(query)}`);
   }
   
+  async autocomplete(query, limit = 10) {
+    return await this.request(`${this.endpoints.autocomplete}?q=${encodeURIComponent(query)}&limit=${limit}`);
+  }
+  
+  // Homepage bundle: every shelf and the category menu, requested once per page
+  getHome() {
+    if (!this.homeRequest) {
+      this.homeRequest = this.request(this.endpoints.home).then(result => {
+        if (!result.success) {
+          this.homeRequest = null;
+        }
+        return result;
+      });
+    }
+    return this.homeRequest;
+  }
+  
   async getFeaturedBooks() {
-    return await this.request(`${this.endpoints.books}?is_featured=true`);
+    const result = await this.getHome();
+    return result.success ? { success: true, data: result.data.featured } : result;
   }
   
   async getBestsellers() {
-    return await this.request(`${this.endpoints.books}?is_bestseller=true`);
+    const result = await this.getHome();
+    return result.success ? { success: true, data: result.data.bestsellers } : result;
   }
   
   // Categories API
   async getCategories() {
-    return await this.request(this.endpoints.categories);
+    const result = await this.getHome();
+    return result.success ? { success: true, data: result.data.categories } : result;
   }
   
   async getCategory(slug) {
@@ -123,6 +123,35 @@ function calculateDiscount(original, current) {
   return Math.round(((original - current) / original) * 100);
 }
 
+// Category name -> slug over the bundle's nested category tree
+function categorySlugs(tree, slugs = {}) {
+  tree.forEach(node => {
+    slugs[node.name] = node.slug;
+    categorySlugs(node.children, slugs);
+  });
+  return slugs;
+}
+
+// A homepage bundle row (BookListSerializer) in the shape the book cards render
+function bookFromRow(row, slugs = {}) {
+  const price = parseFloat(row.effective_price);
+  return {
+    id: row.id,
+    title: row.title,
+    author: row.author_name,
+    category: slugs[row.category_name] || row.category_name,
+    price: price,
+    originalPrice: row.discount_price ? parseFloat(row.price) : price * 1.2,
+    rating: parseFloat(row.average_rating),
+    ratingCount: row.review_count,
+    cover: 'book-cover',
+    // Already an absolute URL
+    coverImage: row.cover_image || null,
+    icon: '📚',
+    description: 'Kitob haqida ma\'lumot'
+  };
+}
+
 function showNotification(message, type = 'success') {
   const notification = document.createElement('div');
   notification.className = `notification notification-${type}`;
@@ -276,7 +305,6 @@ class BookManager {
     this.booksContainer = document.querySelector('.books-grid');
     this.filterTabs = document.querySelectorAll('.filter-tab');
     this.loadMoreBtn = document.querySelector('.load-more-btn');
-    this.apiBaseUrl = 'http://127.0.0.1:8000';
     
     this.init();
   }
@@ -290,23 +318,11 @@ class BookManager {
   
   async loadBooksFromAPI() {
     try {
-      const response = await fetch(`${this.apiBaseUrl}/api/books/books/`);
-      if (response.ok) {
-        const data = await response.json();
-        const apiBooks = data.results.map(book => ({
-          id: book.id,
-          title: book.title,
-          author: book.author.name,
-          category: book.category.slug,
-          price: parseFloat(book.price),
-          originalPrice: book.discount_price ? parseFloat(book.discount_price) : parseFloat(book.price) * 1.2,
-          rating: parseFloat(book.rating),
-          ratingCount: book.review_count,
-          cover: 'book-cover',
-          coverImage: book.cover_image ? `${this.apiBaseUrl}${book.cover_image}` : null,
-          icon: '📚',
-          description: book.description || 'Kitob haqida ma\'lumot'
-        }));
+      // Featured shelf and category menu from the homepage bundle, shared with the bestsellers
+      const result = await api.getHome();
+      if (result.success) {
+        const slugs = categorySlugs(result.data.categories);
+        const apiBooks = result.data.featured.map(row => bookFromRow(row, slugs));
         
         currentBooks = apiBooks.length > 0 ? apiBooks : [...sampleBooks];
         filteredBooks = [...currentBooks];
@@ -724,7 +740,6 @@ class Newsletter {
 class Bestsellers {
   constructor() {
     this.container = document.querySelector('.bestsellers-list');
-    this.apiBaseUrl = 'http://127.0.0.1:8000';
     this.init();
   }
   
@@ -736,21 +751,10 @@ class Bestsellers {
   
   async displayBestsellers() {
     try {
-      // Try to get from API first
-      const response = await fetch(`${this.apiBaseUrl}/api/books/books/?ordering=-rating&page_size=5`);
-      if (response.ok) {
-        const data = await response.json();
-        const bestsellers = data.results.slice(0, 5).map(book => ({
-          id: book.id,
-          title: book.title,
-          author: book.author.name,
-          rating: parseFloat(book.rating),
-          ratingCount: book.review_count,
-          price: parseFloat(book.price),
-          cover: 'book-cover',
-          coverImage: book.cover_image ? `${this.apiBaseUrl}${book.cover_image}` : null,
-          icon: '📚'
-        }));
+      // Try to get from API first: the homepage bundle carries every shelf in one request
+      const result = await api.getHome();
+      if (result.success) {
+        const bestsellers = result.data.bestsellers.slice(0, 5).map(row => bookFromRow(row));
         
         this.renderBestsellers(bestsellers);
       } else {